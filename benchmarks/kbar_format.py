@@ -0,0 +1,76 @@
+import argparse
+import copy
+import random
+import time
+from datetime import date, timedelta
+
+from tech_analysis_api_handler.ta.sdk import TKBarRec, ta_sma
+from tech_analysis_api_handler.ta.utils import kbar_rows, kbar_time_formatter
+
+
+def make_results(days: int, seed: int = 0) -> list:
+    """One-minute TA results of one symbol for ``days`` weekday sessions."""
+    rnd = random.Random(seed)
+    results = []
+    day = date(2024, 1, 1)
+    volume = 0
+    for _ in range(days):
+        while day.weekday() >= 5:
+            day += timedelta(days=1)
+        for minute in range(9 * 60 + 1, 13 * 60 + 31):
+            price = 600 + rnd.randint(-50, 50) / 2
+            quantity = rnd.randint(1, 500)
+            volume += quantity
+            kbar = TKBarRec(
+                day.strftime("%Y%m%d"),
+                "2330",
+                minute // 60 * 100 + minute % 60,
+                minute // 60 * 100 + minute % 60,
+                quantity,
+                volume,
+                price,
+                price + 0.5,
+                price - 0.5,
+                price,
+            )
+            results.append(ta_sma(kbar, price))
+        day += timedelta(days=1)
+    return results
+
+
+def legacy(results: list) -> list[dict]:
+    return [kbar_time_formatter(r) for r in results]
+
+
+def best_of(func, repeat: int, make_input) -> float:
+    timings = []
+    for _ in range(repeat):
+        data = make_input()
+        start = time.perf_counter()
+        func(data)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="""Compare kbar_time_formatter with the batch kbar_rows""",
+    )
+    parser.add_argument("--days", type=int, default=250)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    results = make_results(args.days)
+    # kbar_time_formatter mutates the SDK objects, give it its own copies
+    legacy_s = best_of(legacy, args.repeat, lambda: copy.deepcopy(results))
+    batch_s = best_of(kbar_rows, args.repeat, lambda: results)
+    bars = len(results)
+    print(f"bars: {bars}")
+    print(f"kbar_time_formatter: {legacy_s:.3f}s ({bars / legacy_s:,.0f} bars/s)")
+    print(f"kbar_rows:           {batch_s:.3f}s ({bars / batch_s:,.0f} bars/s)")
+    print(f"speedup:             {legacy_s / batch_s:.1f}x")
+
+
+if __name__ == "__main__":
+
+    main()
@@ -0,0 +1,520 @@
+import argparse
+import copy
+import fnmatch
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field, asdict
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+HERE = Path(__file__).resolve().parent
+BASELINES = HERE / "baselines"
+RESULTS = HERE / "results"
+
+# Without SQL_URI every database lives in sqlite files of a scratch directory
+SCRATCH = Path(tempfile.mkdtemp(prefix="ta-bench-"))
+os.environ.setdefault("SQL_URI", f"sqlite:///{SCRATCH}")
+os.environ.setdefault("API_USERNAME", "bench")
+os.environ.setdefault("API_PASSWORD", "bench")
+
+from fastapi.responses import JSONResponse
+from sqlalchemy.engine.result import IteratorResult, SimpleResultMetaData
+
+from tech_analysis_api_handler.config import get_settings
+from tech_analysis_api_handler.database import (
+    OHLCTable,
+    TickHandler,
+    columns_of,
+    get_db,
+    get_engine,
+)
+from tech_analysis_api_handler.models import DataType, StatusCode
+from tech_analysis_api_handler.serialization import columnar_response
+from tech_analysis_api_handler.ta.schemas import GetResponse, OHLCData
+from tech_analysis_api_handler.ta.service import ApiResponse
+from tech_analysis_api_handler.ta.simulator import SimulatedTechAnalysis
+from tech_analysis_api_handler.ta.buffer import get_bar_buffer
+from tech_analysis_api_handler.ta.workers import get_callback_executor
+from tech_analysis_api_handler.ta.bus import get_event_bus
+from tech_analysis_api_handler.ta.sdk import eTA_Type
+from tech_analysis_api_handler.ta.utils import (
+    combine_date_time,
+    kbar_rows,
+    kbar_time_formatter,
+    match_time_to_datetime64,
+    decode_ticks,
+)
+
+from kbar_format import make_results
+from tick_decode import make_records
+
+
+@dataclass
+class Result:
+    name: str
+    count: int
+    unit: str
+    seconds: float
+    ops_per_sec: float
+    extra: dict = field(default_factory=dict)
+
+
+BENCHMARKS: dict[str, callable] = {}
+SEQUENCE = itertools.count()
+
+
+def benchmark(name: str):
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+
+    return register
+
+
+def best_of(repeat: int, setup: callable, run: callable) -> float:
+    """Fastest of ``repeat`` runs, ``setup`` is called untimed before each."""
+    timings = []
+    for _ in range(repeat):
+        state = setup()
+        start = time.perf_counter()
+        run(state)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def dialect() -> str:
+    return get_engine().dialect.name
+
+
+@benchmark("utils.kbar_time_formatter")
+def bench_kbar_time_formatter(repeat: int) -> Result:
+    results = make_results(20)
+    seconds = best_of(
+        repeat,
+        lambda: copy.deepcopy(results),
+        lambda data: [kbar_time_formatter(r) for r in data],
+    )
+    return Result("", len(results), "bars", seconds, len(results) / seconds)
+
+
+@benchmark("utils.kbar_rows")
+def bench_kbar_rows(repeat: int) -> Result:
+    results = make_results(20)
+    seconds = best_of(repeat, lambda: results, kbar_rows)
+    return Result("", len(results), "bars", seconds, len(results) / seconds)
+
+
+def match_times(count: int) -> np.ndarray:
+    rnd = np.random.default_rng(0)
+    seconds = np.sort(rnd.uniform(9 * 3600, 13.5 * 3600, count)).round(6)
+    whole = np.floor(seconds).astype("i8")
+    hhmmss = whole // 3600 * 10000 + whole % 3600 // 60 * 100 + whole % 60
+    return np.round(hhmmss + (seconds - whole), 6)
+
+
+@benchmark("utils.combine_date_time")
+def bench_combine_date_time(repeat: int) -> Result:
+    times = match_times(100_000).tolist()
+    day = datetime(2024, 5, 2)
+    seconds = best_of(
+        repeat, lambda: times, lambda data: [combine_date_time(t, day) for t in data]
+    )
+    return Result("", len(times), "ticks", seconds, len(times) / seconds)
+
+
+@benchmark("utils.match_time_to_datetime64")
+def bench_match_time_to_datetime64(repeat: int) -> Result:
+    times = match_times(100_000)
+    day = datetime(2024, 5, 2)
+    seconds = best_of(
+        repeat, lambda: times, lambda data: match_time_to_datetime64(data, day)
+    )
+    return Result("", len(times), "ticks", seconds, len(times) / seconds)
+
+
+@benchmark("utils.decode_ticks")
+def bench_decode_ticks(repeat: int) -> Result:
+    records = make_records(50_000)
+    day = datetime(2024, 5, 2)
+    seconds = best_of(
+        repeat, lambda: records, lambda data: decode_ticks(data, day)
+    )
+    return Result("", len(records), "ticks", seconds, len(records) / seconds)
+
+
+def ohlc_result(count: int):
+    """``count`` stored 1m bars as a query result, the input of both readers."""
+    columns = [column.name for column in OHLCTable.get("2330").columns]
+    start = datetime(2024, 1, 2, 9, 1)
+    rows = []
+    volume = 0
+    for i in range(count):
+        dt = start + timedelta(minutes=i)
+        price = 600 + i % 100 / 2
+        volume += i % 500
+        date = dt.year * 10000 + dt.month * 100 + dt.day
+        timesn = dt.hour * 100 + dt.minute
+        rows.append(
+            (dt, date, "2330", timesn, timesn, i % 500, volume)
+            + (price, price + 0.5, price - 0.5, price)
+        )
+    return IteratorResult(SimpleResultMetaData(columns), iter(rows))
+
+
+def serialization_result(body: bytes, count: int, seconds: float) -> Result:
+    extra = {"body": {"mb": len(body) / 1e6, "bytes_per_row": len(body) / count}}
+    return Result("", count, "rows", seconds, count / seconds, extra)
+
+
+# The path of GET /ohlc/{symbol}?format=json and of every other route: a dict
+# per row, the response models, then the JSON encoder of the JSONResponse
+@benchmark("serialization.ohlc.model")
+def bench_serialization_model(repeat: int) -> Result:
+    count = 100_000
+    body = b""
+
+    def run(result):
+        nonlocal body
+        rows = [dict(row._mapping) for row in result]
+        data = [OHLCData(data={"2330": rows})]
+        response = GetResponse(status_code=StatusCode.Success.OK, data=data)
+        body = JSONResponse(response.model_dump(mode="json")).body
+
+    seconds = best_of(repeat, lambda: ohlc_result(count), run)
+    return serialization_result(body, count, seconds)
+
+
+@benchmark("serialization.ohlc.columnar")
+def bench_serialization_columnar(repeat: int) -> Result:
+    count = 100_000
+    body = b""
+
+    def run(result):
+        nonlocal body
+        columns = columns_of(result)
+        body = columnar_response(DataType.OHLC, "2330", columns, "columnar").body
+
+    seconds = best_of(repeat, lambda: ohlc_result(count), run)
+    return serialization_result(body, count, seconds)
+
+
+@benchmark("serialization.ohlc.arrow")
+def bench_serialization_arrow(repeat: int) -> Result:
+    import pyarrow
+
+    count = 100_000
+    body = b""
+
+    def run(result):
+        nonlocal body
+        columns = columns_of(result)
+        body = columnar_response(DataType.OHLC, "2330", columns, "arrow").body
+
+    seconds = best_of(repeat, lambda: ohlc_result(count), run)
+    return serialization_result(body, count, seconds)
+
+
+def fresh_results(symbol: str, days: int) -> list:
+    results = []
+    for day in range(days):
+        results.extend(SimulatedTechAnalysis.kbars(symbol, datetime(2024, 1, 1 + day)))
+    return results
+
+
+def unique(prefix: str) -> str:
+    """A symbol never written before, so every row is inserted."""
+    return f"{prefix}{next(SEQUENCE)}-{time.time_ns() % 10**9}"
+
+
+def create_tables(symbols: list[str]) -> None:
+    # Table DDL is not timed, sqlite would also block on it mid-transaction
+    engine = get_engine()
+    for symbol in symbols:
+        OHLCTable.resolve(engine, symbol)
+
+
+def fresh_bars(days: int) -> list[dict]:
+    symbol = unique("B")
+    create_tables([symbol])
+    return kbar_rows(fresh_results(symbol, days))
+
+
+@benchmark("database.OHLCTable.insert_ignore[{dialect}]")
+def bench_ohlc_insert_ignore(repeat: int) -> Result:
+    db = get_db()
+    days = 5
+
+    def run(rows):
+        with db() as session:
+            OHLCTable.insert_ignore(db=session, data=rows)
+
+    seconds = best_of(repeat, lambda: fresh_bars(days), run)
+    count = days * 270
+    return Result("", count, "rows", seconds, count / seconds)
+
+
+def tick_frame(simulator, count: int):
+    symbol = unique("T")
+    frame, _ = simulator.GetHisBS_Stock_frame(symbol, datetime(2024, 5, 2))
+    return symbol, frame.head(count)
+
+
+def tick_records(simulator, count: int):
+    symbol, frame = tick_frame(simulator, count)
+    return symbol, frame.to_dict("records")
+
+
+# insert and bulk_load share the key filter, bulk_load adds COPY on PostgreSQL
+@benchmark("database.TickHandler.insert[{dialect}]")
+def bench_tick_insert(repeat: int) -> Result:
+    handler = TickHandler()
+    simulator = SimulatedTechAnalysis(None, None, None, None)
+    count = 5000
+    seconds = best_of(
+        repeat,
+        lambda: tick_records(simulator, count),
+        lambda state: handler.insert(*state, "remote"),
+    )
+    return Result("", count, "rows", seconds, count / seconds)
+
+
+@benchmark("database.TickHandler.bulk_load[{dialect}]")
+def bench_tick_bulk_load(repeat: int) -> Result:
+    handler = TickHandler()
+    simulator = SimulatedTechAnalysis(None, None, None, None)
+    count = 5000
+    seconds = best_of(
+        repeat,
+        lambda: tick_frame(simulator, count),
+        lambda state: handler.bulk_load(*state, "remote"),
+    )
+    return Result("", count, "rows", seconds, count / seconds)
+
+
+def drain(timeout: float = 60.0) -> None:
+    executor = get_callback_executor()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        stats = executor.stats()
+        if stats["completed"] + stats["dropped"] >= stats["submitted"]:
+            if get_event_bus().pending() > 0:
+                time.sleep(0.001)
+                continue
+            if get_bar_buffer().pending() == 0:
+                return
+            get_bar_buffer().flush()
+        time.sleep(0.001)
+    raise TimeoutError("callbacks did not drain")
+
+
+@benchmark("service.ApiResponse.OnUpdate[{dialect}]")
+def bench_on_update(repeat: int) -> Result:
+    first = SimulatedTechAnalysis.FIRST_MINUTE
+    minutes = range(first, first + 50)
+    day = datetime(2024, 5, 2)
+    get_callback_executor().start()
+    get_bar_buffer().start()
+
+    def setup():
+        symbols = [unique("U") for _ in range(200)]
+        create_tables(symbols)
+        return [
+            (
+                SimulatedTechAnalysis.kbar(symbol, day, minute),
+                SimulatedTechAnalysis.kbar(symbol, day, minute + 1),
+            )
+            for minute in minutes
+            for symbol in symbols
+        ]
+
+    def run(updates):
+        for pre, last in updates:
+            ApiResponse.OnUpdate(eTA_Type.SMA, pre, last)
+        drain()
+
+    seconds = best_of(repeat, setup, run)
+    count = 200 * len(minutes)
+    return Result("", count, "callbacks", seconds, count / seconds)
+
+
+@benchmark("service.ApiResponse.OnRcvDone[{dialect}]")
+def bench_on_rcv_done(repeat: int) -> Result:
+    days = 5
+    batches = 20
+    get_callback_executor().start()
+
+    def setup():
+        symbols = [unique("R") for _ in range(batches)]
+        create_tables(symbols)
+        return [fresh_results(symbol, days) for symbol in symbols]
+
+    def run(results):
+        for result in results:
+            ApiResponse.OnRcvDone(eTA_Type.SMA, result)
+        drain()
+
+    seconds = best_of(repeat, setup, run)
+    count = days * 270 * batches
+    return Result("", count, "bars", seconds, count / seconds)
+
+
+@benchmark("api.routes[{dialect}]")
+def bench_routes(repeat: int) -> Result:
+    from fastapi.testclient import TestClient
+    from tech_analysis_api_handler.main import app
+
+    settings = get_settings()
+    simulator = settings.modules_ta.service.Simulator
+    simulator.ENABLED = True
+    simulator.RCV_DELAY = 0.0
+    simulator.UPDATE_INTERVAL = 3600.0
+    ep = settings.modules_ta.endpoints
+    prefix = settings.modules_ta.PREFIX
+    day = datetime.now().strftime("%Y%m%d")
+    routes = {
+        "GET snapshot": lambda i: ("GET", ep.SNAPSHOT),
+        "GET subs": lambda i: ("GET", ep.SUBSCRIPTIONS),
+        "PUT sub": lambda i: ("PUT", f"{ep.SUBSCRIPTION}/S{day}{i:05d}"),
+        "GET watermark": lambda i: ("GET", ep.WATERMARK),
+        "GET ohlc service": lambda i: ("GET", ep.OHLC + ep.SERVICE),
+        "PUT ohlc": lambda i: ("PUT", f"{ep.OHLC}/2330"),
+    }
+    requests = 50
+    latencies = {name: [] for name in routes}
+    with TestClient(app) as client:
+        for _ in range(repeat):
+            for name, route in routes.items():
+                for i in range(requests):
+                    method, path = route(i + len(latencies[name]))
+                    start = time.perf_counter()
+                    response = client.request(method, prefix + path)
+                    latencies[name].append(time.perf_counter() - start)
+                    response.raise_for_status()
+    extra = {}
+    for name, values in latencies.items():
+        values.sort()
+        extra[name] = {
+            "p50_ms": values[len(values) // 2] * 1000,
+            "p95_ms": values[int(len(values) * 0.95)] * 1000,
+            "mean_ms": statistics.fmean(values) * 1000,
+        }
+    total = sum(sum(v) for v in latencies.values())
+    count = sum(len(v) for v in latencies.values())
+    return Result("", count, "requests", total, count / total, extra)
+
+
+def run(patterns: list[str], repeat: int) -> dict:
+    backend = dialect()
+    results = {}
+    for template, func in BENCHMARKS.items():
+        name = template.format(dialect=backend)
+        if patterns and not any(fnmatch.fnmatch(name, p) for p in patterns):
+            continue
+        try:
+            result = func(repeat)
+        # Optional parts such as the test client may be missing
+        except (ImportError, RuntimeError) as e:
+            print(f"{name:<48} skipped: {e}")
+            continue
+        result.name = name
+        results[name] = asdict(result)
+        print(
+            f"{name:<48} {result.ops_per_sec:>14,.0f} {result.unit}/s "
+            f"({result.count} in {result.seconds:.4f}s)"
+        )
+        for label, values in result.extra.items():
+            stats = ", ".join(f"{k} {v:.2f}" for k, v in values.items())
+            print(f"    {label:<44} {stats}")
+    return {"meta": metadata(backend, repeat), "results": results}
+
+
+def metadata(backend: str, repeat: int) -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=HERE,
+        ).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor() or None,
+        "cpus": os.cpu_count(),
+        "backend": backend,
+        "repeat": repeat,
+    }
+
+
+def compare(baseline: dict, current: dict, tolerance: float) -> bool:
+    """Print the change of every shared benchmark, False on a regression."""
+    ok = True
+    base = baseline["results"]
+    print(f"baseline {baseline['meta']['commit']} vs {current['meta']['commit']}")
+    for name, result in current["results"].items():
+        if name not in base:
+            print(f"{name:<48} {'new':>10}")
+            continue
+        ratio = result["ops_per_sec"] / base[name]["ops_per_sec"]
+        flag = ""
+        if ratio < 1 - tolerance:
+            flag = "REGRESSION"
+            ok = False
+        print(f"{name:<48} {ratio:>9.2f}x {flag}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="""Benchmark ingestion, storage and API hot paths""",
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_ = sub.add_parser("run", help="run the suite and write the results")
+    run_.add_argument("patterns", nargs="*", help="glob of benchmark names")
+    run_.add_argument("--repeat", type=int, default=3)
+    run_.add_argument("--output", type=Path, default=RESULTS / "latest.json")
+    run_.add_argument("--save", metavar="BASELINE", help="also store as baseline")
+    compare_ = sub.add_parser("compare", help="compare results with a baseline")
+    compare_.add_argument("baseline", help="baseline name or json file")
+    compare_.add_argument("--results", type=Path, default=RESULTS / "latest.json")
+    compare_.add_argument("--tolerance", type=float, default=0.1)
+    sub.add_parser("list", help="list benchmark names")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for name in BENCHMARKS:
+            print(name.format(dialect=dialect()))
+        return
+    if args.command == "run":
+        data = run(args.patterns, args.repeat)
+        paths = [args.output] + ([BASELINES / f"{args.save}.json"] if args.save else [])
+        for path in paths:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(data, indent=2))
+            print(f"Wrote {path}")
+        return
+    path = Path(args.baseline)
+    if not path.suffix:
+        path = BASELINES / f"{args.baseline}.json"
+    baseline = json.loads(path.read_text())
+    current = json.loads(args.results.read_text())
+    if not compare(baseline, current, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
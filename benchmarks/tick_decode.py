@@ -0,0 +1,95 @@
+import argparse
+import random
+import time
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+
+from tech_analysis_api_handler.ta.sdk import TBSRec
+from tech_analysis_api_handler.ta.utils import combine_date_time, decode_ticks
+
+
+def make_records(n: int, seed: int = 0) -> list:
+    """Synthetic SDK tick records with decimal fields like the .NET objects."""
+    rnd = random.Random(seed)
+    records = []
+    for i in range(n):
+        seconds = 9 * 3600 + i * 16200 // n
+        hhmmss = seconds // 3600 * 10000 + seconds % 3600 // 60 * 100 + seconds % 60
+        price = Decimal(600 + rnd.randint(-50, 50)) / 2
+        records.append(
+            SimpleNamespace(
+                Prod="2330",
+                Sequence=i,
+                Match_Time=Decimal(f"{hhmmss}.{rnd.randint(0, 999999):06d}"),
+                Match_Price=price,
+                Match_Quantity=rnd.randint(1, 50),
+                Match_Volume=i,
+                Is_TryMatch=i < 100,
+                BS=rnd.randint(1, 2),
+                BP_1_Pre=price - Decimal("0.5"),
+                SP_1_Pre=price,
+            )
+        )
+    return records
+
+
+def legacy_decode(records: list, single_date: datetime) -> list[dict]:
+    """Per-object path of GetHisBS_Stock followed by get_historical_data."""
+    lsbss = [
+        TBSRec(
+            x.Prod,
+            x.Sequence,
+            float(str(x.Match_Time)),
+            float(str(x.Match_Price)),
+            x.Match_Quantity,
+            x.Match_Volume,
+            x.Is_TryMatch,
+            x.BS,
+            float(str(x.BP_1_Pre)),
+            float(str(x.SP_1_Pre)),
+        )
+        for x in records
+    ]
+    all_data = []
+    for x in lsbss:
+        data_point = x.__dict__
+        data_point.update({"datetime": combine_date_time(x.Match_Time, single_date)})
+        all_data.append(data_point)
+    return all_data
+
+
+def best_of(func, repeat: int, *args) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="""Compare per-object and columnar tick decoding""",
+    )
+    parser.add_argument("--ticks", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    single_date = datetime(2024, 5, 2)
+    records = make_records(args.ticks)
+    legacy = legacy_decode(records, single_date)
+    columnar = decode_ticks(records, single_date)
+    assert [x["datetime"] for x in legacy] == columnar["datetime"].tolist()
+
+    legacy_s = best_of(legacy_decode, args.repeat, records, single_date)
+    columnar_s = best_of(decode_ticks, args.repeat, records, single_date)
+    print(f"ticks: {args.ticks}")
+    print(f"per-object: {legacy_s:.3f}s ({args.ticks / legacy_s:,.0f} ticks/s)")
+    print(f"columnar:   {columnar_s:.3f}s ({args.ticks / columnar_s:,.0f} ticks/s)")
+    print(f"speedup:    {legacy_s / columnar_s:.1f}x")
+
+
+if __name__ == "__main__":
+
+    main()
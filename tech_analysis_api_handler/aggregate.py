@@ -0,0 +1,212 @@
+import argparse
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import MetaData, func, inspect, select
+
+from tech_analysis_api_handler.database import (
+    EngineRegistry,
+    OHLCPeriodTable,
+    TickHandler,
+    get_db,
+    get_engine,
+    get_ohlc_store,
+)
+
+logger = logging.getLogger("aggregate")
+
+BAR_COLUMNS = [
+    "datetime",
+    "Date",
+    "Product",
+    "TimeSn",
+    "TimeSn_Dply",
+    "Quantity",
+    "Volume",
+    "OPrice",
+    "HPrice",
+    "LPrice",
+    "CPrice",
+]
+
+MINUTE_US = 60_000_000
+
+
+def ticks_to_bars(ticks: pd.DataFrame, period: int = 1) -> pd.DataFrame:
+    """Aggregate trade prints into ``period`` minute bars shaped like OHLCTable.
+
+    Trial matches are dropped. Bars are right closed and labelled by their end
+    like the SDK's KBar TimeSn, so prints in (09:00, 09:01] form the 0901 bar.
+    Quantity is the traded quantity of the bar and Volume the session volume
+    at its last print.
+    """
+    ticks = ticks[~ticks["Is_TryMatch"].astype(bool)]
+    if ticks.empty:
+        return pd.DataFrame(columns=BAR_COLUMNS)
+    ticks = ticks.sort_values(["datetime", "Sequence"], kind="stable")
+    stamps = ticks["datetime"].to_numpy(dtype="M8[us]").astype("i8")
+    price = ticks["Match_Price"].to_numpy(dtype="f8")
+    quantity = ticks["Match_Quantity"].to_numpy(dtype="i8")
+    volume = ticks["Match_Volume"].to_numpy(dtype="i8")
+
+    width = period * MINUTE_US
+    buckets = -(-stamps // width) * width
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(buckets)] - 1
+
+    labels = pd.DatetimeIndex(buckets[starts].astype("M8[us]"))
+    time_sn = (labels.hour * 100 + labels.minute).to_numpy()
+    bars = pd.DataFrame(
+        {
+            "datetime": labels,
+            "Date": (labels.year * 10000 + labels.month * 100 + labels.day).to_numpy(),
+            "Product": ticks["Prod"].iloc[0],
+            "TimeSn": time_sn,
+            "TimeSn_Dply": time_sn,
+            "Quantity": np.add.reduceat(quantity, starts),
+            "Volume": volume[ends],
+            "OPrice": price[starts],
+            "HPrice": np.maximum.reduceat(price, starts),
+            "LPrice": np.minimum.reduceat(price, starts),
+            "CPrice": price[ends],
+        }
+    )
+    return bars
+
+
+def read_ticks(conn, symbol: str, start: datetime, end: datetime) -> pd.DataFrame:
+    table = TickHandler().table_maker(symbol, MetaData())
+    stmt = (
+        select(
+            table.c.datetime,
+            table.c.Prod,
+            table.c.Sequence,
+            table.c.Match_Price,
+            table.c.Match_Quantity,
+            table.c.Match_Volume,
+            table.c.Is_TryMatch,
+        )
+        .where(table.c.datetime >= start)
+        .where(table.c.datetime < end)
+    )
+    return pd.read_sql(stmt, conn)
+
+
+def write_bars(session, symbol: str, bars: pd.DataFrame, period: int) -> None:
+    """1m bars go to the OHLC store, longer ones to their OHLCPeriodTable."""
+    data = {symbol: bars.to_dict("records")}
+    if period == 1:
+        get_ohlc_store().insert_ignore_many(session, data)
+    else:
+        OHLCPeriodTable.insert_ignore_many(session, period, data)
+
+
+def rebuild_symbol(
+    symbol: str,
+    start: datetime = None,
+    end: datetime = None,
+    days: int = 20,
+    period: int = 1,
+) -> int:
+    """Rebuild the ``period`` minute bars of one symbol from its stored ticks.
+
+    Ticks are read ``days`` calendar days at a time so memory stays bounded,
+    and bars already stored are left untouched.
+    """
+    engine = get_engine(TickHandler.DB_NAME)
+    if not inspect(engine).has_table(symbol):
+        return 0
+    table = TickHandler().table_maker(symbol, MetaData())
+    with engine.connect() as conn:
+        first, last = conn.execute(
+            select(func.min(table.c.datetime), func.max(table.c.datetime))
+        ).one()
+    if first is None:
+        return 0
+    start = first if start is None else max(start, first)
+    end = last + timedelta(microseconds=1) if end is None else end
+    # Windows start at midnight so no bar straddles two reads
+    cursor = datetime(start.year, start.month, start.day)
+    db = get_db()
+    built = 0
+    while cursor < end:
+        until = min(cursor + timedelta(days=days), end)
+        with engine.connect() as conn:
+            ticks = read_ticks(conn, symbol, cursor, until)
+        bars = ticks_to_bars(ticks, period)
+        if not bars.empty:
+            with db() as session:
+                write_bars(session, symbol, bars, period)
+            built += len(bars)
+        cursor = until
+    return built
+
+
+def init_worker() -> None:
+    # Pools inherited from a forked parent must not be shared with it
+    EngineRegistry.dispose(close=False)
+
+
+def rebuild(
+    symbols: list[str] = None,
+    start: datetime = None,
+    end: datetime = None,
+    workers: int = 4,
+    days: int = 20,
+    period: int = 1,
+) -> dict[str, int]:
+    if period < 1:
+        raise ValueError(f"period must be at least 1 minute, got {period}")
+    if not symbols:
+        symbols = sorted(inspect(get_engine(TickHandler.DB_NAME)).get_table_names())
+    result = {}
+    begin = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as executor:
+        futures = {
+            executor.submit(rebuild_symbol, symbol, start, end, days, period): symbol
+            for symbol in symbols
+        }
+        for i, future in enumerate(as_completed(futures), start=1):
+            symbol = futures[future]
+            try:
+                result[symbol] = future.result()
+            except Exception as e:
+                logger.error(f"Rebuild of {symbol} failed: {e}")
+                result[symbol] = -1
+                continue
+            logger.info(f"[{i}/{len(symbols)}] {symbol}: {result[symbol]} bars")
+    elapsed = time.perf_counter() - begin
+    total = sum(v for v in result.values() if v > 0)
+    logger.info(
+        f"Built {total} {period}m bars for {len(symbols)} symbols in {elapsed:.1f}s"
+    )
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="""Rebuild OHLC bars from stored ticks""",
+    )
+    parser.add_argument("symbols", nargs="*", help="symbols to rebuild, default all")
+    parser.add_argument("--start", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--end", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--days", type=int, default=20, help="days per read")
+    parser.add_argument("--period", type=int, default=1, help="bar minutes")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    result = rebuild(
+        args.symbols, args.start, args.end, args.workers, args.days, args.period
+    )
+    failed = [symbol for symbol, count in result.items() if count < 0]
+    if failed:
+        raise SystemExit(f"Failed: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+
+    main()
@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from functools import cache
+from typing import Literal
 from pandas import DateOffset
 from sqlalchemy.orm import Session
 
@@ -28,6 +29,8 @@ class APISecrets(BaseSettings):
 
     USERNAME: str
     PASSWORD: str
+    # Extra "username:password" logins for SessionPool sessions beyond the first
+    ACCOUNTS: list[str] = []
 
 
 class Schemas(BaseSettings):
@@ -35,12 +38,34 @@ class Schemas(BaseSettings):
     OHLC: str = "ml_ohlc"
     OHLC_D: str = "ml_ohlc_D"
     TICK: str = "ml_tickhist"
+    OHLC_FACT: str = "ml_ohlc_fact"
+
+
+class PoolSettings(BaseSettings):
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        env_file_encoding="utf-8",
+        env_prefix="DB_POOL_",
+        env_ignore_empty=True,
+        extra=None,
+    )
+
+    SIZE: int = 10
+    MAX_OVERFLOW: int = 20
+    TIMEOUT: float = 30.0
+    RECYCLE: int = 1800
+    PRE_PING: bool = True
+    WARM: int = 2
 
 
 class DatabaseSettings(BaseSettings):
     secrets: DatabaseSecrets = DatabaseSecrets()
     DB_NAME: str = "ed_fetcher"
     schemas: Schemas = Schemas()
+    pool: PoolSettings = PoolSettings()
+    # "per_symbol" keeps one table per product, "partitioned" one fact table
+    OHLC_LAYOUT: Literal["per_symbol", "partitioned"] = "per_symbol"
+    OHLC_FACT_TABLE: str = "ohlc"
 
 
 class Endpoints(BaseSettings):
@@ -57,15 +82,125 @@ class Endpoints(BaseSettings):
     OHLC: str = "/ohlc"
     OHLC_D: str = "/ohlcd"
     TICK: str = "/tick"
+    POOL: str = "/pool"
+    WATERMARK: str = "/watermark"
+    METRICS: str = "/metrics"
+    STREAM: str = "/stream"
 
 
 class OHLCRuntime_(BaseSettings):
     IS_ACTIVE: bool = False
     UPDATING_SYMBOL: str | None = None
+    # Number of SubTA backfill requests kept in flight at once
+    WINDOW: int = 8
+    TIMEOUT: float = 30.0
+    RETRIES: int = 2
+    # Request only symbols and sessions missing from the completeness index
+    GAP_PLANNING: bool = True
+
+
+class BarBuffer_(BaseSettings):
+    ENABLED: bool = True
+    MAX_BATCH: int = 5000
+    MAX_LATENCY: float = 1.0
+    MAX_PENDING: int = 50000
+    PUT_TIMEOUT: float = 5.0
+    # Failed flushes of a symbol in a row before its bars are dropped
+    MAX_RETRIES: int = 5
+
+
+class CallbackWorkers_(BaseSettings):
+    WORKERS: int = 4
+    QUEUE_SIZE: int = 10000
+    OVERFLOW: Literal["block", "drop_oldest", "drop_newest"] = "block"
+    BLOCK_TIMEOUT: float = 5.0
+
+
+class TickHarvester_(BaseSettings):
+    CONCURRENCY: int = 4
+    # GetHisBS_Stock calls per second, with BURST calls allowed back to back
+    RATE: float = 10.0
+    BURST: int = 10
+    RETRIES: int = 3
+    BACKOFF: float = 1.0
+    TARGET: Literal["local", "remote", "all"] = "remote"
+
+
+class TradingCalendar_(BaseSettings):
+    # Exchange holidays as YYYYMMDD, sessions are also learned from stored bars
+    HOLIDAYS: list[str] = []
+    REFERENCE_SYMBOL: str = "2330"
+    # Seconds between relearning sessions from stored bars, 0 learns at startup
+    REFRESH_INTERVAL: float = 3600.0
+
+
+class Supervisor_(BaseSettings):
+    LOGIN_TIMEOUT: float = 30.0
+    # Reconnect delays double from BACKOFF up to BACKOFF_MAX, +/- JITTER of it
+    BACKOFF: float = 1.0
+    BACKOFF_MAX: float = 60.0
+    JITTER: float = 0.2
+
+
+class SessionPool_(BaseSettings):
+    # Logged-in sessions symbols are sharded across, by consistent hashing
+    SIZE: int = 1
+    VNODES: int = 64
+    # SubTA/UnSubTA calls per second and session for bulk subscriptions,
+    # SUBSCRIBE_BATCH of them may run back to back
+    SUBSCRIBE_RATE: float = 500.0
+    SUBSCRIBE_BATCH: int = 100
+
+
+class Simulator_(BaseSettings):
+    # Replace the Masterlink SDK with synthetic sessions, no login required
+    ENABLED: bool = False
+    UNIVERSE: int = 1000
+    SEED: int = 0
+    LOGIN_DELAY: float = 0.5
+    # Delay before OnRcvDone answers a SubTA
+    RCV_DELAY: float = 0.05
+    # Seconds between OnUpdate rounds over every subscribed symbol
+    UPDATE_INTERVAL: float = 1.0
+    TICKS_PER_DAY: int = 5000
+    # Seconds after login until the session reports a drop, 0 never
+    DISCONNECT_EVERY: float = 0.0
+
+
+class Stream_(BaseSettings):
+    # Messages buffered per streaming client before POLICY applies
+    BUFFER: int = 1000
+    POLICY: Literal["drop_oldest", "disconnect"] = "drop_oldest"
+    # Seconds between SSE keep-alive comments on an idle stream
+    HEARTBEAT: float = 15.0
+
+
+class EventBus_(BaseSettings):
+    # Events queued per consumer before its overflow policy applies
+    QUEUE_SIZE: int = 10000
+    # Threads of the bar and history database writers
+    WRITER_WORKERS: int = 4
+
+
+class SymbolMaster_(BaseSettings):
+    # Seconds between reloads of the symbol universe, 0 loads it once
+    REFRESH_INTERVAL: float = 6 * 3600.0
+    # Market of each symbol (e.g. {"2330": "TWSE"}) when the source has none
+    MARKETS: dict[str, str] = {}
 
 
 class Service(BaseSettings):
     OHLCRuntime: OHLCRuntime_ = OHLCRuntime_()
+    BarBuffer: BarBuffer_ = BarBuffer_()
+    CallbackWorkers: CallbackWorkers_ = CallbackWorkers_()
+    TickHarvester: TickHarvester_ = TickHarvester_()
+    TradingCalendar: TradingCalendar_ = TradingCalendar_()
+    Supervisor: Supervisor_ = Supervisor_()
+    SessionPool: SessionPool_ = SessionPool_()
+    Simulator: Simulator_ = Simulator_()
+    Stream: Stream_ = Stream_()
+    EventBus: EventBus_ = EventBus_()
+    SymbolMaster: SymbolMaster_ = SymbolMaster_()
 
 
 class TAModulesSettings(BaseSettings):
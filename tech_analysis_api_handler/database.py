@@ -1,13 +1,20 @@
 import os
+import io
+import csv
+import time
 import logging
+import threading
+from collections import Counter
 from datetime import datetime
-from typing import Literal
+from typing import Literal, Iterable
 from dataclasses import dataclass
+import pandas as pd
 from sqlalchemy import (
     create_engine,
     Engine,
     Column,
     Integer,
+    BigInteger,
     String,
     Float,
     Boolean,
@@ -19,14 +26,26 @@ from sqlalchemy import (
     exc,
     DateTime,
     UniqueConstraint,
+    PrimaryKeyConstraint,
+    Index,
     select,
+    event,
+    make_url,
+    text,
+    case,
+    func,
+    bindparam,
+    delete,
+    tuple_,
 )
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateSchema
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.dialects.mysql import insert as mysql_insert
 from sqlalchemy.dialects.postgresql import insert as sqlite_insert
 from sqlalchemy.ext.declarative import declarative_base
 
-from tech_analysis_api_handler import config
+from tech_analysis_api_handler import config, metrics
 
 logger = logging.getLogger("src")
 Base = declarative_base()
@@ -34,11 +53,497 @@ root_settings = config.Settings()
 settings = root_settings.database
 
 
+def create_config_table(engine: Engine, table: Table) -> Table:
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            conn.execute(CreateSchema(table.schema, if_not_exists=True))
+    table.create(engine, checkfirst=True)
+    return table
+
+
+def resolve_config_table(cls, executor) -> Table:
+    """Table of ``cls`` created for the engine of ``executor``.
+
+    Writers update these tables inside their open transaction, where creating
+    them on another connection would wait on the writer's own lock, so they
+    are only created with the engine, see ``EngineRegistry.get_engine``.
+    """
+    engine = Watermark.engine_of(executor)
+    table = cls.__tables__.get(str(engine.url))
+    if table is None:
+        raise RuntimeError(
+            f"{cls.__name__} table of {engine.url.database} was not created"
+        )
+    return table
+
+
+def get_watermark_table(metadata: MetaData = None) -> Table:
+    if metadata is None:
+        metadata = MetaData(schema=settings.schemas.CONFIG)
+    return Table(
+        "watermark",
+        metadata,
+        Column("symbol", String(20), nullable=False),
+        Column("dataset", String(20), nullable=False),
+        Column("latest", DateTime, nullable=False),
+        Column("row_count", BigInteger, nullable=False, default=0),
+        Column("updated_at", DateTime),
+        PrimaryKeyConstraint("symbol", "dataset"),
+    )
+
+
+class Watermark:
+    """Latest stored datetime and row count per (symbol, dataset).
+
+    Insert paths call ``update`` inside their own transaction so the
+    watermark moves together with the rows it describes.
+    """
+
+    OHLC = "ohlc"
+    TICK = "tick"
+
+    __lock__ = threading.Lock()
+    __tables__: dict[str, Table] = {}
+
+    @staticmethod
+    def engine_of(executor) -> Engine:
+        if isinstance(executor, Session):
+            return executor.get_bind()
+        return getattr(executor, "engine", executor)
+
+    @classmethod
+    def create(cls, engine: Engine) -> Table:
+        with cls.__lock__:
+            table = cls.__tables__.get(str(engine.url))
+            if table is None:
+                table = create_config_table(engine, get_watermark_table())
+                cls.__tables__[str(engine.url)] = table
+        return table
+
+    @classmethod
+    def resolve(cls, executor) -> Table:
+        return resolve_config_table(cls, executor)
+
+    @staticmethod
+    def marks(data: dict[str, list], inserted: dict[str, int]) -> dict:
+        result = {}
+        for symbol, rows in data.items():
+            if isinstance(rows, pd.DataFrame):
+                latest = rows["datetime"].max() if len(rows) else None
+                latest = None if pd.isna(latest) else pd.Timestamp(latest)
+                latest = None if latest is None else latest.to_pydatetime()
+            else:
+                datetimes = [row_value(row, "datetime") for row in rows]
+                latest = max((dt for dt in datetimes if dt is not None), default=None)
+            if latest is not None:
+                result[symbol] = (latest, inserted.get(symbol, 0))
+        return result
+
+    @classmethod
+    def update(
+        cls, executor, dataset: str, marks: dict[str, tuple[datetime, int]]
+    ) -> None:
+        """Upsert ``{symbol: (latest, inserted_rows)}`` without committing."""
+        if not marks:
+            return
+        table = cls.resolve(executor)
+        now = datetime.now()
+        rows = [
+            {
+                "symbol": symbol,
+                "dataset": dataset,
+                "latest": latest,
+                "row_count": max(count, 0),
+                "updated_at": now,
+            }
+            for symbol, (latest, count) in marks.items()
+        ]
+        if cls.engine_of(executor).dialect.name in ["mysql", "mariadb"]:
+            stmt = mysql_insert(table)
+            stmt = stmt.on_duplicate_key_update(
+                latest=func.greatest(table.c.latest, stmt.inserted.latest),
+                row_count=table.c.row_count + stmt.inserted.row_count,
+                updated_at=stmt.inserted.updated_at,
+            )
+        else:
+            stmt = sqlite_insert(table)
+            excluded = stmt.excluded
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.symbol, table.c.dataset],
+                set_={
+                    "latest": case(
+                        (excluded.latest > table.c.latest, excluded.latest),
+                        else_=table.c.latest,
+                    ),
+                    "row_count": table.c.row_count + excluded.row_count,
+                    "updated_at": excluded.updated_at,
+                },
+            )
+        executor.execute(stmt, rows)
+
+    @classmethod
+    def bulk(cls, executor, dataset: str) -> dict[str, dict]:
+        """Every symbol's watermark for ``dataset`` in one query."""
+        table = cls.resolve(executor)
+        stmt = select(table.c.symbol, table.c.latest, table.c.row_count).where(
+            table.c.dataset == dataset
+        )
+        if not isinstance(executor, (Session, Connection)):
+            with executor.connect() as conn:
+                rows = conn.execute(stmt).all()
+        else:
+            rows = executor.execute(stmt).all()
+        return {
+            symbol: {"latest": latest, "row_count": row_count}
+            for symbol, latest, row_count in rows
+        }
+
+    @classmethod
+    def get(cls, executor, symbol: str, dataset: str) -> datetime | None:
+        table = cls.resolve(executor)
+        stmt = select(table.c.latest).where(
+            table.c.symbol == symbol, table.c.dataset == dataset
+        )
+        if not isinstance(executor, (Session, Connection)):
+            with executor.connect() as conn:
+                return conn.execute(stmt).scalar()
+        return executor.execute(stmt).scalar()
+
+
+def get_completeness_table(metadata: MetaData = None) -> Table:
+    if metadata is None:
+        metadata = MetaData(schema=settings.schemas.CONFIG)
+    return Table(
+        "completeness",
+        metadata,
+        Column("symbol", String(20), nullable=False),
+        Column("session", Integer, nullable=False),
+        *(
+            Column(column, BigInteger, nullable=False, default=0)
+            for column in Completeness.COLUMNS
+        ),
+        Column("complete", Boolean, nullable=False, default=False),
+        Column("updated_at", DateTime),
+        PrimaryKeyConstraint("symbol", "session"),
+    )
+
+
+class Completeness:
+    """Bitmap of the 1m bars present per (symbol, session).
+
+    Bit ``i`` stands for the bar ending ``FIRST_MINUTE + i`` minutes after
+    midnight, so a regular session from 0901 to 1330 takes 270 bits, stored
+    as five integer columns of 54 bits. Writers OR their bits into the stored
+    words in the upsert itself, so concurrent flushes never lose each other's
+    bars. No bars end between 1326 and 1329 while the closing auction
+    collects orders, ``EXPECTED`` leaves them out. A session is also flagged
+    ``complete`` once a backfill covering it succeeded, which keeps illiquid
+    symbols with empty minutes from being requested again.
+    """
+
+    FIRST_MINUTE = 9 * 60 + 1
+    MINUTES = 270
+    WORD_BITS = 54
+    COLUMNS = tuple(f"bits{i}" for i in range(-(-MINUTES // WORD_BITS)))
+    # Minutes of the closing auction, inclusive
+    AUCTION = (13 * 60 + 26, 13 * 60 + 29)
+    EXPECTED = ((1 << MINUTES) - 1) & ~(
+        ((1 << (AUCTION[1] - AUCTION[0] + 1)) - 1) << (AUCTION[0] - FIRST_MINUTE)
+    )
+
+    __lock__ = threading.Lock()
+    __tables__: dict[str, Table] = {}
+
+    @classmethod
+    def create(cls, engine: Engine) -> Table:
+        with cls.__lock__:
+            table = cls.__tables__.get(str(engine.url))
+            if table is None:
+                table = create_config_table(engine, get_completeness_table())
+                cls.__tables__[str(engine.url)] = table
+        return table
+
+    @classmethod
+    def resolve(cls, executor) -> Table:
+        return resolve_config_table(cls, executor)
+
+    @staticmethod
+    def session_of(dt: datetime) -> int:
+        return dt.year * 10000 + dt.month * 100 + dt.day
+
+    @classmethod
+    def marks(cls, data: dict[str, list]) -> dict[tuple[str, int], int]:
+        """``{(symbol, session): bitmap}`` of the bars in ``data``."""
+        result = {}
+        for symbol, rows in data.items():
+            if isinstance(rows, pd.DataFrame):
+                datetimes = pd.to_datetime(rows["datetime"]).dt.to_pydatetime()
+            else:
+                datetimes = [row_value(row, "datetime") for row in rows]
+            for dt in datetimes:
+                if dt is None:
+                    continue
+                bit = dt.hour * 60 + dt.minute - cls.FIRST_MINUTE
+                if 0 <= bit < cls.MINUTES:
+                    key = symbol, cls.session_of(dt)
+                    result[key] = result.get(key, 0) | 1 << bit
+        return result
+
+    @classmethod
+    def __fetch__(cls, executor, stmt) -> list:
+        if not isinstance(executor, (Session, Connection)):
+            with executor.connect() as conn:
+                return conn.execute(stmt).all()
+        return executor.execute(stmt).all()
+
+    @classmethod
+    def words(cls, bitmap: int) -> dict[str, int]:
+        mask = (1 << cls.WORD_BITS) - 1
+        return {
+            column: bitmap >> (i * cls.WORD_BITS) & mask
+            for i, column in enumerate(cls.COLUMNS)
+        }
+
+    @classmethod
+    def bitmap(cls, words: Iterable[int]) -> int:
+        return sum(word << (i * cls.WORD_BITS) for i, word in enumerate(words))
+
+    @classmethod
+    def is_complete(cls, bitmap: int) -> bool:
+        return bitmap & cls.EXPECTED == cls.EXPECTED
+
+    @classmethod
+    def update(cls, executor, marks: dict[tuple[str, int], int]) -> None:
+        """OR ``marks`` into the stored bitmaps without committing."""
+        if not marks:
+            return
+        table = cls.resolve(executor)
+        now = datetime.now()
+        rows = [
+            {
+                "symbol": symbol,
+                "session": session,
+                **cls.words(bitmap),
+                "complete": False,
+                "updated_at": now,
+            }
+            for (symbol, session), bitmap in marks.items()
+        ]
+        if Watermark.engine_of(executor).dialect.name in ["mysql", "mariadb"]:
+            stmt = mysql_insert(table)
+            merged = {c: table.c[c].op("|")(stmt.inserted[c]) for c in cls.COLUMNS}
+            stmt = stmt.on_duplicate_key_update(
+                {**merged, "updated_at": stmt.inserted.updated_at}
+            )
+        else:
+            stmt = sqlite_insert(table)
+            merged = {c: table.c[c].op("|")(stmt.excluded[c]) for c in cls.COLUMNS}
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.symbol, table.c.session],
+                set_={**merged, "updated_at": stmt.excluded.updated_at},
+            )
+        executor.execute(stmt, rows)
+
+    @classmethod
+    def mark_complete(cls, executor, symbol: str, sessions: Iterable[int]) -> None:
+        """Flag ``sessions`` of ``symbol`` as fully backfilled."""
+        now = datetime.now()
+        rows = [
+            {
+                "symbol": symbol,
+                "session": session,
+                **cls.words(0),
+                "complete": True,
+                "updated_at": now,
+            }
+            for session in sessions
+        ]
+        if not rows:
+            return
+        table = cls.resolve(executor)
+        if Watermark.engine_of(executor).dialect.name in ["mysql", "mariadb"]:
+            stmt = mysql_insert(table)
+            stmt = stmt.on_duplicate_key_update(
+                complete=stmt.inserted.complete, updated_at=stmt.inserted.updated_at
+            )
+        else:
+            stmt = sqlite_insert(table)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.symbol, table.c.session],
+                set_={
+                    "complete": stmt.excluded.complete,
+                    "updated_at": stmt.excluded.updated_at,
+                },
+            )
+        executor.execute(stmt, rows)
+
+    @classmethod
+    def bulk(
+        cls, executor, start: int, end: int, symbols: Iterable[str] = None
+    ) -> dict[str, dict[int, tuple[int, bool]]]:
+        """``{symbol: {session: (bitmap, complete)}}`` for a session range."""
+        table = cls.resolve(executor)
+        words = [table.c[c] for c in cls.COLUMNS]
+        stmt = select(
+            table.c.symbol, table.c.session, table.c.complete, *words
+        ).where(table.c.session.between(start, end))
+        if symbols is not None:
+            stmt = stmt.where(table.c.symbol.in_(list(symbols)))
+        result = {}
+        for symbol, session, complete, *words in cls.__fetch__(executor, stmt):
+            result.setdefault(symbol, {})[session] = (
+                cls.bitmap(words),
+                bool(complete),
+            )
+        return result
+
+
+def get_subscription_table(metadata: MetaData = None) -> Table:
+    if metadata is None:
+        metadata = MetaData(schema=settings.schemas.CONFIG)
+    return Table(
+        "subscription",
+        metadata,
+        Column("symbol", String(20), nullable=False),
+        Column("nk", String(20), nullable=False),
+        Column("ta_type", String(20), nullable=False),
+        Column("owner", String(20), nullable=False),
+        Column("updated_at", DateTime),
+        PrimaryKeyConstraint("symbol", "nk", "ta_type", "owner"),
+    )
+
+
+class Subscriptions:
+    """Persisted (symbol, nk, ta_type, owner) subscriptions, restored at startup."""
+
+    __lock__ = threading.Lock()
+    __tables__: dict[str, Table] = {}
+
+    @classmethod
+    def create(cls, engine: Engine) -> Table:
+        with cls.__lock__:
+            table = cls.__tables__.get(str(engine.url))
+            if table is None:
+                table = create_config_table(engine, get_subscription_table())
+                cls.__tables__[str(engine.url)] = table
+        return table
+
+    @classmethod
+    def resolve(cls, executor) -> Table:
+        return resolve_config_table(cls, executor)
+
+    @classmethod
+    def update(cls, executor, added: list[tuple], removed: list[tuple]) -> None:
+        """Store ``added`` and delete ``removed`` (symbol, nk, ta_type, owner)."""
+        table = cls.resolve(executor)
+        columns = ["symbol", "nk", "ta_type", "owner"]
+        if added:
+            now = datetime.now()
+            rows = [{**dict(zip(columns, key)), "updated_at": now} for key in added]
+            if Watermark.engine_of(executor).dialect.name in ["mysql", "mariadb"]:
+                stmt = mysql_insert(table).prefix_with("IGNORE")
+            else:
+                stmt = sqlite_insert(table).on_conflict_do_nothing(
+                    index_elements=[table.c[c] for c in columns]
+                )
+            executor.execute(stmt, rows)
+        if removed:
+            stmt = table.delete().where(
+                table.c.symbol == bindparam("b_symbol"),
+                table.c.nk == bindparam("b_nk"),
+                table.c.ta_type == bindparam("b_ta_type"),
+                table.c.owner == bindparam("b_owner"),
+            )
+            executor.execute(
+                stmt, [{f"b_{c}": v for c, v in zip(columns, key)} for key in removed]
+            )
+
+    @classmethod
+    def all(cls, executor) -> list[tuple]:
+        table = cls.resolve(executor)
+        stmt = select(table.c.symbol, table.c.nk, table.c.ta_type, table.c.owner)
+        if not isinstance(executor, (Session, Connection)):
+            with executor.connect() as conn:
+                return [tuple(row) for row in conn.execute(stmt)]
+        return [tuple(row) for row in executor.execute(stmt)]
+
+
 class OHLCTable:
+    # Symbol tables already known to exist, keyed by (database url, schema)
+    __lock__ = threading.Lock()
+    __known__: dict[tuple[str, str], dict[str, Table]] = {}
+    __metadata__: dict[tuple[str, str], MetaData] = {}
+    __counters__: dict[str, int] = {"ddl_checks": 0, "ddl_checks_avoided": 0}
+
+    @staticmethod
+    def cache_key(bind) -> tuple[str, str]:
+        engine = getattr(bind, "engine", bind)
+        return str(engine.url), settings.schemas.OHLC
+
+    @classmethod
+    def load(cls, bind) -> int:
+        """Register every symbol table already present in the OHLC schema."""
+        key = cls.cache_key(bind)
+        names = inspect(bind).get_table_names(schema=key[1])
+        with cls.__lock__:
+            metadata = cls.__metadata__.setdefault(key, MetaData(schema=key[1]))
+            tables = cls.__known__.setdefault(key, {})
+            for name in names:
+                if name not in tables:
+                    tables[name] = cls.get(name, metadata)
+        return len(names)
+
+    @classmethod
+    def resolve(cls, bind, table_name: str) -> Table:
+        key = cls.cache_key(bind)
+        if key not in cls.__known__:
+            cls.load(bind)
+        table = cls.__known__[key].get(table_name)
+        if table is not None:
+            cls.__counters__["ddl_checks_avoided"] += 1
+            return table
+        with cls.__lock__:
+            tables = cls.__known__[key]
+            table = tables.get(table_name)
+            if table is None:
+                metadata = cls.__metadata__[key]
+                table = cls.get(table_name, metadata)
+                try:
+                    table.create(bind, checkfirst=True)
+                except Exception:
+                    # Keep the name free so the next call can try again
+                    metadata.remove(table)
+                    raise
+                cls.__counters__["ddl_checks"] += 1
+                tables[table_name] = table
+        return table
+
+    @classmethod
+    def known(cls, bind) -> list[str]:
+        key = cls.cache_key(bind)
+        if key not in cls.__known__:
+            cls.load(bind)
+        return sorted(cls.__known__[key])
+
+    @classmethod
+    def forget(cls, bind=None) -> None:
+        with cls.__lock__:
+            if bind is None:
+                cls.__known__.clear()
+                cls.__metadata__.clear()
+            else:
+                key = cls.cache_key(bind)
+                cls.__known__.pop(key, None)
+                cls.__metadata__.pop(key, None)
+
+    @classmethod
+    def stats(cls) -> dict:
+        known = sum(len(tables) for tables in cls.__known__.values())
+        return {"known_tables": known, **cls.__counters__}
+
     @classmethod
     def create(cls, db: Session, table_name: str):
-        table = cls.get(table_name)
-        table.create(db.bind, checkfirst=True)
+        cls.resolve(db.bind, table_name)
 
     @staticmethod
     def get(table_name: str, metadata: MetaData = None) -> Table:
@@ -65,36 +570,593 @@ class OHLCTable:
         table_name = data[0]["Product"]
         if not table_name:
             raise SyntaxError(f"No product name found in {data}")
-        table = cls.get(table_name)
-        table.create(db.bind, checkfirst=True)
-        stmt = table.insert().values(data)
-        db.execute(stmt)
-        db.commit()
+        with metrics.db_write(Watermark.OHLC, "insert"):
+            table = cls.resolve(db.bind, table_name)
+            stmt = table.insert().values(data)
+            db.execute(stmt)
+            marks = Watermark.marks({table_name: data}, {table_name: len(data)})
+            Watermark.update(db, Watermark.OHLC, marks)
+            Completeness.update(db, Completeness.marks({table_name: data}))
+            db.commit()
+        metrics.DB_ROWS.inc(Watermark.OHLC, table_name, amount=len(data))
 
     @classmethod
     def insert_ignore(cls, db: Session, data: list[dict]) -> None:
         table_name = data[0]["Product"]
         if not table_name:
             raise SyntaxError(f"No product name found in {data}")
-        table = cls.get(table_name)
-        table.create(db.bind, checkfirst=True)
+        with metrics.db_write(Watermark.OHLC, "insert_ignore"):
+            inserted = cls.__execute_ignore__(db, table_name, data)
+            marks = Watermark.marks({table_name: data}, {table_name: inserted})
+            Watermark.update(db, Watermark.OHLC, marks)
+            Completeness.update(db, Completeness.marks({table_name: data}))
+            db.commit()
+        metrics.DB_ROWS.inc(Watermark.OHLC, table_name, amount=inserted)
+
+    @classmethod
+    def insert_ignore_many(cls, db: Session, data: dict[str, list[dict]]) -> int:
+        """Insert rows for several symbols in a single transaction."""
+        count = 0
+        inserted = {}
+        with metrics.db_write(Watermark.OHLC, "insert_ignore_many"):
+            for table_name, rows in data.items():
+                if not table_name:
+                    raise SyntaxError(f"No product name found in {rows}")
+                if rows:
+                    inserted[table_name] = cls.__execute_ignore__(db, table_name, rows)
+                    count += len(rows)
+            Watermark.update(db, Watermark.OHLC, Watermark.marks(data, inserted))
+            Completeness.update(db, Completeness.marks(data))
+            db.commit()
+        for table_name, rows in inserted.items():
+            metrics.DB_ROWS.inc(Watermark.OHLC, table_name, amount=rows)
+        return count
+
+    @classmethod
+    def __execute_ignore__(cls, db: Session, table_name: str, data: list[dict]) -> int:
+        table = cls.resolve(db.bind, table_name)
         if db.bind.dialect.name in ["mysql", "mariadb"]:
             stmt = table.insert().prefix_with("IGNORE")
-            db.execute(stmt, data)
+            result = db.execute(stmt, data)
         elif db.bind.dialect.name in ["sqlite", "postgresql"]:
             stmt = sqlite_insert(table).on_conflict_do_nothing(
                 index_elements=[table.c.datetime]
             )
             stmt = stmt.values(data)
-            db.execute(stmt)
-        db.commit()
+            result = db.execute(stmt)
+        else:
+            raise NotImplementedError(
+                f"Dialect {db.bind.dialect.name} is not supported"
+            )
+        # Drivers report -1 when the affected row count is unknown
+        return result.rowcount if result.rowcount >= 0 else len(data)
+
+    @classmethod
+    def __select__(
+        cls, db: Session, symbol: str, start: datetime, end: datetime
+    ) -> Select | None:
+        key = cls.cache_key(db.bind)
+        if key not in cls.__known__:
+            cls.load(db.bind)
+        table = cls.__known__[key].get(symbol)
+        if table is None:
+            return
+        stmt = select(table).order_by(table.c.datetime)
+        if start is not None:
+            stmt = stmt.where(table.c.datetime >= start)
+        if end is not None:
+            stmt = stmt.where(table.c.datetime <= end)
+        return stmt
+
+    @classmethod
+    def read(
+        cls,
+        db: Session,
+        symbol: str,
+        start: datetime = None,
+        end: datetime = None,
+    ) -> list[dict]:
+        stmt = cls.__select__(db, symbol, start, end)
+        if stmt is None:
+            return []
+        return [dict(row._mapping) for row in db.execute(stmt)]
+
+    @classmethod
+    def read_columns(
+        cls,
+        db: Session,
+        symbol: str,
+        start: datetime = None,
+        end: datetime = None,
+    ) -> dict[str, list]:
+        """Rows of ``symbol`` as ``{column: values}``."""
+        stmt = cls.__select__(db, symbol, start, end)
+        if stmt is None:
+            return {}
+        return columns_of(db.execute(stmt))
+
+    @classmethod
+    def dates(cls, db: Session, symbol: str) -> list[int]:
+        """Distinct session dates stored for ``symbol``."""
+        key = cls.cache_key(db.bind)
+        if key not in cls.__known__:
+            cls.load(db.bind)
+        table = cls.__known__[key].get(symbol)
+        if table is None:
+            return []
+        stmt = select(table.c.Date).distinct()
+        return [d for d in db.execute(stmt).scalars() if d is not None]
+
+
+class OHLCFactTable:
+    """Single OHLC table for every symbol keyed by (Product, datetime).
+
+    On PostgreSQL the table is range partitioned by month on ``datetime`` and
+    partitions are created the first time a month is written. Exposes the same
+    insert and read interface as OHLCTable so callers can target either layout.
+    """
+
+    __lock__ = threading.Lock()
+    __tables__: dict[str, Table] = {}
+    __partitions__: dict[str, set[str]] = {}
+
+    @staticmethod
+    def get(metadata: MetaData = None) -> Table:
+        if metadata is None:
+            metadata = MetaData(schema=settings.schemas.OHLC_FACT)
+        return Table(
+            settings.OHLC_FACT_TABLE,
+            metadata,
+            Column("datetime", DateTime, nullable=False),
+            Column("Date", Integer),
+            Column("Product", String(20), nullable=False),
+            Column("TimeSn", Integer),
+            Column("TimeSn_Dply", Integer),
+            Column("Quantity", Integer),
+            Column("Volume", Integer),
+            Column("OPrice", Float),
+            Column("HPrice", Float),
+            Column("LPrice", Float),
+            Column("CPrice", Float),
+            PrimaryKeyConstraint("Product", "datetime"),
+            Index(f"ix_{settings.OHLC_FACT_TABLE}_datetime", "datetime"),
+            postgresql_partition_by="RANGE (datetime)",
+        )
+
+    @classmethod
+    def resolve(cls, bind) -> Table:
+        key = str(getattr(bind, "engine", bind).url)
+        table = cls.__tables__.get(key)
+        if table is not None:
+            return table
+        with cls.__lock__:
+            table = cls.__tables__.get(key)
+            if table is None:
+                table = cls.get()
+                table.create(bind, checkfirst=True)
+                cls.__tables__[key] = table
+                cls.__partitions__[key] = set()
+        return table
+
+    @staticmethod
+    def partition_bounds(dt: datetime) -> tuple[datetime, datetime]:
+        start = datetime(dt.year, dt.month, 1)
+        if dt.month == 12:
+            return start, datetime(dt.year + 1, 1, 1)
+        return start, datetime(dt.year, dt.month + 1, 1)
+
+    @classmethod
+    def ensure_partitions(cls, bind, datetimes: Iterable[datetime]) -> None:
+        if bind.dialect.name != "postgresql":
+            return
+        table = cls.resolve(bind)
+        key = str(getattr(bind, "engine", bind).url)
+        known = cls.__partitions__[key]
+        months = {(dt.year, dt.month): dt for dt in datetimes}
+        prep = bind.dialect.identifier_preparer
+        for (year, month), dt in months.items():
+            name = f"{table.name}_{year}{month:02d}"
+            if name in known:
+                continue
+            with cls.__lock__:
+                if name in known:
+                    continue
+                start, end = cls.partition_bounds(dt)
+                stmt = text(
+                    f"CREATE TABLE IF NOT EXISTS "
+                    f"{prep.quote_schema(table.schema)}.{prep.quote(name)} "
+                    f"PARTITION OF {prep.format_table(table)} "
+                    f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+                )
+                with bind.engine.begin() as conn:
+                    conn.execute(stmt)
+                known.add(name)
+
+    @classmethod
+    def insert_ignore(cls, db: Session, data: list[dict]) -> None:
+        cls.insert_ignore_many(db, {data[0]["Product"]: data})
+
+    @classmethod
+    def insert_ignore_many(cls, db: Session, data: dict[str, list[dict]]) -> int:
+        grouped = {}
+        for symbol, rows_ in data.items():
+            if not symbol:
+                raise SyntaxError(f"No product name found in {rows_}")
+            if rows_:
+                grouped[symbol] = [{**row, "Product": symbol} for row in rows_]
+        rows = [row for rows_ in grouped.values() for row in rows_]
+        if not rows:
+            return 0
+        with metrics.db_write(Watermark.OHLC, "insert_ignore_many"):
+            table = cls.resolve(db.bind)
+            cls.ensure_partitions(db.bind, (row["datetime"] for row in rows))
+            dialect = db.bind.dialect.name
+            if dialect in ["mysql", "mariadb"]:
+                # Only the affected row count of a whole statement is reported
+                stmt = table.insert().prefix_with("IGNORE")
+                inserted = {
+                    symbol: db.execute(stmt, rows_).rowcount
+                    for symbol, rows_ in grouped.items()
+                }
+            elif dialect in ["sqlite", "postgresql"]:
+                stmt = sqlite_insert(table).on_conflict_do_nothing(
+                    index_elements=[table.c.Product, table.c.datetime]
+                )
+                # Skipped duplicates return nothing, so the products of the
+                # returned rows count what was actually inserted
+                stmt = stmt.returning(table.c.Product)
+                counts = Counter(db.execute(stmt, rows).scalars())
+                inserted = {symbol: counts.get(symbol, 0) for symbol in grouped}
+            else:
+                raise NotImplementedError(f"Dialect {dialect} is not supported")
+            Watermark.update(db, Watermark.OHLC, Watermark.marks(data, inserted))
+            Completeness.update(db, Completeness.marks(data))
+            db.commit()
+        # Labelled by symbol like the per-symbol tables, whatever the layout
+        for symbol, count in inserted.items():
+            metrics.DB_ROWS.inc(Watermark.OHLC, symbol, amount=count)
+        return len(rows)
+
+    @classmethod
+    def __select__(
+        cls, db: Session, symbol: str, start: datetime, end: datetime
+    ) -> Select:
+        table = cls.resolve(db.bind)
+        stmt = (
+            select(table).where(table.c.Product == symbol).order_by(table.c.datetime)
+        )
+        if start is not None:
+            stmt = stmt.where(table.c.datetime >= start)
+        if end is not None:
+            stmt = stmt.where(table.c.datetime <= end)
+        return stmt
+
+    @classmethod
+    def read(
+        cls,
+        db: Session,
+        symbol: str,
+        start: datetime = None,
+        end: datetime = None,
+    ) -> list[dict]:
+        stmt = cls.__select__(db, symbol, start, end)
+        return [dict(row._mapping) for row in db.execute(stmt)]
+
+    @classmethod
+    def read_columns(
+        cls,
+        db: Session,
+        symbol: str,
+        start: datetime = None,
+        end: datetime = None,
+    ) -> dict[str, list]:
+        """Rows of ``symbol`` as ``{column: values}``."""
+        return columns_of(db.execute(cls.__select__(db, symbol, start, end)))
+
+    @classmethod
+    def dates(cls, db: Session, symbol: str) -> list[int]:
+        table = cls.resolve(db.bind)
+        stmt = select(table.c.Date).where(table.c.Product == symbol).distinct()
+        return [d for d in db.execute(stmt).scalars() if d is not None]
+
+
+class OHLCPeriodTable:
+    """Bars of several minutes rebuilt from ticks, one table per period.
+
+    The ``{OHLC_FACT_TABLE}_{period}m`` tables sit next to the fact table and
+    are keyed by (Product, datetime) whatever ``OHLC_LAYOUT`` is. They carry no
+    watermark or completeness, which describe the 1m bars.
+    """
+
+    __lock__ = threading.Lock()
+    __tables__: dict[tuple[str, int], Table] = {}
+
+    @staticmethod
+    def name(period: int) -> str:
+        return f"{settings.OHLC_FACT_TABLE}_{period}m"
+
+    @classmethod
+    def get(cls, period: int, metadata: MetaData = None) -> Table:
+        if metadata is None:
+            metadata = MetaData(schema=settings.schemas.OHLC_FACT)
+        name = cls.name(period)
+        return Table(
+            name,
+            metadata,
+            Column("datetime", DateTime, nullable=False),
+            Column("Date", Integer),
+            Column("Product", String(20), nullable=False),
+            Column("TimeSn", Integer),
+            Column("TimeSn_Dply", Integer),
+            Column("Quantity", Integer),
+            Column("Volume", Integer),
+            Column("OPrice", Float),
+            Column("HPrice", Float),
+            Column("LPrice", Float),
+            Column("CPrice", Float),
+            PrimaryKeyConstraint("Product", "datetime"),
+            Index(f"ix_{name}_datetime", "datetime"),
+        )
+
+    @classmethod
+    def resolve(cls, bind, period: int) -> Table:
+        key = str(getattr(bind, "engine", bind).url), period
+        table = cls.__tables__.get(key)
+        if table is not None:
+            return table
+        with cls.__lock__:
+            table = cls.__tables__.get(key)
+            if table is None:
+                table = cls.get(period)
+                table.create(bind, checkfirst=True)
+                cls.__tables__[key] = table
+        return table
+
+    @classmethod
+    def insert_ignore_many(
+        cls, db: Session, period: int, data: dict[str, list[dict]]
+    ) -> int:
+        """Insert the bars of several symbols and return how many were new."""
+        grouped = {
+            symbol: [{**row, "Product": symbol} for row in rows_]
+            for symbol, rows_ in data.items()
+            if rows_
+        }
+        rows = [row for rows_ in grouped.values() for row in rows_]
+        if not rows:
+            return 0
+        with metrics.db_write(Watermark.OHLC, "insert_ignore_many"):
+            table = cls.resolve(db.bind, period)
+            dialect = db.bind.dialect.name
+            if dialect in ["mysql", "mariadb"]:
+                # Only the affected row count of a whole statement is reported
+                stmt = table.insert().prefix_with("IGNORE")
+                inserted = {
+                    symbol: db.execute(stmt, rows_).rowcount
+                    for symbol, rows_ in grouped.items()
+                }
+            elif dialect in ["sqlite", "postgresql"]:
+                stmt = sqlite_insert(table).on_conflict_do_nothing(
+                    index_elements=[table.c.Product, table.c.datetime]
+                )
+                stmt = stmt.returning(table.c.Product)
+                counts = Counter(db.execute(stmt, rows).scalars())
+                inserted = {symbol: counts.get(symbol, 0) for symbol in grouped}
+            else:
+                raise NotImplementedError(f"Dialect {dialect} is not supported")
+            db.commit()
+        dataset = f"{Watermark.OHLC}_{period}m"
+        for symbol, count in inserted.items():
+            metrics.DB_ROWS.inc(dataset, symbol, amount=count)
+        return sum(inserted.values())
+
+    @classmethod
+    def read(
+        cls,
+        db: Session,
+        period: int,
+        symbol: str,
+        start: datetime = None,
+        end: datetime = None,
+    ) -> list[dict]:
+        table = cls.resolve(db.bind, period)
+        stmt = (
+            select(table).where(table.c.Product == symbol).order_by(table.c.datetime)
+        )
+        if start is not None:
+            stmt = stmt.where(table.c.datetime >= start)
+        if end is not None:
+            stmt = stmt.where(table.c.datetime <= end)
+        return [dict(row._mapping) for row in db.execute(stmt)]
+
+
+def get_ohlc_store(
+    layout: Literal["per_symbol", "partitioned"] = None
+) -> type[OHLCTable] | type[OHLCFactTable]:
+    layout = settings.OHLC_LAYOUT if layout is None else layout
+    return OHLCFactTable if layout == "partitioned" else OHLCTable
+
+
+def attach_sqlite_schemas(dbapi_connection, connection_record) -> None:
+    """Attach ``<schema>.db`` next to the database file per configured schema.
+
+    sqlite has no schemas, this lets the schema qualified tables live in
+    sqlite files, as the tests and benchmarks do.
+    """
+    database = dbapi_connection.execute("PRAGMA database_list").fetchone()[2]
+    if not database:
+        # In-memory databases have no directory to put the schemas in
+        return
+    directory = os.path.dirname(database)
+    for schema in settings.schemas.model_dump().values():
+        path = os.path.join(directory, f"{schema}.db")
+        dbapi_connection.execute(f"ATTACH DATABASE '{path}' AS \"{schema}\"")
+
+
+class EngineRegistry:
+    """Process-wide cache of engines and sessionmakers keyed by database name.
+
+    Every writer and reader resolves its engine through here so they share one
+    bounded connection pool per database instead of building a new engine per
+    call.
+    """
+
+    __lock__ = threading.Lock()
+    __engines__: dict[str, Engine] = {}
+    __sessionmakers__: dict[str, sessionmaker] = {}
+    __counters__: dict[str, dict[str, int]] = {}
+    # Databases whose bookkeeping tables exist
+    __prepared__: set[str] = set()
+
+    @staticmethod
+    def url(db_name: str = None) -> str:
+        db_name = settings.DB_NAME if db_name is None else db_name
+        return f"{settings.secrets.URI}/{db_name}"
+
+    @staticmethod
+    def pool_kwargs(url: str) -> dict:
+        pool = settings.pool
+        kwargs = {"pool_pre_ping": pool.PRE_PING, "pool_recycle": pool.RECYCLE}
+        url_ = make_url(url)
+        in_memory = url_.database in (None, "", ":memory:")
+        if url_.get_backend_name() == "sqlite" and in_memory:
+            # In-memory sqlite uses a singleton pool without overflow settings
+            return kwargs
+        kwargs.update(
+            {
+                "pool_size": pool.SIZE,
+                "max_overflow": pool.MAX_OVERFLOW,
+                "pool_timeout": pool.TIMEOUT,
+            }
+        )
+        return kwargs
+
+    @classmethod
+    def get_engine(cls, db_name: str = None) -> Engine:
+        key = settings.DB_NAME if db_name is None else db_name
+        engine = cls.__engines__.get(key)
+        if engine is not None:
+            return engine
+        with cls.__lock__:
+            engine = cls.__engines__.get(key)
+            if engine is None:
+                url = cls.url(key)
+                engine = create_engine(url, **cls.pool_kwargs(url))
+                if engine.dialect.name == "sqlite":
+                    event.listen(engine, "connect", attach_sqlite_schemas)
+                cls.__register_counters__(key, engine)
+                cls.__engines__[key] = engine
+        if key not in cls.__prepared__:
+            cls.__create_tables__(key, engine)
+        return engine
+
+    @classmethod
+    def __create_tables__(cls, key: str, engine: Engine) -> None:
+        """Create the bookkeeping tables before any writer opens a transaction.
+
+        A database that is down is retried by the next ``get_engine``.
+        """
+        with cls.__lock__:
+            if key in cls.__prepared__:
+                return
+            try:
+                for table in (Watermark, Completeness, Subscriptions):
+                    table.create(engine)
+            except exc.SQLAlchemyError as e:
+                logger.warning(f"Creating bookkeeping tables of {key} failed: {e}")
+                return
+            cls.__prepared__.add(key)
+
+    @classmethod
+    def get_sessionmaker(cls, db_name: str = None) -> sessionmaker:
+        key = settings.DB_NAME if db_name is None else db_name
+        engine = cls.get_engine(key)
+        maker = cls.__sessionmakers__.get(key)
+        if maker is not None:
+            return maker
+        with cls.__lock__:
+            maker = cls.__sessionmakers__.get(key)
+            if maker is None:
+                maker = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+                cls.__sessionmakers__[key] = maker
+        return maker
+
+    @classmethod
+    def __register_counters__(cls, key: str, engine: Engine) -> None:
+        counters = {"connects": 0, "checkouts": 0, "checkins": 0, "invalidated": 0}
+        cls.__counters__[key] = counters
+
+        def on_connect(*args):
+            counters["connects"] += 1
+
+        def on_checkout(*args):
+            counters["checkouts"] += 1
+
+        def on_checkin(*args):
+            counters["checkins"] += 1
+
+        def on_invalidate(*args):
+            counters["invalidated"] += 1
+
+        event.listen(engine, "connect", on_connect)
+        event.listen(engine, "checkout", on_checkout)
+        event.listen(engine, "checkin", on_checkin)
+        event.listen(engine, "invalidate", on_invalidate)
+
+    @classmethod
+    def warm(cls, db_name: str = None, connections: int = None) -> int:
+        """Open ``connections`` pooled connections up front and return them."""
+        engine = cls.get_engine(db_name)
+        connections = settings.pool.WARM if connections is None else connections
+        opened = []
+        try:
+            for _ in range(connections):
+                conn = engine.connect()
+                conn.execute(text("SELECT 1"))
+                opened.append(conn)
+        except exc.SQLAlchemyError as e:
+            logger.warning(f"Pool warm-up of {engine.url.database} failed: {e}")
+        finally:
+            for conn in opened:
+                conn.close()
+        return len(opened)
+
+    @classmethod
+    def stats(cls) -> dict[str, dict]:
+        result = {}
+        for key, engine in list(cls.__engines__.items()):
+            pool = engine.pool
+            info = {"pool": pool.__class__.__name__, "status": pool.status()}
+            for name in ["size", "checkedin", "checkedout", "overflow"]:
+                func = getattr(pool, name, None)
+                if callable(func):
+                    info[name] = func()
+            info.update(cls.__counters__.get(key, {}))
+            result[key] = info
+        return result
+
+    @classmethod
+    def dispose(cls, close: bool = True) -> None:
+        """Drop every cached engine.
+
+        ``close=False`` leaves checked-in connections open, which is what a
+        forked child needs so it does not close sockets owned by its parent.
+        """
+        with cls.__lock__:
+            for engine in cls.__engines__.values():
+                engine.dispose(close=close)
+            cls.__engines__.clear()
+            cls.__sessionmakers__.clear()
+            cls.__counters__.clear()
+            cls.__prepared__.clear()
 
 
-def get_db() -> type[Session]:
-    uri = settings.secrets.URI
-    db_name = settings.DB_NAME
-    engine = create_engine(f"{uri}/{db_name}")
-    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def get_engine(db_name: str = None) -> Engine:
+    return EngineRegistry.get_engine(db_name)
+
+
+def get_db(db_name: str = None) -> type[Session]:
+    return EngineRegistry.get_sessionmaker(db_name)
 
 
 def get_latest_datetime(session: Session, table: Table):
@@ -142,12 +1204,104 @@ class TASqldb:
         )
 
 
+@dataclass
+class LoadReport:
+    table: str
+    method: str
+    rows: int = 0
+    inserted: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def dict(self):
+        return {
+            "table": self.table,
+            "method": self.method,
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "seconds": self.seconds,
+            "rows_per_sec": self.rows_per_sec,
+        }
+
+
+class CopyStream:
+    """Read-only file object that renders rows as CSV lazily for COPY FROM STDIN."""
+
+    def __init__(self, rows: Iterable, columns: list[str]):
+        self.rows = iter(rows)
+        self.columns = columns
+        self.buffer = ""
+        self.__line__ = io.StringIO()
+        self.__writer__ = csv.writer(self.__line__, lineterminator="\n")
+
+    def __render__(self, row) -> str:
+        values = []
+        for column in self.columns:
+            value = row_value(row, column)
+            if value is None:
+                value = ""
+            elif isinstance(value, datetime):
+                value = value.isoformat(sep=" ")
+            elif isinstance(value, bool):
+                value = "t" if value else "f"
+            values.append(value)
+        self.__line__.seek(0)
+        self.__line__.truncate(0)
+        self.__writer__.writerow(values)
+        return self.__line__.getvalue()
+
+    def read(self, size: int = -1) -> str:
+        lines = [self.buffer]
+        length = len(self.buffer)
+        while size < 0 or length < size:
+            try:
+                line = self.__render__(next(self.rows))
+            except StopIteration:
+                break
+            lines.append(line)
+            length += len(line)
+        data = "".join(lines)
+        if size < 0:
+            self.buffer = ""
+            return data
+        self.buffer = data[size:]
+        return data[:size]
+
+    readline = read
+
+
+def columns_of(result) -> dict[str, list]:
+    """Transpose a query result into ``{column: values}`` without a dict per row."""
+    # Keys may be quoted_name, a str subclass orjson refuses as a dict key
+    names = [str(name) for name in result.keys()]
+    rows = result.all()
+    if not rows:
+        return {name: [] for name in names}
+    return dict(zip(names, map(list, zip(*rows))))
+
+
+def row_value(row, column: str):
+    if isinstance(row, dict):
+        return row.get(column)
+    return getattr(row, column, None)
+
+
 class BaseSqlHandler:
     DB_NAME = None  # Override this
+    KEY_COLUMNS: tuple[str, ...] = ("datetime",)  # Override this
+    DATASET = None  # Override this
+    CHUNK_SIZE = 10000
 
     def __init__(self):
         self.api_conn = None
 
+    # Both targets share the configured server, pooled through the registry
+    def engine_by_str(self, target: Literal["local", "remote"]) -> Engine:
+        return get_engine(self.DB_NAME)
+
     # Override this to generate the table for sqlalchemy
     def table_maker(self, table_name: str, metadata: MetaData) -> Table:
         pass
@@ -163,38 +1317,205 @@ class BaseSqlHandler:
         data,
         target: Literal["local", "remote", "all"],
         method: Literal["ignore", "replace"] = "ignore",
-    ) -> None:
+    ) -> int:
+        """Insert ``data`` in one transaction per target.
+
+        KEY_COLUMNS are indexed but not unique, so there is no conflict target
+        to upsert on: ``ignore`` skips rows whose keys are already stored and
+        ``replace`` deletes them before inserting every row. Returns the rows
+        written to the last target.
+        """
         if target == "all":
-            target = ["local", "remote"]
+            targets = ["local", "remote"]
         else:
             targets = [target]
+        inserted = 0
         for target in targets:
             engine = self.engine_by_str(target)
-            metadata = MetaData()
-            table = self.table_maker(table_name, metadata)
-            metadata.create_all(engine)
-            with engine.connect() as conn:
-                if engine.dialect.name == "mysql":
-                    # pref_ = method
-                    insert_stmt = mysql_insert(table).values(data)
-                    stmt = insert_stmt.on_duplicate_key_update(
-                        data=insert_stmt.inserted.items(), status="U"
+            table = self.ensure_table(engine, table_name)
+            logger.debug(f"Inserting {len(data)} rows into {table_name}")
+            with metrics.db_write(self.DATASET, "insert"):
+                if method == "replace":
+                    inserted = self.__replace__(engine, table, data)
+                else:
+                    inserted = self.__chunked_insert__(
+                        engine, table, data, self.CHUNK_SIZE
                     )
+            metrics.DB_ROWS.inc(self.DATASET, table_name, amount=inserted)
+        return inserted
 
-                elif engine.dialect.name == "sqlite":
-                    stmt = (
-                        sqlite_insert(table)
-                        .on_conflict_do_nothing(index_elements=[table.c.datetime])
-                        .values(data)
-                    )
-                print(stmt)
-                conn.execute(stmt)
-                conn.commit()
+    def update_watermark(self, conn, table_name: str, data: list, inserted: int):
+        if self.DATASET is None:
+            return
+        marks = Watermark.marks({table_name: data}, {table_name: inserted})
+        Watermark.update(conn, self.DATASET, marks)
+
+    def ensure_table(self, engine: Engine, table_name: str) -> Table:
+        metadata = MetaData()
+        table = self.table_maker(table_name, metadata)
+        metadata.create_all(engine)
+        return table
+
+    def bulk_load(
+        self,
+        table_name: str,
+        data: list,
+        target: Literal["local", "remote", "all"] = "remote",
+        chunk_size: int = None,
+    ) -> list[LoadReport]:
+        """Load ``data`` skipping rows whose KEY_COLUMNS are already stored.
+
+        PostgreSQL streams the rows through COPY FROM STDIN into a temporary
+        staging table and merges it in one statement, other dialects fall back
+        to chunked executemany inserts.
+        """
+        chunk_size = self.CHUNK_SIZE if chunk_size is None else chunk_size
+        targets = ["local", "remote"] if target == "all" else [target]
+        reports = []
+        for target in targets:
+            engine = self.engine_by_str(target)
+            table = self.ensure_table(engine, table_name)
+            start = time.perf_counter()
+            if engine.dialect.name == "postgresql":
+                method = "copy"
+                with metrics.db_write(self.DATASET, method):
+                    inserted = self.__copy_merge__(engine, table, data)
+            else:
+                method = "executemany"
+                with metrics.db_write(self.DATASET, method):
+                    inserted = self.__chunked_insert__(engine, table, data, chunk_size)
+            metrics.DB_ROWS.inc(self.DATASET, table_name, amount=inserted)
+            report = LoadReport(
+                table=table_name,
+                method=method,
+                rows=len(data),
+                inserted=inserted,
+                seconds=time.perf_counter() - start,
+            )
+            logger.info(
+                f"{method} {table_name}: {report.inserted}/{report.rows} rows "
+                f"in {report.seconds:.3f}s ({report.rows_per_sec:.0f} rows/s)"
+            )
+            reports.append(report)
+        return reports
+
+    def __columns__(self, table: Table) -> list[str]:
+        return [c.name for c in table.columns if not c.primary_key]
+
+    def __copy_merge__(self, engine: Engine, table: Table, data: list) -> int:
+        prep = engine.dialect.identifier_preparer
+        columns = self.__columns__(table)
+        cols = ", ".join(prep.quote(c) for c in columns)
+        target = prep.format_table(table)
+        staging = prep.quote(f"staging_{table.name}")
+        match = " AND ".join(
+            f"t.{prep.quote(k)} = s.{prep.quote(k)}" for k in self.KEY_COLUMNS
+        )
+        with engine.begin() as conn:
+            cursor = conn.connection.cursor()
+            cursor.execute(
+                f"CREATE TEMP TABLE {staging} ON COMMIT DROP AS "
+                f"SELECT {cols} FROM {target} WITH NO DATA"
+            )
+            if isinstance(data, pd.DataFrame):
+                stream = io.StringIO(data[columns].to_csv(header=False, index=False))
+            else:
+                stream = CopyStream(data, columns)
+            cursor.copy_expert(
+                f"COPY {staging} ({cols}) FROM STDIN WITH (FORMAT csv)", stream
+            )
+            cursor.execute(
+                f"INSERT INTO {target} ({cols}) SELECT {cols} FROM {staging} s "
+                f"WHERE NOT EXISTS (SELECT 1 FROM {target} t WHERE {match})"
+            )
+            inserted = cursor.rowcount
+            cursor.close()
+            self.update_watermark(conn, table.name, data, inserted)
+        return inserted
+
+    def __rows__(self, table: Table, data) -> list[dict]:
+        columns = self.__columns__(table)
+        if isinstance(data, pd.DataFrame):
+            return data[columns].to_dict("records")
+        return [{c: row_value(row, c) for c in columns} for row in data]
+
+    def __replace__(self, engine: Engine, table: Table, data) -> int:
+        rows = self.__rows__(table, data)
+        if not rows:
+            return 0
+        keys = tuple_(*(table.c[k] for k in self.KEY_COLUMNS))
+        deleted = 0
+        with engine.begin() as conn:
+            for i in range(0, len(rows), self.CHUNK_SIZE):
+                chunk = rows[i : i + self.CHUNK_SIZE]
+                stored = [tuple(row[k] for k in self.KEY_COLUMNS) for row in chunk]
+                deleted += conn.execute(delete(table).where(keys.in_(stored))).rowcount
+                conn.execute(insert(table), chunk)
+            # The watermark counts stored rows, replaced ones are not new
+            self.update_watermark(conn, table.name, data, len(rows) - deleted)
+        return len(rows)
+
+    def __chunked_insert__(
+        self, engine: Engine, table: Table, data: list, chunk_size: int
+    ) -> int:
+        rows = self.__rows__(table, data)
+        if not rows:
+            return 0
+        keys = [table.c[k] for k in self.KEY_COLUMNS]
+        datetimes = [row["datetime"] for row in rows]
+        with engine.begin() as conn:
+            stmt = select(*keys).where(
+                table.c.datetime.between(min(datetimes), max(datetimes))
+            )
+            existing = set(tuple(r) for r in conn.execute(stmt))
+            rows = [
+                row
+                for row in rows
+                if tuple(row[k] for k in self.KEY_COLUMNS) not in existing
+            ]
+            for i in range(0, len(rows), chunk_size):
+                conn.execute(insert(table), rows[i : i + chunk_size])
+            self.update_watermark(conn, table.name, data, len(rows))
+        return len(rows)
+
+    def read_columns(
+        self,
+        table_name: str,
+        start: datetime = None,
+        end: datetime = None,
+        target: Literal["local", "remote"] = "remote",
+    ) -> dict[str, list]:
+        """Rows of ``table_name`` in key order as ``{column: values}``."""
+        engine = self.engine_by_str(target)
+        if not inspect(engine).has_table(table_name):
+            return {}
+        table = self.table_maker(table_name, metadata=MetaData())
+        # The surrogate id carries nothing for the reader
+        columns = [column for column in table.c if column.name != "id"]
+        stmt = select(*columns).order_by(*(table.c[k] for k in self.KEY_COLUMNS))
+        if start is not None:
+            stmt = stmt.where(table.c.datetime >= start)
+        if end is not None:
+            stmt = stmt.where(table.c.datetime <= end)
+        with engine.connect() as conn:
+            return columns_of(conn.execute(stmt))
+
+    def get_latest_dates(
+        self, target: Literal["local", "remote"] = "remote"
+    ) -> dict[str, datetime]:
+        engine = self.engine_by_str(target)
+        marks = Watermark.bulk(engine, self.DATASET)
+        return {symbol: mark["latest"] for symbol, mark in marks.items()}
 
     def get_latest_date(
         self, table_name: str, target: Literal["local", "remote", "all"]
     ) -> datetime | None:
         engine = self.engine_by_str(target)
+        if self.DATASET is not None:
+            dt = Watermark.get(engine, table_name, self.DATASET)
+            if dt is not None:
+                return dt
+        # Tables written before the watermark existed fall back to a scan
         if not inspect(engine).has_table(table_name):
             return
         with engine.connect() as conn:
@@ -210,6 +1531,8 @@ class BaseSqlHandler:
 
 class TickHandler(BaseSqlHandler):
     DB_NAME = "mt_api_ta_tickdata"
+    KEY_COLUMNS = ("datetime", "Sequence")
+    DATASET = Watermark.TICK
 
     def table_maker(self, table_name: str, metadata: MetaData) -> Table:
         return Table(
@@ -227,6 +1550,7 @@ class TickHandler(BaseSqlHandler):
             Column("BS", Integer),
             Column("BP_1_Pre", Float),
             Column("SP_1_Pre", Float),
+            Index(f"ix_{table_name}_datetime_sequence", "datetime", "Sequence"),
         )
 
 
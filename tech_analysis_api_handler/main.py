@@ -1,21 +1,27 @@
 import subprocess
 import sys
 import os
+import logging
 import threading
 from contextlib import asynccontextmanager
 import time
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
 from tech_analysis_api_handler.ta import router
 
 
 from tech_analysis_api_handler.ta import service
 
-from .models import GetResponseModel, StatusCode, PostResponseModel
-from . import config
+from .models import GetResponseModel, StatusCode, PostResponseModel, InfoData
+from . import config, database, metrics
+
+logger = logging.getLogger("src")
 
 
 def init():
+    database.EngineRegistry.warm()
+    database.OHLCTable.load(database.get_engine())
     router.init()
 
 
@@ -24,17 +30,46 @@ def create_app() -> FastAPI:
     async def lifespan(app: FastAPI):
         init()
         yield
+        router.close()
 
     settings = config.get_settings()
     app = FastAPI(lifespan=lifespan)
-    print("FastAPI started running..")
+    logger.info("FastAPI started running..")
 
     ep = settings.endpoints
 
+    @app.middleware("http")
+    async def observe_latency(request: Request, call_next):
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            # Route templates keep the label set bounded, unmatched paths share one
+            route = request.scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            elapsed = time.perf_counter() - start
+            metrics.HTTP_SECONDS.observe(elapsed, request.method, path, status)
+
+    @app.get(ep.METRICS, response_class=PlainTextResponse)
+    def get_metrics():
+        return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
     @app.get(ep.SNAPSHOT)
     def index():
         return GetResponseModel(status_code=StatusCode.Success.OK)
 
+    @app.get(ep.POOL)
+    def pool_status():
+        data = [
+            InfoData(name=name, info=info)
+            for name, info in database.EngineRegistry.stats().items()
+        ]
+        data.append(InfoData(name="OHLCTable", info=database.OHLCTable.stats()))
+        return GetResponseModel(status_code=StatusCode.Success.OK, data=data)
+
     @app.post(ep.SHUTDOWN)
     def shutdown():
         # Spawn a new process to run the script
@@ -42,7 +77,7 @@ def create_app() -> FastAPI:
 
     @app.post(ep.RESTART)
     def restart():
-        print(ep.RESTART)
+        logger.info("Restarting from %s", ep.RESTART)
 
         def _restart():
             python = sys.executable
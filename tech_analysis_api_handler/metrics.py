@@ -0,0 +1,286 @@
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterable
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds, from a fast single-row commit up to a stalled bulk flush
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+
+def escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_value(value: float) -> str:
+    if value is None:
+        return "NaN"
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def format_labels(names: Iterable[str], values: Iterable) -> str:
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    """Named family of samples with a fixed set of label names.
+
+    Label values are passed positionally in ``labelnames`` order, so the hot
+    paths only build a tuple and take a lock per update. Counters and gauges
+    can instead be computed by a ``collector`` at scrape time, which returns
+    ``{label values: value}`` and replaces the stored values, so readings of
+    queue depths and existing stats cost nothing between scrapes.
+    """
+
+    kind: str = None
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        registry: "Registry" = None,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.__lock__ = threading.Lock()
+        self.__values__: dict[tuple, object] = {}
+        self.__collect__: Callable[[], dict] = None
+        (REGISTRY if registry is None else registry).register(self)
+
+    def key(self, labels: tuple) -> tuple:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(
+                f"{self.name} expects labels {self.labelnames}, got {labels}"
+            )
+        return tuple(str(label) for label in labels)
+
+    def collector(self, func: Callable[[], dict]) -> Callable[[], dict]:
+        self.__collect__ = func
+        return func
+
+    def collect(self) -> None:
+        collected = {
+            self.key(labels if isinstance(labels, tuple) else (labels,)): value
+            for labels, value in self.__collect__().items()
+        }
+        with self.__lock__:
+            self.__values__ = collected
+
+    def samples(self) -> Iterable[tuple[str, tuple, tuple, float]]:
+        """(suffix, label names, label values, value) of every sample."""
+        if self.__collect__ is not None:
+            self.collect()
+        with self.__lock__:
+            values = dict(self.__values__)
+        for key, value in values.items():
+            yield "", self.labelnames, key, value
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {escape(self.documentation)}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        for suffix, names, values, value in self.samples():
+            labels = format_labels(names, values)
+            lines.append(f"{self.name}{suffix}{labels} {format_value(value)}")
+        return lines
+
+    def clear(self) -> None:
+        with self.__lock__:
+            self.__values__.clear()
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        key = self.key(labels)
+        with self.__lock__:
+            self.__values__[key] = self.__values__.get(key, 0) + amount
+
+    def value(self, *labels) -> float:
+        return self.__values__.get(self.key(labels), 0)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, *labels) -> None:
+        key = self.key(labels)
+        with self.__lock__:
+            self.__values__[key] = value
+
+
+class Histogram(Metric):
+    """Cumulative histogram with ``_bucket``, ``_sum`` and ``_count`` samples."""
+
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Iterable[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels) -> None:
+        key = self.key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self.__lock__:
+            counts = self.__values__.get(key)
+            if counts is None:
+                # One slot per bucket plus +Inf, then the sum
+                counts = self.__values__[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[i] += 1
+            counts[-1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def samples(self):
+        with self.__lock__:
+            values = {key: list(counts) for key, counts in self.__values__.items()}
+        names = self.labelnames + ("le",)
+        for key, counts in values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield "_bucket", names, key + (format_value(bound),), cumulative
+            yield "_sum", self.labelnames, key, counts[-1]
+            yield "_count", self.labelnames, key, cumulative
+
+
+class Registry:
+    """Metrics rendered together in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self.__lock__ = threading.Lock()
+        self.__metrics__: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> None:
+        with self.__lock__:
+            if metric.name in self.__metrics__:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self.__metrics__[metric.name] = metric
+
+    def get(self, name: str) -> Metric | None:
+        return self.__metrics__.get(name)
+
+    def render(self) -> str:
+        with self.__lock__:
+            metrics = list(self.__metrics__.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+CALLBACKS = Counter(
+    "ta_callbacks_total",
+    "SDK callbacks received by callback and TA type.",
+    ["callback", "ta_type"],
+)
+EVENTS = Counter(
+    "ta_events_total",
+    "Decoded callback events published on the event bus.",
+    ["event"],
+)
+CALLBACK_SECONDS = Histogram(
+    "ta_callback_seconds",
+    "Time from an SDK callback to the end of its worker task.",
+    ["task"],
+)
+QUEUE_DEPTH = Gauge(
+    "ta_queue_depth",
+    "Items waiting in the in-process queues.",
+    ["queue"],
+)
+DROPPED = Counter(
+    "ta_dropped_total",
+    "Callbacks and bars dropped because a queue was full.",
+    ["queue"],
+)
+BACKFILL = Gauge(
+    "ta_backfill_progress",
+    "Progress of the OHLC backfill and the tick harvest.",
+    ["runtime", "state"],
+)
+API_CALL_SECONDS = Histogram(
+    "ta_api_call_seconds",
+    "Latency of TechAnalysis SDK calls by session and method.",
+    ["session", "method"],
+)
+API_CALL_ERRORS = Counter(
+    "ta_api_call_errors_total",
+    "TechAnalysis SDK calls that raised or returned an error.",
+    ["session", "method"],
+)
+DB_FLUSH_SECONDS = Histogram(
+    "db_flush_seconds",
+    "Latency of database writes including the commit.",
+    ["dataset", "operation"],
+)
+DB_ROWS = Counter(
+    "db_rows_written_total",
+    "Rows inserted by table, duplicates excluded where the driver reports them.",
+    ["dataset", "table"],
+)
+DB_ERRORS = Counter(
+    "db_write_errors_total",
+    "Database writes that failed.",
+    ["dataset", "operation"],
+)
+HTTP_SECONDS = Histogram(
+    "http_request_seconds",
+    "Latency of HTTP requests by route template.",
+    ["method", "route", "status"],
+)
+
+
+@contextmanager
+def db_write(dataset: str, operation: str):
+    """Time a database write and count it as failed when it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        DB_ERRORS.inc(dataset, operation)
+        raise
+    finally:
+        DB_FLUSH_SECONDS.observe(time.perf_counter() - start, dataset, operation)
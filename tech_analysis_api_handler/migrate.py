@@ -0,0 +1,86 @@
+import argparse
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from sqlalchemy import select
+
+from tech_analysis_api_handler.database import (
+    OHLCTable,
+    OHLCFactTable,
+    get_db,
+    get_engine,
+)
+
+logger = logging.getLogger("migrate")
+
+
+def migrate_symbol(symbol: str, chunk_size: int) -> int:
+    """Copy one per-symbol OHLC table into the fact table in datetime chunks."""
+    db = get_db()
+    moved = 0
+    last = None
+    with db() as session:
+        table = OHLCTable.resolve(session.bind, symbol)
+        while True:
+            stmt = select(table).order_by(table.c.datetime).limit(chunk_size)
+            if last is not None:
+                stmt = stmt.where(table.c.datetime > last)
+            rows = [dict(row._mapping) for row in session.execute(stmt)]
+            if not rows:
+                break
+            OHLCFactTable.insert_ignore_many(session, {symbol: rows})
+            moved += len(rows)
+            last = rows[-1]["datetime"]
+            if len(rows) < chunk_size:
+                break
+    return moved
+
+
+def migrate(
+    symbols: list[str] = None, workers: int = 4, chunk_size: int = 50000
+) -> dict[str, int]:
+    engine = get_engine()
+    OHLCFactTable.resolve(engine)
+    if not symbols:
+        symbols = OHLCTable.known(engine)
+    result = {}
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(migrate_symbol, symbol, chunk_size): symbol
+            for symbol in symbols
+        }
+        for i, future in enumerate(as_completed(futures), start=1):
+            symbol = futures[future]
+            try:
+                result[symbol] = future.result()
+            except Exception as e:
+                logger.error(f"Migration of {symbol} failed: {e}")
+                result[symbol] = -1
+                continue
+            logger.info(f"[{i}/{len(symbols)}] {symbol}: {result[symbol]} rows")
+    elapsed = time.perf_counter() - start
+    total = sum(v for v in result.values() if v > 0)
+    logger.info(f"Migrated {total} rows from {len(symbols)} tables in {elapsed:.1f}s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="""Move per-symbol OHLC tables into the partitioned fact table""",
+    )
+    parser.add_argument("symbols", nargs="*", help="symbols to move, default all")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--chunk-size", type=int, default=50000)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    result = migrate(args.symbols, args.workers, args.chunk_size)
+    failed = [symbol for symbol, count in result.items() if count < 0]
+    if failed:
+        raise SystemExit(f"Failed: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+
+    main()
@@ -0,0 +1,114 @@
+# High volume responses skip the pydantic models: rows stay columns from the
+# database to the wire and the envelope is a plain dict with the same fields as
+# RestfulResponseModel and ResponseDataBase.
+import json
+from datetime import date, datetime
+from typing import Literal
+
+from fastapi.responses import Response
+
+from .models import DataType, StatusCode
+from .utils import generate_systime
+
+try:
+    import orjson
+
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+
+    ARROW_AVAILABLE = True
+except ImportError:
+    ARROW_AVAILABLE = False
+
+JSON_MEDIA_TYPE = "application/json"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+Format = Literal["columnar", "arrow"]
+
+
+def encode(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    """JSON bytes of ``content``, through orjson when it is installed."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(content)
+    return json.dumps(
+        content, default=encode, ensure_ascii=False, separators=(",", ":")
+    ).encode()
+
+
+def envelope(
+    status_code: StatusCode.CodeBase, data: list[dict] = (), error_message: str = None
+) -> dict:
+    """The fields of RestfulResponseModel."""
+    return {
+        "success": status_code.__class__ == StatusCode.Success,
+        "status_code": status_code.value,
+        "status": status_code.name,
+        "message": None,
+        "error_message": error_message,
+        "data": list(data),
+    }
+
+
+def data_object(data_type: DataType, data, metadata: dict = None) -> dict:
+    """The fields of ResponseDataBase, ``data`` is passed through unchecked."""
+    return {
+        "data_type": data_type.value,
+        "id": data_type.value,
+        "type": data_type.name,
+        "systime": generate_systime(),
+        "metadata": {} if metadata is None else metadata,
+        "data": data,
+    }
+
+
+class ColumnarResponse(Response):
+    media_type = JSON_MEDIA_TYPE
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def arrow_ipc(columns: dict[str, list], metadata: dict) -> bytes:
+    """Arrow IPC stream of ``columns``, ``metadata`` is kept in the schema."""
+    table = pa.table(columns)
+    table = table.replace_schema_metadata({"envelope": dumps(metadata)})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def columnar_response(
+    data_type: DataType, name: str, columns: dict[str, list], format: Format
+) -> Response:
+    """Response of ``columns`` read for ``name``.
+
+    ``columnar`` sends ``{name: {column: values}}`` as the data of one data
+    object. ``arrow`` sends the columns as an Arrow IPC stream and the envelope,
+    without data, as the ``envelope`` schema metadata.
+    """
+    rows = len(next(iter(columns.values()), ()))
+    metadata = {"name": name, "rows": rows, "columns": list(columns)}
+    if format == "arrow":
+        if not ARROW_AVAILABLE:
+            content = envelope(
+                StatusCode.ServerError.NOT_IMPLEMENTED,
+                error_message="pyarrow is not installed",
+            )
+            return ColumnarResponse(content)
+        data = data_object(data_type, {}, metadata)
+        content = envelope(StatusCode.Success.OK, [data])
+        return Response(arrow_ipc(columns, content), media_type=ARROW_MEDIA_TYPE)
+    data = data_object(data_type, {name: columns}, metadata)
+    return ColumnarResponse(envelope(StatusCode.Success.OK, [data]))
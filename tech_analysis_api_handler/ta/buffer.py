@@ -0,0 +1,211 @@
+import logging
+import threading
+import time
+
+from tech_analysis_api_handler.database import get_ohlc_store
+from .dependencies import settings, get_db
+
+logger = logging.getLogger("runtime")
+
+
+class BarBuffer:
+    """Write-behind buffer that coalesces bars per symbol into bulk flushes.
+
+    Bars are keyed by (Product, datetime) so repeated updates of the same bar
+    collapse into one row. A background thread flushes every pending symbol in
+    one transaction once ``max_batch`` bars are waiting or the oldest bar is
+    ``max_latency`` seconds old. ``put`` blocks while ``max_pending`` bars are
+    waiting, which pushes back on the callbacks when the database falls behind.
+    A failed flush is retried symbol by symbol, and the bars of a symbol whose
+    write failed ``max_retries`` times in a row are dropped and counted as
+    ``dead_lettered`` so one bad row cannot stall every other symbol.
+    """
+
+    def __init__(
+        self,
+        max_batch: int = None,
+        max_latency: float = None,
+        max_pending: int = None,
+        put_timeout: float = None,
+        max_retries: int = None,
+    ):
+        cfg = settings.service.BarBuffer
+        self.max_batch = cfg.MAX_BATCH if max_batch is None else max_batch
+        self.max_latency = cfg.MAX_LATENCY if max_latency is None else max_latency
+        self.max_pending = cfg.MAX_PENDING if max_pending is None else max_pending
+        self.put_timeout = cfg.PUT_TIMEOUT if put_timeout is None else put_timeout
+        self.max_retries = cfg.MAX_RETRIES if max_retries is None else max_retries
+        self.__cond__ = threading.Condition()
+        self.__pending__: dict[str, dict] = {}
+        self.__size__ = 0
+        self.__oldest__: float | None = None
+        # Consecutive failed writes per symbol
+        self.__failures__: dict[str, int] = {}
+        self.__stop_signal__ = False
+        self.thread: threading.Thread = None
+        self.__stats__ = {
+            "received": 0,
+            "coalesced": 0,
+            "dropped": 0,
+            "flushes": 0,
+            "rows_flushed": 0,
+            "flush_errors": 0,
+            "dead_lettered": 0,
+            "last_flush_seconds": 0.0,
+        }
+
+    def start(self) -> None:
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.__stop_signal__ = False
+        self.thread = threading.Thread(target=self.task, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        with self.__cond__:
+            self.__stop_signal__ = True
+            self.__cond__.notify_all()
+        if self.thread is not None:
+            self.thread.join()
+        self.flush()
+
+    def put(self, bar: dict) -> bool:
+        symbol = bar["Product"]
+        deadline = time.monotonic() + self.put_timeout
+        with self.__cond__:
+            self.__stats__["received"] += 1
+            while self.__size__ >= self.max_pending and not self.__stop_signal__:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.__stats__["dropped"] += 1
+                    logger.warning("Bar buffer full, dropped %s", symbol)
+                    return False
+                self.__cond__.wait(remaining)
+            idle = self.__oldest__ is None
+            self.__merge__({symbol: {bar["datetime"]: bar}})
+            # The flusher waits without a timeout while the buffer is empty
+            if self.__size__ >= self.max_batch or idle:
+                self.__cond__.notify_all()
+        return True
+
+    def __merge__(self, batch: dict[str, dict], overwrite: bool = True) -> None:
+        for symbol, bars in batch.items():
+            rows = self.__pending__.setdefault(symbol, {})
+            for dt, bar in bars.items():
+                if dt in rows:
+                    self.__stats__["coalesced"] += 1
+                    if overwrite:
+                        rows[dt] = bar
+                    continue
+                rows[dt] = bar
+                self.__size__ += 1
+        if self.__oldest__ is None and self.__size__:
+            self.__oldest__ = time.monotonic()
+
+    def __due__(self) -> bool:
+        if self.__size__ >= self.max_batch:
+            return True
+        if self.__oldest__ is None:
+            return False
+        return time.monotonic() - self.__oldest__ >= self.max_latency
+
+    def __swap__(self) -> dict[str, dict]:
+        batch = self.__pending__
+        self.__pending__ = {}
+        self.__size__ = 0
+        self.__oldest__ = None
+        self.__cond__.notify_all()
+        return batch
+
+    def task(self) -> None:
+        while True:
+            with self.__cond__:
+                while not self.__due__() and not self.__stop_signal__:
+                    if self.__oldest__ is None:
+                        self.__cond__.wait()
+                    else:
+                        age = time.monotonic() - self.__oldest__
+                        self.__cond__.wait(max(self.max_latency - age, 0))
+                if self.__stop_signal__:
+                    return
+                batch = self.__swap__()
+            if not self.__write__(batch):
+                time.sleep(self.max_latency)
+
+    def flush(self) -> bool:
+        with self.__cond__:
+            batch = self.__swap__()
+        return self.__write__(batch)
+
+    @staticmethod
+    def __insert__(batch: dict[str, dict]) -> int:
+        data = {symbol: list(rows.values()) for symbol, rows in batch.items()}
+        with get_db()() as session:
+            return get_ohlc_store().insert_ignore_many(session, data)
+
+    def __write__(self, batch: dict[str, dict]) -> bool:
+        """Write ``batch``, returning False when bars were put back for a retry."""
+        if not batch:
+            return True
+        start = time.perf_counter()
+        failed = {}
+        try:
+            count = self.__insert__(batch)
+        except Exception as e:
+            logger.error("Bar buffer flush failed: %s", e)
+            count = 0
+            if len(batch) == 1:
+                failed = batch
+            else:
+                # Find the symbols that fail on their own, the rest get written
+                for symbol, rows in batch.items():
+                    try:
+                        count += self.__insert__({symbol: rows})
+                    except Exception as e:
+                        logger.error("Bar buffer flush of %s failed: %s", symbol, e)
+                        failed[symbol] = rows
+        with self.__cond__:
+            for symbol in batch.keys() - failed.keys():
+                self.__failures__.pop(symbol, None)
+            retry = {}
+            for symbol, rows in failed.items():
+                failures = self.__failures__.get(symbol, 0) + 1
+                if failures < self.max_retries:
+                    self.__failures__[symbol] = failures
+                    retry[symbol] = rows
+                    continue
+                self.__failures__.pop(symbol, None)
+                self.__stats__["dead_lettered"] += len(rows)
+                logger.error(
+                    "Dropped %d bars of %s after %d failed flushes",
+                    len(rows),
+                    symbol,
+                    failures,
+                )
+            if failed:
+                self.__stats__["flush_errors"] += 1
+                # Keep newer bars that arrived while the flush was running
+                self.__merge__(retry, overwrite=False)
+            if len(failed) < len(batch):
+                self.__stats__["flushes"] += 1
+                self.__stats__["rows_flushed"] += count
+                self.__stats__["last_flush_seconds"] = time.perf_counter() - start
+        return not retry
+
+    def pending(self) -> int:
+        return self.__size__
+
+    def stats(self) -> dict:
+        with self.__cond__:
+            return {
+                "pending": self.__size__,
+                "symbols": len(self.__pending__),
+                **self.__stats__,
+            }
+
+
+__bar_buffer = BarBuffer()
+
+
+def get_bar_buffer() -> BarBuffer:
+    return __bar_buffer
@@ -0,0 +1,247 @@
+import asyncio
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass
+from functools import partial
+from typing import Literal
+
+from tech_analysis_api_handler import metrics
+from .dependencies import settings
+from .workers import KeyedExecutor
+
+logger = logging.getLogger("runtime")
+
+
+@dataclass(frozen=True)
+class BarUpdate:
+    """OnUpdate decoded into rows: the finished bar and the one still forming."""
+
+    symbol: str
+    ta_type: str
+    final: dict
+    forming: dict | None = None
+
+
+@dataclass(frozen=True)
+class HistoryReceived:
+    """OnRcvDone decoded into the rows of the SubTA history."""
+
+    symbol: str
+    ta_type: str
+    rows: list[dict]
+
+
+class ThreadConsumer:
+    """Consumer running on its own keyed worker threads.
+
+    Events of one symbol stay in order on the same worker. A full queue
+    applies ``overflow`` like the callback workers do, ``on_drop(event)`` is
+    called for every event dropped or rejected.
+    """
+
+    affinity = "thread"
+
+    def __init__(
+        self,
+        name: str,
+        handler: callable,
+        workers: int = 1,
+        queue_size: int = None,
+        overflow: Literal["block", "drop_oldest", "drop_newest"] = "block",
+        on_drop: callable = None,
+    ):
+        cfg = settings.service.EventBus
+        self.name = name
+        self.handler = handler
+        self.on_drop = on_drop
+        queue_size = cfg.QUEUE_SIZE if queue_size is None else queue_size
+        self.executor = KeyedExecutor(workers, queue_size, overflow, name=name)
+
+    def offer(self, event) -> None:
+        on_drop = None if self.on_drop is None else partial(self.on_drop, event)
+        self.executor.submit(event.symbol, self.handler, event, on_drop=on_drop)
+
+    def start(self) -> None:
+        self.executor.start()
+
+    def stop(self) -> None:
+        self.executor.stop()
+
+    def stats(self) -> dict:
+        stats = self.executor.stats()
+        stats["pending"] = stats["submitted"] - stats["completed"] - stats["dropped"]
+        return {"affinity": self.affinity, **stats}
+
+
+class AsyncConsumer:
+    """Consumer whose handler runs on the event loop.
+
+    Publishers append to a bounded inbox and wake the loop once per batch, the
+    oldest events are dropped when the loop falls ``queue_size`` behind.
+    Events are skipped while no loop is attached or ``active()`` is False.
+    """
+
+    affinity = "async"
+
+    def __init__(
+        self,
+        name: str,
+        handler: callable,
+        queue_size: int = None,
+        active: callable = None,
+    ):
+        cfg = settings.service.EventBus
+        self.name = name
+        self.handler = handler
+        self.active = active
+        queue_size = cfg.QUEUE_SIZE if queue_size is None else queue_size
+        self.loop: asyncio.AbstractEventLoop = None
+        self.__lock__ = threading.Lock()
+        self.__inbox__: deque = deque(maxlen=queue_size)
+        self.__scheduled__ = False
+        self.__stats__ = {
+            "submitted": 0,
+            "completed": 0,
+            "errors": 0,
+            "dropped": 0,
+            "skipped": 0,
+        }
+
+    def offer(self, event) -> None:
+        loop = self.loop
+        if loop is None or (self.active is not None and not self.active()):
+            self.__stats__["skipped"] += 1
+            return
+        with self.__lock__:
+            inbox = self.__inbox__
+            if len(inbox) == inbox.maxlen:
+                self.__stats__["dropped"] += 1
+            inbox.append(event)
+            self.__stats__["submitted"] += 1
+            if self.__scheduled__:
+                return
+            self.__scheduled__ = True
+        try:
+            loop.call_soon_threadsafe(self.__drain__)
+        except RuntimeError:
+            # The loop closed during shutdown
+            self.__scheduled__ = False
+
+    def __drain__(self) -> None:
+        with self.__lock__:
+            events = list(self.__inbox__)
+            self.__inbox__.clear()
+            self.__scheduled__ = False
+        for event in events:
+            try:
+                self.handler(event)
+            except Exception as e:
+                self.__stats__["errors"] += 1
+                logger.error("Consumer %s failed: %s", self.name, e)
+        self.__stats__["completed"] += len(events)
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        self.loop = None
+
+    def stats(self) -> dict:
+        return {
+            "affinity": self.affinity,
+            "attached": self.loop is not None,
+            "pending": len(self.__inbox__),
+            **self.__stats__,
+        }
+
+
+class EventBus:
+    """Delivers every decoded callback event to each consumer subscribed to it.
+
+    Events are decoded once by the callback workers and published here. Each
+    consumer has its own bounded queue and runs either on its own threads or
+    on the event loop, so consumers neither block each other nor add work to
+    the SDK callback thread.
+    """
+
+    def __init__(self):
+        self.__lock__ = threading.Lock()
+        self.__consumers__: dict[str, ThreadConsumer | AsyncConsumer] = {}
+        self.__routes__: dict[type, tuple] = {}
+        self.loop: asyncio.AbstractEventLoop = None
+
+    def subscribe(
+        self,
+        name: str,
+        handler: callable,
+        events: tuple[type, ...],
+        affinity: Literal["thread", "async"] = "thread",
+        **kwargs,
+    ) -> ThreadConsumer | AsyncConsumer:
+        """Register ``handler(event)`` for the ``events`` types.
+
+        Thread consumers take ``workers``, ``queue_size``, ``overflow`` and
+        ``on_drop``, async consumers ``queue_size`` and ``active``.
+        """
+        if affinity == "async":
+            consumer = AsyncConsumer(name, handler, **kwargs)
+            consumer.loop = self.loop
+        else:
+            consumer = ThreadConsumer(name, handler, **kwargs)
+        with self.__lock__:
+            if name in self.__consumers__:
+                raise ValueError(f"Consumer {name} is already subscribed")
+            self.__consumers__[name] = consumer
+            for event in events:
+                self.__routes__[event] = (*self.__routes__.get(event, ()), consumer)
+        return consumer
+
+    def unsubscribe(self, name: str) -> None:
+        with self.__lock__:
+            consumer = self.__consumers__.pop(name, None)
+            if consumer is None:
+                return
+            self.__routes__ = {
+                event: tuple(c for c in consumers if c is not consumer)
+                for event, consumers in self.__routes__.items()
+            }
+        consumer.stop()
+
+    def publish(self, event) -> None:
+        metrics.EVENTS.inc(type(event).__name__)
+        for consumer in self.__routes__.get(type(event), ()):
+            consumer.offer(event)
+
+    def attach(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Run the async consumers on ``loop``."""
+        self.loop = loop
+        for consumer in self.consumers():
+            if consumer.affinity == "async":
+                consumer.loop = loop
+
+    def consumers(self) -> list[ThreadConsumer | AsyncConsumer]:
+        with self.__lock__:
+            return list(self.__consumers__.values())
+
+    def start(self) -> None:
+        for consumer in self.consumers():
+            consumer.start()
+
+    def stop(self) -> None:
+        """Deliver every queued event, then stop the consumer threads."""
+        for consumer in self.consumers():
+            consumer.stop()
+
+    def pending(self) -> int:
+        return sum(consumer.stats()["pending"] for consumer in self.consumers())
+
+    def stats(self) -> dict[str, dict]:
+        return {consumer.name: consumer.stats() for consumer in self.consumers()}
+
+
+__event_bus = EventBus()
+
+
+def get_event_bus() -> EventBus:
+    return __event_bus
@@ -0,0 +1,162 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Iterable
+
+from .models import RtCode
+from .dependencies import settings
+
+logger = logging.getLogger("runtime")
+
+
+class TokenBucket:
+    """Thread-safe token bucket allowing ``rate`` calls per second."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.__tokens__ = float(burst)
+        self.__last__ = time.monotonic()
+        self.__lock__ = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self.__lock__:
+                now = time.monotonic()
+                self.__tokens__ = min(
+                    self.burst, self.__tokens__ + (now - self.__last__) * self.rate
+                )
+                self.__last__ = now
+                if self.__tokens__ >= 1:
+                    self.__tokens__ -= 1
+                    return
+                wait = (1 - self.__tokens__) / self.rate
+            time.sleep(wait)
+
+
+class TickHarvester:
+    """Fetch tick history for many (symbol, date) jobs in parallel.
+
+    At most ``concurrency`` calls run at once and the token bucket caps the
+    call rate. ``RtCode.API_ERROR`` responses are retried with exponential
+    backoff. Each result goes to ``store`` as soon as it arrives, so storage
+    runs alongside the remaining fetches.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = None,
+        rate: float = None,
+        burst: int = None,
+        retries: int = None,
+        backoff: float = None,
+    ):
+        cfg = settings.service.TickHarvester
+        self.concurrency = cfg.CONCURRENCY if concurrency is None else concurrency
+        self.retries = cfg.RETRIES if retries is None else retries
+        self.backoff = cfg.BACKOFF if backoff is None else backoff
+        self.bucket = TokenBucket(
+            cfg.RATE if rate is None else rate, cfg.BURST if burst is None else burst
+        )
+        self.__lock__ = threading.Lock()
+        self.__progress__: dict = {}
+
+    def run(
+        self,
+        jobs: Iterable[tuple[str, datetime]],
+        fetch: callable,
+        store: callable,
+        running: threading.Event = None,
+    ) -> dict:
+        """Run every job and return the final progress.
+
+        ``fetch(symbol, date)`` returns ``(records, error)`` like
+        ``GetHisBS_Stock`` and ``store(symbol, date, records)`` returns the
+        number of rows written. Clearing ``running`` stops the remaining jobs.
+        """
+        jobs = list(jobs)
+        with self.__lock__:
+            self.__progress__ = {
+                "total": len(jobs),
+                "done": 0,
+                "empty": 0,
+                "failed": 0,
+                "cancelled": 0,
+                "retries": 0,
+                "rows": 0,
+                "started": time.monotonic(),
+                "finished": None,
+            }
+        with ThreadPoolExecutor(
+            max_workers=self.concurrency, thread_name_prefix="tick-harvester"
+        ) as executor:
+            futures = {}
+            for symbol, date in jobs:
+                future = executor.submit(
+                    self.__harvest__, symbol, date, fetch, store, running
+                )
+                futures[future] = (symbol, date)
+            for future in as_completed(futures):
+                symbol, date = futures[future]
+                try:
+                    rows = future.result()
+                except Exception as e:
+                    logger.error("Tick harvest of %s %s failed: %s", symbol, date, e)
+                    rows = RtCode.DATABASE_ERROR
+                self.__record__(rows)
+        self.__progress__["finished"] = time.monotonic()
+        return self.stats()
+
+    def __harvest__(self, symbol, date, fetch, store, running) -> int | RtCode:
+        for attempt in range(self.retries + 1):
+            if running is not None and not running.is_set():
+                return RtCode.FAIL
+            self.bucket.acquire()
+            records, error = fetch(symbol, date)
+            if not error:
+                return store(symbol, date, records)
+            if error != RtCode.API_ERROR:
+                return RtCode.EMPTY_DATA
+            if attempt < self.retries:
+                with self.__lock__:
+                    self.__progress__["retries"] += 1
+                time.sleep(self.backoff * 2**attempt)
+        return RtCode.API_ERROR
+
+    def __record__(self, rows: int | RtCode) -> None:
+        with self.__lock__:
+            progress = self.__progress__
+            if isinstance(rows, RtCode):
+                if rows == RtCode.EMPTY_DATA:
+                    progress["empty"] += 1
+                elif rows == RtCode.FAIL:
+                    progress["cancelled"] += 1
+                else:
+                    progress["failed"] += 1
+            else:
+                progress["done"] += 1
+                progress["rows"] += rows
+
+    def stats(self) -> dict:
+        with self.__lock__:
+            progress = dict(self.__progress__)
+        if not progress:
+            return {}
+        finished = progress.pop("finished")
+        progress["running"] = finished is None
+        end = time.monotonic() if finished is None else finished
+        elapsed = end - progress.pop("started")
+        completed = sum(progress[k] for k in ["done", "empty", "failed", "cancelled"])
+        progress["elapsed"] = elapsed
+        progress["jobs_per_sec"] = completed / elapsed if elapsed > 0 else 0.0
+        progress["rows_per_sec"] = progress["rows"] / elapsed if elapsed > 0 else 0.0
+        return progress
+
+
+__tick_harvester = TickHarvester()
+
+
+def get_tick_harvester() -> TickHarvester:
+    return __tick_harvester
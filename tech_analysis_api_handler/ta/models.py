@@ -1,4 +1,5 @@
 from enum import Enum, auto
+from dataclasses import dataclass, field
 from .dependencies import StatusCode, RuntimeModel, StatusData
 
 
@@ -27,3 +28,9 @@ class k_setting:
         self.NK = NK
         self.TA_Type = TA_Type
         self.DateBegin = DateBegin
+
+
+@dataclass
+class RcvDone:
+    code: RtCode
+    data: list[dict] = field(default_factory=list)
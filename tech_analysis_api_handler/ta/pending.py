@@ -0,0 +1,101 @@
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import Future
+from enum import Enum
+
+from .models import RcvDone
+
+
+class PendingRequests:
+    """Registry of in-flight SubTA requests resolved by their OnRcvDone.
+
+    Requests are keyed by (ProdID, NK, TA_Type, DateBegin). OnRcvDone only
+    carries the product and TA type, so when several requests for the same
+    product and TA type are pending the oldest one is resolved first, matching
+    the order the SDK answers them in.
+    """
+
+    def __init__(self):
+        self.__lock__ = threading.Lock()
+        self.__futures__: dict[tuple, Future] = {}
+        self.__order__: dict[tuple, deque] = {}
+
+    @staticmethod
+    def name(value) -> str:
+        # k_config holds the SDK's .NET enums, callbacks receive the Python ones
+        return value.name if isinstance(value, Enum) else str(value)
+
+    @classmethod
+    def key(cls, k_config) -> tuple:
+        return (
+            k_config.ProdID,
+            cls.name(k_config.NK),
+            cls.name(k_config.TA_Type),
+            k_config.DateBegin,
+        )
+
+    @staticmethod
+    def group(key: tuple) -> tuple:
+        # What OnRcvDone can tell apart: (ProdID, TA_Type)
+        return key[0], key[2]
+
+    def submit(self, k_config) -> tuple[Future, bool]:
+        """Register ``k_config`` and return its future.
+
+        The flag is False when an identical request is already in flight, in
+        which case the caller shares its future and must not call SubTA again.
+        """
+        key = self.key(k_config)
+        with self.__lock__:
+            future = self.__futures__.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self.__futures__[key] = future
+            self.__order__.setdefault(self.group(key), deque()).append(key)
+        return future, True
+
+    async def wait(self, future: Future, timeout: float = None) -> RcvDone:
+        """Wait for ``future`` without cancelling it for the other waiters.
+
+        Raises CancelledError when the owner of the request cancelled it.
+        """
+        shielded = asyncio.shield(asyncio.wrap_future(future))
+        return await asyncio.wait_for(shielded, timeout)
+
+    def resolve(self, product: str, ta_type, result: RcvDone) -> bool:
+        group = (product, self.name(ta_type))
+        with self.__lock__:
+            order = self.__order__.get(group)
+            if not order:
+                return False
+            key = order.popleft()
+            if not order:
+                del self.__order__[group]
+            future = self.__futures__.pop(key)
+        if not future.done():
+            future.set_result(result)
+        return True
+
+    def cancel(self, k_config) -> None:
+        key = self.key(k_config)
+        with self.__lock__:
+            future = self.__futures__.pop(key, None)
+            order = self.__order__.get(self.group(key))
+            if order is not None and key in order:
+                order.remove(key)
+                if not order:
+                    del self.__order__[self.group(key)]
+        if future is not None:
+            future.cancel()
+
+    def __len__(self) -> int:
+        return len(self.__futures__)
+
+
+__pending_requests = PendingRequests()
+
+
+def get_pending_requests() -> PendingRequests:
+    return __pending_requests
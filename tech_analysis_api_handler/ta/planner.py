@@ -0,0 +1,91 @@
+import logging
+from datetime import datetime
+from typing import Iterable
+
+from tech_analysis_api_handler.database import Completeness
+from .dependencies import get_db
+from .trading_calendar import TradingCalendar, get_trading_calendar
+
+logger = logging.getLogger("runtime")
+
+
+class BackfillPlanner:
+    """Work out which (symbol, session) ranges still need a backfill.
+
+    A session needs one unless every minute expected to have a bar is set in
+    its completeness bitmap or an earlier backfill covering it succeeded.
+    Consecutive missing sessions are merged into one range.
+    """
+
+    def __init__(self, calendar: TradingCalendar = None):
+        self.calendar = get_trading_calendar() if calendar is None else calendar
+        self.last: dict = {}
+
+    @staticmethod
+    def is_complete(bitmap: int, complete: bool) -> bool:
+        return complete or Completeness.is_complete(bitmap)
+
+    def plan(
+        self, symbols: Iterable[str], start, end
+    ) -> dict[str, list[tuple[datetime, datetime]]]:
+        """``{symbol: [(first, last), ...]}`` of missing sessions, inclusive.
+
+        Symbols without any missing session are left out.
+        """
+        symbols = list(symbols)
+        sessions = self.calendar.trading_days(start, end)
+        if not sessions:
+            return {}
+        first = Completeness.session_of(sessions[0])
+        last = Completeness.session_of(sessions[-1])
+        with get_db()() as session:
+            index = Completeness.bulk(session, first, last, symbols)
+        result = {}
+        missing = 0
+        for symbol in symbols:
+            known = index.get(symbol, {})
+            ranges = []
+            previous = None
+            for i, day in enumerate(sessions):
+                mark = known.get(Completeness.session_of(day))
+                if mark is not None and self.is_complete(*mark):
+                    continue
+                missing += 1
+                if previous == i - 1:
+                    ranges[-1] = (ranges[-1][0], day)
+                else:
+                    ranges.append((day, day))
+                previous = i
+            if ranges:
+                result[symbol] = ranges
+        self.last = {
+            "symbols": len(symbols),
+            "planned": len(result),
+            "sessions": len(sessions) * len(symbols),
+            "missing": missing,
+        }
+        logger.info(
+            "Backfill plan: %d/%d symbols, %d/%d sessions missing",
+            len(result),
+            len(symbols),
+            missing,
+            len(sessions) * len(symbols),
+        )
+        return result
+
+    def complete(self, symbol: str, start, end) -> None:
+        """Record that a backfill of ``symbol`` from ``start`` to ``end`` succeeded."""
+        sessions = [
+            Completeness.session_of(day)
+            for day in self.calendar.trading_days(start, end)
+        ]
+        with get_db()() as session:
+            Completeness.mark_complete(session, symbol, sessions)
+            session.commit()
+
+
+__backfill_planner = BackfillPlanner()
+
+
+def get_backfill_planner() -> BackfillPlanner:
+    return __backfill_planner
@@ -1,14 +1,24 @@
-from fastapi import APIRouter, BackgroundTasks, Depends
+from datetime import datetime
+from typing import Literal
+from fastapi import APIRouter, BackgroundTasks, Body, Depends, WebSocket
+from fastapi.responses import StreamingResponse
 from contextlib import asynccontextmanager
 from .schemas import TAResponse
 from . import service
+from .stream import StreamClient
 from .dependencies import (
     ohlc_db,
     tick_db,
     settings,
     StatusCode,
 )
-from .schemas import GetResponse, PostResponse, PutResponse, DeleteResponse
+from .schemas import (
+    GetResponse,
+    PostResponse,
+    PutResponse,
+    DeleteResponse,
+    BatchResponse,
+)
 
 
 def init():
@@ -16,6 +26,17 @@ def init():
     service.post_init()
 
 
+def close():
+    service.close()
+
+
+def parse_symbols(symbols: str | None) -> list[str] | None:
+    """Comma separated symbols of a query string, None for every symbol."""
+    if not symbols:
+        return None
+    return [symbol.strip() for symbol in symbols.split(",") if symbol.strip()]
+
+
 def get_router() -> APIRouter:
     ep = settings.endpoints
 
@@ -25,9 +46,13 @@ def get_router() -> APIRouter:
     def snapshot():
         return GetResponse(status_code=StatusCode.Success.OK)
 
+    @router.get(ep.SERVICE, response_model=GetResponse)
+    async def get_connection_status():
+        return service.get_connection_status()
+
     @router.post(ep.SERVICE, response_model=PostResponse)
-    async def connect():
-        return await service.connect()
+    def connect():
+        return service.connect()
 
     @router.put(ep.SUBSCRIPTION + "/{symbol}", response_model=PutResponse)
     async def subscribe(symbol: str):
@@ -41,6 +66,30 @@ def get_router() -> APIRouter:
     async def list_subscriptions():
         return await service.list_subscriptions()
 
+    @router.put(ep.SUBSCRIPTIONS, response_model=BatchResponse)
+    async def subscribe_many(symbols: list[str] = Body(...)):
+        return await service.subscribe_many(symbols)
+
+    @router.delete(ep.SUBSCRIPTIONS, response_model=BatchResponse)
+    async def unsubscribe_many(symbols: list[str] = Body(...)):
+        return await service.unsubscribe_many(symbols)
+
+    @router.get(ep.SYMBOLS, response_model=GetResponse)
+    def list_symbols(
+        market: str | None = None,
+        type: str | None = None,
+        prefix: str | None = None,
+    ):
+        return service.list_symbols(market, type, prefix)
+
+    @router.put(ep.SYMBOLS, response_model=PutResponse)
+    def refresh_symbols():
+        return service.refresh_symbols()
+
+    @router.get(ep.SYMBOLS + "/{symbol}", response_model=GetResponse)
+    def get_symbol(symbol: str):
+        return service.get_symbol(symbol)
+
     @router.put(ep.OHLC + "/{symbol}", response_model=PutResponse)
     async def ohlc_update(symbol: str, db=Depends(ohlc_db)):
         return await service.ohlc_update(db, symbol)
@@ -63,11 +112,58 @@ def get_router() -> APIRouter:
 
     @router.post(ep.TICK + ep.SERVICE, response_model=PostResponse)
     async def start_tick_update():
-        return service.get_tick_status()
+        return service.start_tick_update()
 
     @router.delete(ep.TICK + ep.SERVICE, response_model=DeleteResponse)
     async def stop_tick_update():
-        return service.get_tick_status()
+        return service.stop_tick_update()
+
+    # Declared after the service routes, which the symbol would match too
+    @router.get(ep.OHLC + "/{symbol}", response_model=None)
+    def read_ohlc(
+        symbol: str,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        format: Literal["columnar", "arrow", "json"] = "columnar",
+        db=Depends(ohlc_db),
+    ):
+        return service.read_ohlc(db, symbol, start, end, format)
+
+    @router.get(ep.TICK + "/{symbol}", response_model=None)
+    def read_ticks(
+        symbol: str,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        format: Literal["columnar", "arrow", "json"] = "columnar",
+    ):
+        return service.read_ticks(symbol, start, end, format)
+
+    @router.get(ep.WATERMARK, response_model=GetResponse)
+    async def get_watermarks(dataset: Literal["ohlc", "tick"] = "ohlc"):
+        return service.get_watermarks(dataset)
+
+    @router.get(ep.STREAM)
+    async def stream_sse(
+        symbols: str | None = None,
+        policy: Literal["drop_oldest", "disconnect"] | None = None,
+    ):
+        client = StreamClient(parse_symbols(symbols), policy=policy)
+        return StreamingResponse(
+            service.stream_events(client), media_type="text/event-stream"
+        )
+
+    @router.websocket(ep.STREAM)
+    async def stream_websocket(
+        websocket: WebSocket,
+        symbols: str | None = None,
+        policy: Literal["drop_oldest", "disconnect"] | None = None,
+    ):
+        client = StreamClient(parse_symbols(symbols), policy=policy)
+        await service.stream_websocket(websocket, client)
+
+    @router.get(ep.STREAM + ep.SERVICE, response_model=GetResponse)
+    async def get_stream_status():
+        return service.get_stream_status()
 
     @router.get(ep.INFO, response_model=GetResponse)
     async def load():
@@ -1,5 +1,5 @@
 from datetime import datetime
-from tech_analysis_api_v2.model import eTA_Type, TBSRec, eNK_Kind
+from .sdk import eTA_Type, TBSRec, eNK_Kind
 from typing import Optional, Literal, List
 
 from pydantic import BaseModel, Field
@@ -30,11 +30,20 @@ class DeleteResponse(PostResponseModel):
     pass
 
 
+class BatchResponse(GetResponseModel):
+    pass
+
+
 class SymbolsData(ResponseDataBase):
     data_type: DataType = Field(default=DataType.SYMBOLS, init=False)
     data: List[str]
 
 
+class SymbolInfoData(ResponseDataBase):
+    data_type: DataType = Field(default=DataType.SYMBOLS, init=False)
+    data: List[dict]
+
+
 class OHLCData(ResponseDataBase):
     data_type: DataType = Field(default=DataType.OHLC, init=False)
     data: dict = Field(default_factory=dict)
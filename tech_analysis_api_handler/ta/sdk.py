@@ -0,0 +1,86 @@
+# tech_analysis_api_v2 loads its .NET assemblies on import, which only works on
+# Windows with pythonnet. Elsewhere the simulator still needs the SDK's data
+# types, so the ones used by this package are mirrored below.
+import logging
+from dataclasses import dataclass
+from enum import Enum
+
+logger = logging.getLogger("runtime")
+
+try:
+    from tech_analysis_api_v2.api import TechAnalysis, TechAnalysisAPI
+    from tech_analysis_api_v2.model import (
+        eTA_Type,
+        eNK_Kind,
+        TKBarRec,
+        TBSRec,
+        ta_sma,
+        k_settnig,
+    )
+
+    SDK_AVAILABLE = True
+# pythonnet raises .NET exceptions when the assemblies cannot be loaded
+except Exception as e:
+    logger.warning("tech_analysis_api_v2 unavailable, only the simulator works: %s", e)
+    SDK_AVAILABLE = False
+
+    class TechAnalysis:
+        def __init__(self, *args, **kwargs):
+            raise RuntimeError("tech_analysis_api_v2 is not available")
+
+    TechAnalysisAPI = None
+
+    class eTA_Type(Enum):
+        SMA = 0
+        WMA = 1
+        EMA = 2
+        KD = 3
+        MACD = 4
+        SAR = 5
+        RSI = 6
+        CDP = 7
+        BBands = 8
+
+    class eNK_Kind(Enum):
+        DAY = (0,)
+        K_1m = 1
+        K_3m = 3
+        K_5m = 5
+
+    @dataclass
+    class TKBarRec:
+        Date: str
+        Product: str
+        TimeSn: int
+        TimeSn_Dply: int
+        Quantity: int
+        Volume: int
+        OPrice: float
+        HPrice: float
+        LPrice: float
+        CPrice: float
+
+    @dataclass
+    class TBSRec:
+        Prod: str
+        Sequence: int
+        Match_Time: float
+        Match_Price: float
+        Match_Quantity: int
+        Match_Volume: int
+        Is_TryMatch: bool
+        BS: int
+        BP_1_Pre: float
+        SP_1_Pre: float
+
+    @dataclass
+    class ta_sma:
+        KBar: TKBarRec
+        Value: float
+
+    class k_settnig:
+        def __init__(self, ProdID, NK, TA_Type, DateBegin):
+            self.ProdID = ProdID
+            self.NK = NK
+            self.TA_Type = TA_Type
+            self.DateBegin = DateBegin
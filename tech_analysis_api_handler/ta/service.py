@@ -1,24 +1,28 @@
 import multiprocessing
+import json
 import threading
 import queue
 import logging
+from collections import deque
 import asyncio
 from typing import Literal
 import time
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timedelta
 import pytz
-from dataclasses import dataclass, field
+from dataclasses import asdict, dataclass, field
 from typing import Literal
+from concurrent.futures import wait, FIRST_COMPLETED
+from functools import partial
+from fastapi import WebSocket, WebSocketDisconnect
 
-from tech_analysis_api_v2.api import TechAnalysis, TechAnalysisAPI, timedelta
-from tech_analysis_api_v2.model import eTA_Type, TBSRec, eNK_Kind
+from .sdk import TechAnalysis, TechAnalysisAPI, eTA_Type, TBSRec, eNK_Kind
 from tech_analysis_api_handler.database import (
     TickHandler,
 )
 
-from twse_codes import codes
-from .models import RtCode, StatusCode, Runtime
+from tech_analysis_api_handler import metrics
+from .models import RtCode, StatusCode, Runtime, RcvDone
 from .schemas import (
     TAResponse,
     GetResponse,
@@ -26,31 +30,86 @@ from .schemas import (
     PutResponse,
     DeleteResponse,
     SymbolsData,
+    SymbolInfoData,
+    BatchResponse,
     OHLCData,
     TickData,
     StatusData,
     InfoData,
 )
-from .utils import is_today, today, combine_date_time, today, kbar_time_formatter
-from .dependencies import settings, root_settings, get_config_table, get_db, ConfigRow
+from .utils import (
+    is_today,
+    today,
+    combine_date_time,
+    kbar_rows,
+    decode_ticks,
+)
+from .dependencies import (
+    settings,
+    root_settings,
+    get_config_table,
+    get_db,
+    ConfigRow,
+    DataType,
+)
+from tech_analysis_api_handler.serialization import Format, columnar_response
 from tech_analysis_api_handler.database import (
     Session,
     table_exist,
     OHLCTable,
+    Watermark,
+    get_engine,
+    get_ohlc_store,
     get_latest_datetime,
     MetaData,
     sqlite_insert,
     select,
 )
 from .dependencies import get_db
+from .buffer import get_bar_buffer
+from .pending import get_pending_requests, PendingRequests
+from .workers import get_callback_executor
+from .harvester import get_tick_harvester
+from .trading_calendar import get_trading_calendar
+from .planner import get_backfill_planner
+from .sessions import SessionPool
+from .supervisor import ConnectionSupervisor
+from .simulator import SimulatedTechAnalysis
+from .symbols import get_symbol_master
+from .stream import StreamHub, StreamClient
+from .bus import get_event_bus, BarUpdate, HistoryReceived
 from sqlalchemy.orm import mapper
 
 logger = logging.getLogger("runtime")
-event = threading.Event()
 
 
 def post_init():
+    try:
+        get_trading_calendar().refresh()
+    except Exception as e:
+        logger.warning("Trading calendar refresh failed: %s", e)
+    get_trading_calendar().start()
+    try:
+        get_event_bus().attach(asyncio.get_running_loop())
+    except RuntimeError:
+        logger.warning("No event loop running, async consumers are disabled")
+    get_event_bus().start()
+    get_callback_executor().start()
+    if settings.service.BarBuffer.ENABLED:
+        get_bar_buffer().start()
+    get_symbol_master().start()
     __ohlc_runtime.__load__()
+    if ApiConnector.api is not None:
+        threading.Thread(target=restore_subscriptions, daemon=True).start()
+
+
+def close():
+    __session_pool.stop()
+    get_callback_executor().stop()
+    get_event_bus().stop()
+    get_bar_buffer().stop()
+    get_symbol_master().stop()
+    get_trading_calendar().stop()
 
 
 class OHLCRuntime:
@@ -102,6 +161,7 @@ class OHLCRuntime:
         )
         self.__stop_signal__: bool = False
         self.__config__ = self.Config(name=f"{__name__}.{__class__.__name__}")
+        self.__progress__: dict = {}
         self.thread: threading.Thread = None
 
     def __save__(self):
@@ -146,7 +206,6 @@ class OHLCRuntime:
         self.thread.start()
         return StatusCode.Success.OK
 
-    # TODO
     def task(self) -> None:
         limit = 10
         count = 0
@@ -158,34 +217,101 @@ class OHLCRuntime:
             if count == limit:
                 return
 
-        symbols = codes.get_stocks_list()
-        latest_dt = today() - settings.STARTDATE_OFFSET
-        latest_dt = latest_dt.strftime("%Y%m%d")
-        symbols_ = (
-            symbols[symbols.index(self.config.updating_symbol) :]
-            if self.config.updating_symbol
-            else symbols
-        )
-        for symbol in symbols_:
-            self.__config__.updating_symbol = symbol
-            self.__config__.is_active = True
-            self.__save__()
-            k_config = ApiConnector.api.get_k_setting(
-                product=symbol,
-                ta_type=eTA_Type.SMA,
-                nk_Kind=eNK_Kind.K_1m,
-                date=latest_dt,
+        start_dt = today() - settings.STARTDATE_OFFSET
+        latest_dt = start_dt.strftime("%Y%m%d")
+        symbols_ = get_symbol_master().after(self.config.updating_symbol)
+        cfg = settings.service.OHLCRuntime
+        planner = get_backfill_planner()
+        begins = dict.fromkeys(symbols_, latest_dt)
+        if cfg.GAP_PLANNING:
+            # Only request symbols with missing sessions, from their first gap
+            plan = planner.plan(symbols_, start_dt, today())
+            symbols_ = [symbol for symbol in symbols_ if symbol in plan]
+            begins = {s: plan[s][0][0].strftime("%Y%m%d") for s in symbols_}
+        order = {symbol: i for i, symbol in enumerate(symbols_)}
+        pending = deque(symbols_)
+        in_flight: dict[str, tuple] = {}
+        attempts: dict[str, int] = {}
+        progress = self.__progress__ = {
+            "total": len(symbols_),
+            "completed": 0,
+            "empty": 0,
+            "failed": 0,
+            "retries": 0,
+            "in_flight": 0,
+            "started": time.monotonic(),
+        }
+        self.__config__.is_active = True
+
+        requests = get_pending_requests()
+        pool = get_session_pool()
+
+        def release(symbol: str, k_config, is_new: bool) -> None:
+            # A request shared with another caller is left to its owner
+            if is_new:
+                requests.cancel(k_config)
+                pool.unsubscribe(k_config, pool.request_owner(k_config))
+
+        def finish(symbol: str, code: RtCode) -> None:
+            k_config, _, _, is_new = in_flight.pop(symbol)
+            release(symbol, k_config, is_new)
+            if code == RtCode.EMPTY_DATA:
+                # No bars in the range, asking again would get none either
+                progress["empty"] += 1
+            elif code == RtCode.SUCCESS:
+                progress["completed"] += 1
+                if cfg.GAP_PLANNING:
+                    # Today's session is still open, it is never marked complete
+                    yesterday = today() - timedelta(days=1)
+                    try:
+                        planner.complete(symbol, begins[symbol], yesterday)
+                    except Exception as e:
+                        logger.warning("Completeness of %s not saved: %s", symbol, e)
+            elif attempts[symbol] < cfg.RETRIES:
+                attempts[symbol] += 1
+                progress["retries"] += 1
+                pending.append(symbol)
+            else:
+                progress["failed"] += 1
+                logger.warning("OHLC backfill of %s failed: %s", symbol, code)
+
+        while pending or in_flight:
+            if not self.__event__.is_set():
+                for symbol, (k_config, _, _, is_new) in in_flight.items():
+                    release(symbol, k_config, is_new)
+                return
+            while pending and len(in_flight) < cfg.WINDOW:
+                symbol = pending.popleft()
+                attempts.setdefault(symbol, 0)
+                k_config = ApiConnector.api.get_k_setting(
+                    product=symbol,
+                    ta_type=eTA_Type.SMA,
+                    nk_Kind=eNK_Kind.K_1m,
+                    date=begins[symbol],
+                )
+                future, is_new = requests.submit(k_config)
+                if is_new:
+                    pool.request(k_config)
+                deadline = time.monotonic() + cfg.TIMEOUT
+                in_flight[symbol] = (k_config, future, deadline, is_new)
+            futures = {future: symbol for _, future, _, _ in in_flight.values()}
+            done, _ = wait(futures, timeout=0.1, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = None if future.cancelled() else future.result()
+                finish(futures[future], result.code if result else RtCode.FAIL)
+            now = time.monotonic()
+            for symbol, (_, _, deadline, _) in list(in_flight.items()):
+                if now >= deadline:
+                    finish(symbol, RtCode.API_ERROR)
+            progress["in_flight"] = len(in_flight)
+
+            # Resume point is the earliest symbol that has not completed yet
+            unfinished = min(
+                [*in_flight, *pending], key=order.__getitem__, default=None
             )
-            print(latest_dt, symbol)
-            ApiConnector.api.SubTA(k_config)
-            while DataQueue.async_queue.empty():
-                if not self.__event__.is_set():
-                    return
-                time.sleep(0.1)
-            DataQueue.async_queue.get()
-            if self.config.updating_symbol == symbols[-1]:
-                self.config.updating_symbol = None
-            ApiConnector.api.UnSubTA(k_config)
+            if unfinished != self.config.updating_symbol:
+                self.__config__.updating_symbol = unfinished
+                self.__save__()
 
         return
 
@@ -195,13 +321,29 @@ class OHLCRuntime:
         else:
             return self.thread.is_alive()
 
-    def get_status(self) -> Config:
-        is_running = self.is_running
+    def throughput(self) -> float:
+        """Completed symbols per minute of the current or last backfill."""
+        progress = self.__progress__
+        if not progress:
+            return 0.0
+        elapsed = time.monotonic() - progress["started"]
+        return progress["completed"] / elapsed * 60 if elapsed > 0 else 0.0
+
+    def get_status(self) -> StatusData:
+        is_running = self.is_running()
         if is_running:
             status = f"Updating: {self.config.updating_symbol}"
         else:
             status = "Stopped."
-        return StatusData(name=__name__, active=self.is_running(), status=status)
+        progress = self.__progress__
+        if progress:
+            status += (
+                f" {progress['completed'] + progress['empty']}/{progress['total']}"
+                f" done, {progress['empty']} without bars, "
+                f"{progress['failed']} failed, {progress['in_flight']} in flight, "
+                f"{self.throughput():.1f} symbols/min"
+            )
+        return StatusData(name=__name__, active=is_running, status=status)
 
     def check_time(self) -> bool:
         now = datetime.now(self.__timezone__).time()
@@ -262,29 +404,8 @@ class TickRuntime:
         return StatusCode.Success.OK
 
     def task(self) -> None:
-
-        end_date = datetime.now(pytz.timezone("Asia/Taipei")).replace(tzinfo=None)
-        start_date = (end_date - pd.DateOffset(weeks=1)).replace(tzinfo=None)
-        all_data = []
-        symbols = codes.get_stocks_list()
-        for symbol in symbols:
-            for single_date in pd.date_range(
-                start=start_date, end=end_date.replace(tzinfo=None)
-            ):
-                lsBS, sErrMsg = ApiConnector.api.GetHisBS_Stock(symbol, single_date)
-                if sErrMsg:
-                    if sErrMsg == RtCode.DATA_ERROR:
-                        logger.warning("%s is up to date", symbol)
-                    else:
-                        logger.warning(sErrMsg)
-                else:
-                    data = [
-                        x.__dict__.update(
-                            {"datetime": combine_date_time(x.Match_Time, single_date)}
-                        )
-                        for x in lsBS
-                    ]
-            print(data)
+        target = settings.service.TickHarvester.TARGET
+        harvest_ticks(target, running=self.__event__)
 
     def is_running(self) -> bool:
         if self.thread is None:
@@ -293,12 +414,20 @@ class TickRuntime:
             return self.thread.is_alive()
 
     def get_status(self) -> StatusData:
-        is_running = self.is_running
-        if is_running:
-            status = f"Updating: {self.config.updating_symbol}"
+        is_running = self.is_running()
+        progress = get_tick_harvester().stats()
+        if is_running and progress:
+            status = (
+                f"Updating: {progress['done'] + progress['empty']}"
+                f"/{progress['total']} symbol-days, {progress['failed']} failed, "
+                f"{progress['jobs_per_sec']:.1f} calls/s, "
+                f"{progress['rows_per_sec']:.0f} rows/s"
+            )
+        elif is_running:
+            status = "Planning."
         else:
             status = "Stopped."
-        return StatusData(name=__name__, active=self.is_running(), status=status)
+        return StatusData(name=self.__name__, active=is_running, status=status)
 
     def check_time(self) -> bool:
         now = datetime.now(self.__timezone__).time()
@@ -317,70 +446,137 @@ __tick_runtime = TickRuntime()
 
 
 def connect():
-    r = ApiResponse
-    api = CustomTechAnalysis(
-        r.OnDigitalSSOEvent, r.OnTAConnStuEvent, r.OnUpdate, r.OnRcvDone
-    )
-    username = settings.secrets.USERNAME
-    password = settings.secrets.PASSWORD
-    api.Login(username, password)
-    result = event.wait()
-    if result:
-        ApiConnector.set_api(api)
+    if __session_pool.connect():
         return PostResponse(status_code=StatusCode.Success.OK)
     else:
         return PostResponse(status_code=StatusCode.RuntimeError.REQUEST_REJECTED)
 
 
-async def subscribe(product_id: str):
-    today = datetime.now(pytz.timezone("Asia/Taipei")).strftime("%Y%m%d")
-    k_config = ApiConnector.api.get_k_setting(
-        product_id, ta_type=eTA_Type.SMA, nk_Kind=eNK_Kind.K_1m, date=today
+def get_connection_status():
+    data = []
+    for stats in __session_pool.stats():
+        name = f"Session{stats['session']}"
+        status = StatusData(name=name, active=stats["connected"], status=stats["state"])
+        data += [status, InfoData(name=name, info=stats)]
+    return GetResponse(status_code=StatusCode.Success.OK, data=data)
+
+
+def live_k_setting(symbol: str, ta_type=eTA_Type.SMA, nk_kind=eNK_Kind.K_1m):
+    """k_config of today's bars, the key of live subscriptions."""
+    return ApiConnector.api.get_k_setting(
+        symbol, ta_type=ta_type, nk_Kind=nk_kind, date=today("%Y%m%d")
     )
-    api = ApiConnector.api
-    for setting in api.Subscribed_Symbol:
-        if setting.ProdID == k_config.ProdID:
-            return PutResponse(
-                status_code=StatusCode.RuntimeError.SYMBOL_ALREADY_SUBSCRIBED
-            )
-    api.SubTA(k_config)
-    api.Subscribed_Symbol.append(k_config)
+
+
+async def subscribe(product_id: str):
+    k_config = live_k_setting(product_id)
+    if not await asyncio.to_thread(__session_pool.subscribe, k_config):
+        return PutResponse(
+            status_code=StatusCode.RuntimeError.SYMBOL_ALREADY_SUBSCRIBED
+        )
 
     return PutResponse(status_code=StatusCode.Success.ACCEPTED)
 
 
 async def unsubscribe(product_id: str):
-    today = today(format="%Y%m%d")
-    k_config = ApiConnector.api.get_k_setting(
-        product_id, ta_type=eTA_Type.SMA, nk_Kind=eNK_Kind.K_1m, date=today
-    )
-    if k_config not in ApiConnector.api.Subscribed_Symbol:
+    k_config = live_k_setting(product_id)
+    if not await asyncio.to_thread(__session_pool.unsubscribe, k_config):
         return DeleteResponse(status_code=StatusCode.RuntimeError.SYMBOL_NOT_SUBSCRIBED)
 
-    ApiConnector.api.UnSubTA(k_config)
     return DeleteResponse(status_code=StatusCode.Success.ACCEPTED)
 
 
+async def subscribe_many(symbols: list[str]):
+    k_configs = [live_k_setting(symbol) for symbol in dict.fromkeys(symbols)]
+    start = time.perf_counter()
+    added = await asyncio.to_thread(__session_pool.subscribe_many, k_configs)
+    return batch_response(k_configs, added, time.perf_counter() - start)
+
+
+async def unsubscribe_many(symbols: list[str]):
+    k_configs = [live_k_setting(symbol) for symbol in dict.fromkeys(symbols)]
+    start = time.perf_counter()
+    removed = await asyncio.to_thread(__session_pool.unsubscribe_many, k_configs)
+    return batch_response(k_configs, removed, time.perf_counter() - start)
+
+
+def batch_response(requested: list, changed: list, seconds: float) -> BatchResponse:
+    info = {
+        "requested": len(requested),
+        "changed": len(changed),
+        "unchanged": len(requested) - len(changed),
+        "subscriptions": len(__session_pool.registry),
+        "seconds": seconds,
+    }
+    data = [
+        SymbolsData(data=[k_config.ProdID for k_config in changed]),
+        InfoData(name="SubscriptionRegistry", info=info),
+    ]
+    return BatchResponse(status_code=StatusCode.Success.ACCEPTED, data=data)
+
+
 async def list_subscriptions():
     data = []
-    for k_config in ApiConnector.api.Subscribed_Symbol:
+    for k_config in __session_pool.subscriptions():
         data.append(k_config.ProdID)
 
     return GetResponse(status_code=StatusCode.Success.OK, data=[SymbolsData(data=data)])
 
 
+def list_symbols(market: str = None, type: str = None, prefix: str = None):
+    master = get_symbol_master()
+    infos = master.query(market, type, prefix)
+    data = [
+        SymbolInfoData(data=[asdict(info) for info in infos]),
+        InfoData(name="SymbolMaster", info=master.stats()),
+    ]
+    return GetResponse(status_code=StatusCode.Success.OK, data=data)
+
+
+def get_symbol(symbol: str):
+    info = get_symbol_master().get(symbol)
+    if info is None:
+        return GetResponse(
+            status_code=StatusCode.ClientError.NOT_FOUND,
+            error_message=f"{symbol} is not in the symbol universe",
+        )
+    data = [SymbolInfoData(data=[asdict(info)])]
+    return GetResponse(status_code=StatusCode.Success.OK, data=data)
+
+
+def refresh_symbols():
+    if get_symbol_master().refresh():
+        return PutResponse(status_code=StatusCode.Success.OK)
+    return PutResponse(status_code=StatusCode.ServerError.INTERNAL_SERVER_ERROR)
+
+
+def restore_subscriptions() -> int:
+    """Subscribe again to what the durable owners held before a restart."""
+    registry = __session_pool.registry
+    try:
+        stored = registry.stored()
+    except Exception as e:
+        logger.warning("Stored subscriptions not loaded: %s", e)
+        return 0
+    by_owner: dict[str, list] = {}
+    for symbol, nk, ta_type, owner in stored:
+        k_config = live_k_setting(symbol, eTA_Type[ta_type], eNK_Kind[nk])
+        by_owner.setdefault(owner, []).append(k_config)
+    count = 0
+    for owner, k_configs in by_owner.items():
+        count += len(__session_pool.subscribe_many(k_configs, owner))
+    logger.info("Restored %d subscriptions", count)
+    return count
+
+
 # TODO: No dict return from api for now
 async def ohlc_get(symbol: str):
     latest_dt = today(format="%Y%m%d")
     k_config = ApiConnector.api.get_k_setting(
         product=symbol, ta_type=eTA_Type.SMA, nk_Kind=eNK_Kind.K_1m, date=latest_dt
     )
-    while True:
-        ApiConnector.api.SubTA(k_config)
-        data = await DataQueue.async_queue.get()
-        ApiConnector.api.UnSubTA(k_config)
-        break
-
+    result = await request_ohlc(k_config)
+    data = {symbol: result.data}
     return GetResponse(status_code=StatusCode.Success.OK, data=[OHLCData(data=data)])
 
 
@@ -395,15 +591,79 @@ async def ohlc_update(db: Session, symbol: str):
     k_config = ApiConnector.api.get_k_setting(
         product=symbol, ta_type=eTA_Type.SMA, nk_Kind=eNK_Kind.K_1m, date=latest_dt
     )
-    while True:
-        ApiConnector.api.SubTA(k_config)
-        data = await DataQueue.async_queue.get()
-        ApiConnector.api.UnSubTA(k_config)
-        break
-
+    result = await request_ohlc(k_config)
+    if result.code != RtCode.SUCCESS:
+        return PutResponse(status_code=StatusCode.ServerError.INTERNAL_SERVER_ERROR)
     return PutResponse(status_code=StatusCode.Success.OK)
 
 
+async def request_ohlc(k_config) -> RcvDone:
+    """SubTA ``k_config`` and wait for the OnRcvDone that answers it."""
+    requests = get_pending_requests()
+    future, is_new = requests.submit(k_config)
+    if is_new:
+        __session_pool.request(k_config)
+    try:
+        return await requests.wait(future, settings.service.OHLCRuntime.TIMEOUT)
+    except asyncio.TimeoutError:
+        # Only the owner may give up on a request other callers share
+        if is_new:
+            requests.cancel(k_config)
+        return RcvDone(code=RtCode.API_ERROR)
+    except asyncio.CancelledError:
+        if is_new or not future.cancelled():
+            raise
+        # The owner gave up on the shared request
+        return RcvDone(code=RtCode.API_ERROR)
+    finally:
+        if is_new:
+            owner = __session_pool.request_owner(k_config)
+            __session_pool.unsubscribe(k_config, owner)
+
+
+def fetch(db: Session, symbol: str, start: datetime = None, end: datetime = None):
+    data = get_ohlc_store().read(db, symbol, start, end)
+    return TAResponse(success=True, status_code=RtCode.SUCCESS.value, data=data)
+
+
+def read_ohlc(
+    db: Session,
+    symbol: str,
+    start: datetime = None,
+    end: datetime = None,
+    format: Format | Literal["json"] = "columnar",
+):
+    """Stored bars of ``symbol``, ``json`` goes through the response models."""
+    store = get_ohlc_store()
+    if format == "json":
+        data = [OHLCData(data={symbol: store.read(db, symbol, start, end)})]
+        return GetResponse(status_code=StatusCode.Success.OK, data=data)
+    columns = store.read_columns(db, symbol, start, end)
+    return columnar_response(DataType.OHLC, symbol, columns, format)
+
+
+def read_ticks(
+    symbol: str,
+    start: datetime = None,
+    end: datetime = None,
+    format: Format | Literal["json"] = "columnar",
+):
+    """Stored ticks of ``symbol``, ``json`` goes through the response models."""
+    columns = TickHandler().read_columns(symbol, start, end)
+    if format == "json":
+        rows = [dict(zip(columns, values)) for values in zip(*columns.values())]
+        data = [TickData(data={symbol: rows})]
+        return GetResponse(status_code=StatusCode.Success.OK, data=data)
+    return columnar_response(DataType.TICK, symbol, columns, format)
+
+
+def get_watermarks(dataset: str):
+    db_name = TickHandler.DB_NAME if dataset == Watermark.TICK else None
+    marks = Watermark.bulk(get_engine(db_name), dataset)
+    data = [InfoData(name=dataset, info=marks)]
+    return GetResponse(status_code=StatusCode.Success.OK, data=data)
+
+
 def load():
     info = __ohlc_runtime.__load__().__dict__
     name = info.pop("name", __name__)
@@ -428,46 +688,43 @@ def stop_ohlc_update():
 
 def get_ohlc_status():
     data = __ohlc_runtime.get_status()
-    return GetResponse(status_code=StatusCode.Success.OK, data=[data])
+    buffer = InfoData(name="BarBuffer", info=get_bar_buffer().stats())
+    workers = InfoData(name="CallbackWorkers", info=get_callback_executor().stats())
+    plan = InfoData(name="BackfillPlan", info=get_backfill_planner().last)
+    bus = InfoData(name="EventBus", info=get_event_bus().stats())
+    return GetResponse(
+        status_code=StatusCode.Success.OK, data=[data, buffer, workers, bus, plan]
+    )
 
 
 def start_tick_update():
-    result = __ohlc_runtime.run()
+    result = __tick_runtime.run()
     return PostResponse(status_code=result)
 
 
 def stop_tick_update():
-    print("stopping ohlc runtime...")
-    result = __ohlc_runtime.stop()
+    logger.info("Stopping tick runtime")
+    result = __tick_runtime.stop()
     return DeleteResponse(status_code=result)
 
 
 def get_tick_status():
-    data = __ohlc_runtime.get_status()
-    return GetResponse(status_code=StatusCode.Success.OK, data=[data])
+    data = __tick_runtime.get_status()
+    harvester = InfoData(name="TickHarvester", info=get_tick_harvester().stats())
+    return GetResponse(status_code=StatusCode.Success.OK, data=[data, harvester])
 
 
 async def subscribe_all():
-    today = datetime.now(pytz.timezone("Asia/Taipei")).strftime("%Y%m%d")
-    symbols = sorted(codes.get_stocks_list())
-    for symbol in symbols:
-        k_config = ApiConnector.api.get_k_setting(
-            symbol, ta_type=eTA_Type.SMA, nk_Kind=eNK_Kind.K_1m, date=today
-        )
-        api = ApiConnector.api
-        for setting in api.Subscribed_Symbol:
-            if setting.ProdID == k_config.ProdID:
-                continue
-        api.SubTA(k_config)
-        api.Subscribed_Symbol.append(k_config)
+    symbols = sorted(get_symbol_master().symbols())
+    k_configs = [live_k_setting(symbol) for symbol in symbols]
+    await asyncio.to_thread(__session_pool.subscribe_many, k_configs)
 
     return TAResponse(success=True, status_code=RtCode.SUCCESS, data=symbols)
 
 
 async def unsubscribe_all():
-    today = datetime.now(pytz.timezone("Asia/Taipei")).strftime("%Y%m%d")
-    for k_config in ApiConnector.api.Subscribed_Symbol:
-        ApiConnector.api.UnSubTA(k_config)
+    k_configs = __session_pool.subscriptions("api")
+    await asyncio.to_thread(__session_pool.unsubscribe_many, k_configs)
     return TAResponse(success=True, status_code=RtCode.SUCCESS)
 
 
@@ -486,112 +743,208 @@ def get_historical_data(
 
     if is_today(start_date):
         return RtCode.DATA_ERROR
-    all_data = []
-    for single_date in pd.date_range(
-        start=start_date, end=end_date.replace(tzinfo=None)
-    ):
-        lsBS, sErrMsg = ApiConnector.api.GetHisBS_Stock(product_id, single_date)
+    frames = []
+    calendar = get_trading_calendar()
+    for single_date in calendar.trading_days(start_date, end_date):
+        frame, sErrMsg = __session_pool.call(
+            product_id, "GetHisBS_Stock_frame", product_id, single_date
+        )
         if sErrMsg:
             if sErrMsg == RtCode.DATA_ERROR:
                 logger.info("%s is up to date", product_id)
             else:
                 logger.warning(sErrMsg)
         else:
-            for x in lsBS:
-                data_point = x.__dict__
-                data_point.update(
-                    {"datetime": combine_date_time(x.Match_Time, single_date)}
-                )
-                all_data.append(data_point)
-    return all_data
+            frames.append(frame)
+    if not frames:
+        return []
+    return pd.concat(frames, ignore_index=True).to_dict("records")
+
+
+def harvest_ticks(
+    target: Literal["local", "remote", "all"],
+    symbols: list[str] = None,
+    running: threading.Event = None,
+) -> dict:
+    """Fetch and store every missing symbol-day of tick history in parallel."""
+    handler = TickHandler()
+    end_date = datetime.now(pytz.timezone("Asia/Taipei")).replace(tzinfo=None)
+    latest = handler.get_latest_dates("remote" if target == "all" else target)
+    calendar = get_trading_calendar()
+    jobs = []
+    if symbols is None:
+        symbols = get_symbol_master().symbols()
+    for code in symbols:
+        dt = latest.get(code)
+        if dt is None:
+            # Tables written before the watermark existed are scanned instead
+            dt = handler.get_latest_date(code, target)
+        if dt is not None:
+            start_date = dt.replace(hour=0, minute=0, second=0, microsecond=0)
+            start_date = start_date + timedelta(days=1)
+        else:
+            start_date = end_date - settings.STARTDATE_OFFSET
+        for single_date in calendar.trading_days(start_date, end_date):
+            jobs.append((code, single_date))
+
+    def store(symbol: str, single_date: datetime, frame: pd.DataFrame) -> int:
+        if not len(frame):
+            return 0
+        # Rows already stored are skipped and do not count
+        reports = handler.bulk_load(symbol, frame, target)
+        return sum(report.inserted for report in reports)
+
+    def fetch(symbol: str, single_date: datetime):
+        return __session_pool.call(symbol, "GetHisBS_Stock_frame", symbol, single_date)
+
+    return get_tick_harvester().run(jobs, fetch, store, running)
 
 
 def update_tickdata(target: Literal["local", "remote", "all"]):
-    handler = TickHandler()
-    ac = ApiConnector()
-    ac.connect()
-    for code in codes.get_stocks_list():
-        dt = handler.get_latest_date(code, target)
-        start_date = dt + timedelta(days=1) if dt is not None else None
-        data = ac.get_historical_data(code, start_date)
-        if data == RtCode.DATA_ERROR:
-            continue
-        if data == RtCode.EMPTY_DATA:
-            continue
-        elif data == None or len(data) == 0:
-            logger.warning("Data not available from api for %s", code)
-            continue
-        handler.insert(code, data, target)
+    return harvest_ticks(target)
 
 
 class ApiResponse:
     ohlc_db = get_db()
 
-    def OnDigitalSSOEvent(aIsOK, aMsg):
-        print(f"OnDigitalSSOEvent: {aIsOK} {aMsg}")
+    def OnDigitalSSOEvent(
+        aIsOK, aMsg, supervisor: ConnectionSupervisor = None, generation: int = None
+    ):
+        logger.info("OnDigitalSSOEvent: %s %s", aIsOK, aMsg)
+        if not aIsOK and supervisor is not None:
+            supervisor.on_status(False, aMsg, generation)
 
-    def OnTAConnStuEvent(aIsOK):
-        print(f"OnTAConnStuEvent: {aIsOK}")
-        if aIsOK:
-            event.set()
-        else:
-            event.clear()
+    def OnTAConnStuEvent(
+        aIsOK, supervisor: ConnectionSupervisor = None, generation: int = None
+    ):
+        logger.info("OnTAConnStuEvent: %s", aIsOK)
+        if supervisor is not None:
+            supervisor.on_status(aIsOK, generation=generation)
 
     def OnUpdate(ta_Type: eTA_Type, aResultPre, aResultLast):
+        metrics.CALLBACKS.inc("OnUpdate", PendingRequests.name(ta_Type))
+        if aResultPre is None:
+            return
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("OnUpdate: %s", aResultPre.KBar.Product)
+        get_callback_executor().submit(
+            aResultPre.KBar.Product,
+            ApiResponse.thread_onupdate,
+            ta_Type,
+            aResultPre,
+            aResultLast,
+        )
 
-        print(f"OnUpdate: {aResultPre}")
-        args = {"result": aResultLast}
-        threading.Thread(
-            target=ApiResponse.thread_onupdate,
-            args=(
-                ta_Type,
-                aResultPre,
-                aResultLast,
+    def OnRcvDone(ta_Type: eTA_Type, aResult, product: str = None):
+        """History of a SubTA, sessions pass ``product`` for an empty one."""
+        metrics.CALLBACKS.inc("OnRcvDone", PendingRequests.name(ta_Type))
+        if not aResult and product is None:
+            logger.warning("OnRcvDone: empty result for %s", ta_Type)
+            return
+        symbol = aResult[0].KBar.Product if aResult else product
+        logger.debug("OnRcvDone: %s", symbol)
+        get_callback_executor().submit(
+            symbol,
+            ApiResponse.thread_onrcvdone,
+            ta_Type,
+            aResult,
+            symbol,
+            on_drop=partial(
+                ApiResponse.history_dropped,
+                HistoryReceived(symbol, PendingRequests.name(ta_Type), []),
             ),
-        ).start()
-        pass
-
-    def OnRcvDone(ta_Type: eTA_Type, aResult):
-        symbol = aResult[0].KBar.Product
-        print(f"OnRcvDone: {symbol}")
-        event.set()
-        thread = threading.Thread(
-            target=ApiResponse.thread_onrcvdone, args=(aResult,)
-        ).start()
+        )
 
     @classmethod
     def thread_onupdate(cls, ta_Type: eTA_Type, aResultPre, aResultLast):
+        # aResultPre is the finished bar, aResultLast the one still forming
+        results = [aResultPre] if aResultLast is None else [aResultPre, aResultLast]
+        rows = kbar_rows(results)
+        forming = rows[1] if len(rows) > 1 else None
+        event = BarUpdate(
+            rows[0]["Product"], PendingRequests.name(ta_Type), rows[0], forming
+        )
+        get_event_bus().publish(event)
+
+    @classmethod
+    def thread_onrcvdone(cls, ta_Type: eTA_Type, result, symbol: str):
+        dataset = kbar_rows(result) if result else []
+        event = HistoryReceived(symbol, PendingRequests.name(ta_Type), dataset)
+        get_event_bus().publish(event)
+
+    @classmethod
+    def write_bar(cls, event: BarUpdate):
+        if settings.service.BarBuffer.ENABLED:
+            get_bar_buffer().put(event.final)
+            return
         db = get_db()
         with db() as session:
-            aResultPre = [kbar_time_formatter(aResultPre)]
-            OHLCTable.insert_ignore(db=session, data=aResultPre)
+            get_ohlc_store().insert_ignore(db=session, data=[event.final])
+
+    @classmethod
+    def history_dropped(cls, event: HistoryReceived):
+        # The request of a dropped history would otherwise wait until TIMEOUT
+        result = RcvDone(RtCode.DATA_ERROR)
+        get_pending_requests().resolve(event.symbol, event.ta_type, result)
 
     @classmethod
-    def thread_onrcvdone(cls, result):
-        dataset = [kbar_time_formatter(r) for r in result]
+    def write_history(cls, event: HistoryReceived):
+        if not event.rows:
+            result = RcvDone(RtCode.EMPTY_DATA)
+            get_pending_requests().resolve(event.symbol, event.ta_type, result)
+            return
         db = get_db()
         try:
             with db() as session:
-
-                OHLCTable.insert_ignore(db=session, data=dataset)
+                get_ohlc_store().insert_ignore(db=session, data=event.rows)
         except Exception as e:
             logger.error(e)
-            if get_ohlc_instance().is_running():
-                DataQueue.async_queue.put_nowait(RtCode.DATA_ERROR)
+            code = RtCode.DATA_ERROR
         else:
-            if get_ohlc_instance().is_running():
-                DataQueue.async_queue.put_nowait(RtCode.SUCCESS)
-        return
+            code = RtCode.SUCCESS
+        result = RcvDone(code, event.rows)
+        get_pending_requests().resolve(event.symbol, event.ta_type, result)
 
 
 class CustomTechAnalysis(TechAnalysis):
-    Subscribed_Symbol = []
 
-    def GetHisBS_Stock(self, ProdID, Date: datetime):
+    def Logout(self):
+        # Release the SDK connection of a session that is being replaced
+        api = self.fTechAnalysisAPI
+        for name in ("Logout", "Dispose"):
+            method = getattr(api, name, None)
+            if method is not None:
+                method()
+                return
+
+    def TACallBack_OnRcvDone(self, sender, aResult):
+        # The SDK drops empty histories, which would leave their request
+        # waiting until it times out
+        if aResult is not None and aResult.Count == 0:
+            sub = sender.SubTARec
+            self.OnRcvDone(sub.TA_Type, [], sub.ProdID)
+            return
+        super().TACallBack_OnRcvDone(sender, aResult)
+
+    def __his_bs__(self, ProdID, Date: datetime):
         tSubBSRec = TechAnalysisAPI.TSubBSRec()
         tSubBSRec.ProdID = ProdID
         tSubBSRec.Date = Date.strftime("%Y%m%d")
-        flag, lsBS, aErrMsg = self.fTechAnalysisAPI.GetHisBS_Stock(tSubBSRec, None, "")
+        return self.fTechAnalysisAPI.GetHisBS_Stock(tSubBSRec, None, "")
+
+    def GetHisBS_Stock_frame(self, ProdID, Date: datetime):
+        """Columnar GetHisBS_Stock returning a DataFrame with a datetime column."""
+        flag, lsBS, aErrMsg = self.__his_bs__(ProdID, Date)
+        if flag:
+            return pd.DataFrame(decode_ticks(list(lsBS), Date)), aErrMsg
+        else:
+            if is_today(Date):
+                return None, RtCode.DATA_ERROR
+            else:
+                return None, RtCode.API_ERROR
+
+    def GetHisBS_Stock(self, ProdID, Date: datetime):
+        flag, lsBS, aErrMsg = self.__his_bs__(ProdID, Date)
         if flag:
             lsbss = []
             for x in lsBS:
@@ -628,8 +981,175 @@ class ApiConnector:
     @classmethod
     def set_api(cls, api: CustomTechAnalysis):
         cls.api = api
-        print("api set")
+        logger.info("TechAnalysis session set")
 
     @classmethod
     def get_api(cls) -> CustomTechAnalysis:
         return cls.api
+
+
+def new_session(supervisor: ConnectionSupervisor) -> CustomTechAnalysis:
+    r = ApiResponse
+    if settings.service.Simulator.ENABLED:
+        session = SimulatedTechAnalysis
+    else:
+        session = CustomTechAnalysis
+    # Status callbacks of a replaced session carry an outdated generation
+    generation = supervisor.generation
+    return session(
+        partial(r.OnDigitalSSOEvent, supervisor=supervisor, generation=generation),
+        partial(r.OnTAConnStuEvent, supervisor=supervisor, generation=generation),
+        r.OnUpdate,
+        r.OnRcvDone,
+    )
+
+
+def on_session(index: int, api: CustomTechAnalysis, reconnect: bool) -> None:
+    if index == 0 or ApiConnector.api is None:
+        ApiConnector.set_api(api)
+
+
+__session_pool = SessionPool(new_session, on_session)
+
+
+def get_session_pool() -> SessionPool:
+    return __session_pool
+
+
+def stream_subscribe(symbol: str) -> bool:
+    return __session_pool.subscribe(live_k_setting(symbol), owner="stream")
+
+
+def stream_unsubscribe(symbol: str) -> bool:
+    return __session_pool.unsubscribe(live_k_setting(symbol), owner="stream")
+
+
+__stream_hub = StreamHub(stream_subscribe, stream_unsubscribe)
+
+
+def get_stream_hub() -> StreamHub:
+    return __stream_hub
+
+
+def stream_bar(event: BarUpdate) -> None:
+    bars = [{**event.final, "final": True}]
+    if event.forming is not None:
+        bars.append({**event.forming, "final": False})
+    __stream_hub.dispatch(bars)
+
+
+def register_consumers() -> None:
+    bus = get_event_bus()
+    workers = settings.service.EventBus.WRITER_WORKERS
+    bus.subscribe("bar_writer", ApiResponse.write_bar, (BarUpdate,), workers=workers)
+    bus.subscribe(
+        "history_writer",
+        ApiResponse.write_history,
+        (HistoryReceived,),
+        workers=workers,
+        on_drop=ApiResponse.history_dropped,
+    )
+    # Streaming clients can fall behind, drop their oldest bars instead
+    bus.subscribe(
+        "stream",
+        stream_bar,
+        (BarUpdate,),
+        affinity="async",
+        active=__stream_hub.has_clients,
+    )
+
+
+register_consumers()
+
+
+def get_stream_status():
+    data = [InfoData(name="StreamHub", info=__stream_hub.stats())]
+    for name, stats in get_event_bus().stats().items():
+        data.append(InfoData(name=f"EventBus.{name}", info=stats))
+    return GetResponse(status_code=StatusCode.Success.OK, data=data)
+
+
+async def stream_events(client: StreamClient):
+    """Server-sent events of the bars ``client`` watches."""
+    heartbeat = settings.service.Stream.HEARTBEAT
+    await __stream_hub.connect(client)
+    try:
+        while not client.closed:
+            batch = await client.next_batch(heartbeat)
+            if batch:
+                yield "".join(f"event: bar\ndata: {message}\n\n" for message in batch)
+            elif not client.closed:
+                yield ": keep-alive\n\n"
+        yield f"event: close\ndata: {json.dumps({'reason': client.closed})}\n\n"
+    finally:
+        __stream_hub.disconnect(client)
+
+
+async def stream_websocket(websocket: WebSocket, client: StreamClient):
+    """Send bars over ``websocket``, {"symbols": [...]} replaces the filter."""
+    heartbeat = settings.service.Stream.HEARTBEAT
+    await websocket.accept()
+    await __stream_hub.connect(client)
+
+    async def receive():
+        try:
+            while True:
+                try:
+                    message = json.loads(await websocket.receive_text())
+                except ValueError:
+                    continue
+                if isinstance(message, dict) and "symbols" in message:
+                    await __stream_hub.watch(client, message["symbols"])
+        except WebSocketDisconnect:
+            client.close("client disconnected")
+
+    receiver = asyncio.create_task(receive())
+    try:
+        while not client.closed:
+            for message in await client.next_batch(heartbeat):
+                await websocket.send_text(message)
+        if not receiver.done():
+            # 1013: try again later, the client fell too far behind
+            await websocket.close(code=1013, reason=client.closed)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        __stream_hub.disconnect(client)
+
+
+@metrics.QUEUE_DEPTH.collector
+def queue_depths() -> dict:
+    return {
+        "data_queue": DataQueue.data_queue.qsize(),
+        "async_queue": DataQueue.async_queue.qsize(),
+        "callback_workers": sum(get_callback_executor().depth()),
+        "bar_buffer": get_bar_buffer().pending(),
+        "pending_requests": len(get_pending_requests()),
+        **{f"bus_{name}": c["pending"] for name, c in get_event_bus().stats().items()},
+    }
+
+
+@metrics.DROPPED.collector
+def dropped() -> dict:
+    return {
+        "callback_workers": get_callback_executor().stats()["dropped"],
+        "bar_buffer": get_bar_buffer().stats()["dropped"],
+        "bar_buffer_dead_letter": get_bar_buffer().stats()["dead_lettered"],
+        "stream_clients": __stream_hub.dropped(),
+        **{f"bus_{name}": c["dropped"] for name, c in get_event_bus().stats().items()},
+    }
+
+
+@metrics.BACKFILL.collector
+def backfill_progress() -> dict:
+    progress = {}
+    ohlc = __ohlc_runtime.__progress__
+    for state in ["total", "completed", "failed", "retries", "in_flight"]:
+        if state in ohlc:
+            progress["ohlc", state] = ohlc[state]
+    ticks = get_tick_harvester().stats()
+    for state in ["total", "done", "empty", "failed", "cancelled", "retries", "rows"]:
+        if state in ticks:
+            progress["tick", state] = ticks[state]
+    return progress
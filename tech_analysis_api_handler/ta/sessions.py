@@ -0,0 +1,303 @@
+import hashlib
+import logging
+import time
+from bisect import bisect
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Iterable, Iterator
+
+from tech_analysis_api_handler import metrics
+from .dependencies import settings
+from .harvester import TokenBucket
+from .subscriptions import SubscriptionRegistry
+from .supervisor import ConnectionSupervisor
+
+logger = logging.getLogger("runtime")
+
+
+def ring_hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent hash ring with ``vnodes`` virtual points per node.
+
+    Adding or removing a node only moves the keys of its own points, so
+    symbols keep their session when the pool is resized.
+    """
+
+    def __init__(self, nodes: Iterable[int], vnodes: int):
+        points = sorted(
+            (ring_hash(f"{node}#{v}"), node) for node in nodes for v in range(vnodes)
+        )
+        self.__hashes__ = [h for h, _ in points]
+        self.__nodes__ = [node for _, node in points]
+
+    def nodes(self, key: str) -> Iterator[int]:
+        """Distinct nodes clockwise from ``key``, the owner first."""
+        count = len(self.__nodes__)
+        start = bisect(self.__hashes__, ring_hash(key))
+        seen = set()
+        for i in range(count):
+            node = self.__nodes__[(start + i) % count]
+            if node not in seen:
+                seen.add(node)
+                yield node
+
+    def route(self, key: str, accept: callable = None) -> int:
+        """Owner of ``key``, or the next node ``accept`` agrees to."""
+        fallback = None
+        for node in self.nodes(key):
+            if accept is None or accept(node):
+                return node
+            if fallback is None:
+                fallback = node
+        return fallback
+
+
+class SessionPool:
+    """Several logged-in TechAnalysis sessions with symbols sharded across them.
+
+    Every session has its own ConnectionSupervisor. Symbols are routed by
+    consistent hashing; calls for a symbol whose session is down go to the
+    next connected session on the ring. Subscriptions are reference counted
+    per owner in a SubscriptionRegistry, stay on the session that made them
+    and are restored there after a reconnect. Bulk subscriptions call SubTA
+    on every session in parallel, each throttled to ``rate`` calls a second.
+    """
+
+    def __init__(
+        self,
+        factory: callable,
+        on_connected: callable = None,
+        size: int = None,
+        vnodes: int = None,
+        rate: float = None,
+        batch: int = None,
+    ):
+        cfg = settings.service.SessionPool
+        self.size = cfg.SIZE if size is None else size
+        vnodes = cfg.VNODES if vnodes is None else vnodes
+        self.rate = cfg.SUBSCRIBE_RATE if rate is None else rate
+        self.batch = cfg.SUBSCRIBE_BATCH if batch is None else batch
+        self.on_connected = on_connected
+        accounts = self.accounts()
+        self.supervisors = [
+            ConnectionSupervisor(
+                factory,
+                partial(self.__on_connected__, i),
+                credentials=accounts[i % len(accounts)],
+            )
+            for i in range(self.size)
+        ]
+        self.ring = HashRing(range(self.size), vnodes)
+        self.registry = SubscriptionRegistry()
+        self.__stats__ = [{"calls": 0, "errors": 0} for _ in range(self.size)]
+
+    @staticmethod
+    def accounts() -> list[tuple[str, str]]:
+        secrets = settings.secrets
+        accounts = [(secrets.USERNAME, secrets.PASSWORD)]
+        for account in secrets.ACCOUNTS:
+            username, _, password = account.partition(":")
+            accounts.append((username, password))
+        return accounts
+
+    def connect(self) -> bool:
+        """Log every session in concurrently, True when at least one is up."""
+        with ThreadPoolExecutor(max_workers=self.size) as executor:
+            results = list(executor.map(ConnectionSupervisor.connect, self.supervisors))
+        return any(results)
+
+    def stop(self) -> None:
+        for supervisor in self.supervisors:
+            supervisor.stop()
+
+    def is_connected(self) -> bool:
+        return any(s.is_connected() for s in self.supervisors)
+
+    def route(self, symbol: str) -> int:
+        return self.ring.route(symbol, lambda i: self.supervisors[i].is_connected())
+
+    def session(self, symbol: str):
+        return self.supervisors[self.route(symbol)].api
+
+    def primary(self):
+        """First connected session, for calls not tied to a symbol."""
+        for supervisor in self.supervisors:
+            if supervisor.is_connected():
+                return supervisor.api
+        return self.supervisors[0].api
+
+    def call(self, symbol: str, name: str, *args):
+        """Call SDK method ``name`` on the session that owns ``symbol``."""
+        return self.__invoke__(self.route(symbol), name, *args)
+
+    def __invoke__(self, index: int, name: str, *args):
+        stats = self.__stats__[index]
+        stats["calls"] += 1
+        start = time.perf_counter()
+        try:
+            result = getattr(self.supervisors[index].api, name)(*args)
+        except Exception:
+            stats["errors"] += 1
+            metrics.API_CALL_ERRORS.inc(index, name)
+            raise
+        finally:
+            metrics.API_CALL_SECONDS.observe(time.perf_counter() - start, index, name)
+        # History calls report failures as (None, error)
+        if isinstance(result, tuple) and result and result[0] is None:
+            stats["errors"] += 1
+            metrics.API_CALL_ERRORS.inc(index, name)
+        return result
+
+    def subscribe(self, k_config, owner: str = "api") -> bool:
+        """SubTA ``k_config`` for ``owner``, False when it already holds it.
+
+        The SDK is only called when no other owner holds the subscription.
+        """
+        return bool(self.subscribe_many([k_config], owner))
+
+    def unsubscribe(self, k_config, owner: str = "api") -> bool:
+        """Release ``owner``, UnSubTA once no owner holds the subscription."""
+        return bool(self.unsubscribe_many([k_config], owner))
+
+    @staticmethod
+    def request_owner(k_config) -> str:
+        """Owner of a one-shot history request, unique among those in flight."""
+        return f"request:{k_config.DateBegin}"
+
+    def request(self, k_config) -> None:
+        """SubTA ``k_config`` for a one-shot history request.
+
+        The SDK answers every SubTA with the bars from ``DateBegin``, so it is
+        called even when another owner holds the subscription. The request
+        holds it under ``request_owner`` until it is unsubscribed, which only
+        calls UnSubTA when no other owner is left.
+        """
+        owner = self.request_owner(k_config)
+        _, entry = self.registry.acquire(k_config, owner, self.route)
+        index = self.route(k_config.ProdID) if entry is None else entry.session
+        try:
+            self.__invoke__(index, "SubTA", k_config)
+        except Exception:
+            if entry is None:
+                self.registry.rollback(k_config, owner)
+            else:
+                self.registry.abandon(k_config)
+            raise
+        if entry is not None:
+            self.registry.confirm(k_config)
+
+    def subscribe_many(self, k_configs: Iterable, owner: str = "api") -> list:
+        """Subscribe ``owner`` to every k_config, returning those it did not hold.
+
+        A k_config whose SubTA failed is released again and left out, for
+        every owner that joined it while the call was in flight too.
+        """
+        added, joined, calls = [], [], []
+        for k_config in k_configs:
+            is_added, entry = self.registry.acquire(k_config, owner, self.route)
+            if is_added:
+                added.append(k_config)
+            if entry is not None:
+                calls.append((entry.session, entry.k_config))
+            elif is_added:
+                joined.append(k_config)
+        try:
+            failed = {id(k) for k in self.__throttled__("SubTA", calls)}
+        except Exception:
+            # Owners waiting on these entries must not wait forever
+            for _, k_config in calls:
+                self.registry.abandon(k_config)
+            raise
+        for _, k_config in calls:
+            if id(k_config) in failed:
+                self.registry.abandon(k_config)
+            else:
+                self.registry.confirm(k_config)
+        for k_config in joined:
+            if not self.registry.wait(k_config, owner):
+                failed.add(id(k_config))
+        self.registry.flush()
+        return [k_config for k_config in added if id(k_config) not in failed]
+
+    def unsubscribe_many(self, k_configs: Iterable, owner: str = "api") -> list:
+        """Release ``owner`` from every k_config, returning those it held.
+
+        A k_config whose UnSubTA failed stays held by ``owner`` and is left out.
+        """
+        removed, calls, released = [], [], []
+        for k_config in k_configs:
+            is_removed, entry = self.registry.release(k_config, owner)
+            if is_removed:
+                removed.append(k_config)
+            if entry is not None:
+                calls.append((entry.session, entry.k_config))
+                released.append((k_config, entry))
+        failed = {id(k) for k in self.__throttled__("UnSubTA", calls)}
+        kept = set()
+        for k_config, entry in released:
+            if id(entry.k_config) in failed:
+                self.registry.restore(entry, owner)
+                kept.add(id(k_config))
+        self.registry.flush()
+        return [k_config for k_config in removed if id(k_config) not in kept]
+
+    def __throttled__(self, name: str, calls: list[tuple[int, object]]) -> list:
+        """Run the SDK calls of every session in parallel, ``batch`` at a time.
+
+        Returns the k_configs whose call raised.
+        """
+        by_session: dict[int, list] = {}
+        for index, k_config in calls:
+            by_session.setdefault(index, []).append(k_config)
+
+        def run(index: int, k_configs: list) -> list:
+            bucket = TokenBucket(self.rate, self.batch)
+            failed = []
+            for k_config in k_configs:
+                bucket.acquire()
+                try:
+                    self.__invoke__(index, name, k_config)
+                except Exception as e:
+                    logger.error("%s of %s failed: %s", name, k_config.ProdID, e)
+                    failed.append(k_config)
+            return failed
+
+        if len(by_session) <= 1:
+            return [k for item in by_session.items() for k in run(*item)]
+        with ThreadPoolExecutor(max_workers=len(by_session)) as executor:
+            futures = [
+                executor.submit(run, index, k_configs)
+                for index, k_configs in by_session.items()
+            ]
+        return [k_config for future in futures for k_config in future.result()]
+
+    def subscriptions(self, owner: str = None) -> list:
+        return [entry.k_config for entry in self.registry.entries(owner)]
+
+    def __on_connected__(self, index: int, api, reconnect: bool) -> None:
+        if reconnect:
+            # Subscriptions do not survive the old session
+            owned = [(index, e.k_config) for e in self.registry.entries(session=index)]
+            self.__throttled__("SubTA", owned)
+            logger.info("Resubscribed %d symbols on session %d", len(owned), index)
+        if self.on_connected is not None:
+            self.on_connected(index, api, reconnect)
+
+    def stats(self) -> list[dict]:
+        counts = self.registry.counts()
+        result = []
+        for i, supervisor in enumerate(self.supervisors):
+            health = supervisor.health()
+            result.append(
+                {
+                    "session": i,
+                    "username": supervisor.username,
+                    "subscriptions": counts.get(i, 0),
+                    **self.__stats__[i],
+                    **health,
+                }
+            )
+        return result
@@ -0,0 +1,228 @@
+import logging
+import random
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from twse_codes import codes
+
+from .dependencies import settings
+from .models import RtCode
+from .sdk import eTA_Type, eNK_Kind, TKBarRec, TBSRec, ta_sma, k_settnig
+from .utils import decode_ticks, today
+
+logger = logging.getLogger("runtime")
+
+
+class SimulatedTechAnalysis:
+    """Offline stand-in for CustomTechAnalysis producing synthetic market data.
+
+    Implements the calls the service makes on a session and fires the SDK
+    callbacks from background threads like the real API: login confirmation
+    after ``LOGIN_DELAY``, the history of every SubTA after ``RCV_DELAY`` and
+    an OnUpdate per subscribed symbol every ``UPDATE_INTERVAL`` seconds.
+    Prices are a random walk seeded by symbol and date, so repeated requests
+    return the same bars.
+    """
+
+    FIRST_MINUTE = 9 * 60 + 1
+    LAST_MINUTE = 13 * 60 + 30
+
+    def __init__(self, OnDigitalSSOEvent, OnTAConnStuEvent, OnUpdate, OnRcvDone):
+        self.OnDigitalSSOEvent = OnDigitalSSOEvent
+        self.OnTAConnStuEvent = OnTAConnStuEvent
+        self.OnUpdate = OnUpdate
+        self.OnRcvDone = OnRcvDone
+        self.cfg = settings.service.Simulator
+        self.__lock__ = threading.Lock()
+        self.__subscribed__: dict[str, k_settnig] = {}
+        self.__stop__ = threading.Event()
+        self.thread: threading.Thread = None
+
+    @staticmethod
+    def get_k_setting(product, ta_type, nk_Kind, date):
+        return k_settnig(product, nk_Kind, ta_type, date)
+
+    def Login(self, userid, password):
+        def confirm():
+            self.OnDigitalSSOEvent(True, "simulated")
+            self.OnTAConnStuEvent(True)
+
+        threading.Timer(self.cfg.LOGIN_DELAY, confirm).start()
+        self.thread = threading.Thread(
+            target=self.task, name="simulator", daemon=True
+        )
+        self.thread.start()
+
+    def Logout(self):
+        self.__stop__.set()
+
+    def SubTA(self, k_config):
+        with self.__lock__:
+            self.__subscribed__[k_config.ProdID] = k_config
+        threading.Timer(self.cfg.RCV_DELAY, self.__rcv_done__, (k_config,)).start()
+
+    def UnSubTA(self, k_config):
+        with self.__lock__:
+            self.__subscribed__.pop(k_config.ProdID, None)
+
+    def get_ohlc(self, ProdID, start_date: str | datetime, period: eNK_Kind):
+        if isinstance(start_date, datetime):
+            start_date = start_date.strftime("%Y%m%d")
+        self.SubTA(self.get_k_setting(ProdID, eTA_Type.SMA, period, start_date))
+
+    @staticmethod
+    def rng(*key) -> random.Random:
+        seed = settings.service.Simulator.SEED
+        return random.Random(zlib.crc32(repr((seed, *key)).encode()))
+
+    @classmethod
+    def base_price(cls, symbol: str) -> float:
+        return round(cls.rng(symbol).uniform(10, 1000), 1)
+
+    @classmethod
+    def kbar(cls, symbol: str, date: datetime, minute: int) -> ta_sma:
+        """A single bar seeded by its minute, cheap enough for live updates."""
+        rnd = cls.rng(symbol, date.strftime("%Y%m%d"), minute)
+        o = round(cls.base_price(symbol) * (1 + rnd.uniform(-0.05, 0.05)), 2)
+        c = round(o * (1 + rnd.gauss(0, 0.002)), 2)
+        quantity = rnd.randint(1, 500)
+        time_sn = minute // 60 * 100 + minute % 60
+        kbar = TKBarRec(
+            date.strftime("%Y%m%d"),
+            symbol,
+            time_sn,
+            time_sn,
+            quantity,
+            quantity * (minute - cls.FIRST_MINUTE + 1),
+            o,
+            max(o, c),
+            min(o, c),
+            c,
+        )
+        return ta_sma(kbar, c)
+
+    @classmethod
+    def kbars(cls, symbol: str, date: datetime, last: int = None) -> list[ta_sma]:
+        """Synthetic 1m bars of one session, up to minute ``last`` of the day."""
+        rnd = cls.rng(symbol, date.strftime("%Y%m%d"))
+        price = round(cls.base_price(symbol) * (1 + rnd.uniform(-0.05, 0.05)), 2)
+        last = cls.LAST_MINUTE if last is None else min(last, cls.LAST_MINUTE)
+        d = date.strftime("%Y%m%d")
+        result = []
+        volume = 0
+        for minute in range(cls.FIRST_MINUTE, last + 1):
+            o = price
+            c = max(0.01, round(o * (1 + rnd.gauss(0, 0.002)), 2))
+            h = round(max(o, c) * (1 + abs(rnd.gauss(0, 0.001))), 2)
+            l = round(min(o, c) * (1 - abs(rnd.gauss(0, 0.001))), 2)
+            quantity = rnd.randint(1, 500)
+            volume += quantity
+            time_sn = minute // 60 * 100 + minute % 60
+            kbar = TKBarRec(d, symbol, time_sn, time_sn, quantity, volume, o, h, l, c)
+            result.append(ta_sma(kbar, c))
+            price = c
+        return result
+
+    def history(self, k_config) -> list[ta_sma]:
+        start = datetime.strptime(k_config.DateBegin, "%Y%m%d")
+        now = today().replace(tzinfo=None)
+        result = []
+        day = start
+        while day.date() <= now.date():
+            if day.weekday() < 5:
+                last = now.hour * 60 + now.minute if day.date() == now.date() else None
+                result.extend(self.kbars(k_config.ProdID, day, last))
+            day += timedelta(days=1)
+        return result
+
+    def __rcv_done__(self, k_config) -> None:
+        result = self.history(k_config)
+        # Empty results are reported with their product, like CustomTechAnalysis
+        self.OnRcvDone(eTA_Type.SMA, result, k_config.ProdID)
+
+    @classmethod
+    def live_minute(cls, now: datetime) -> int | None:
+        """Minute of the bar forming at ``now``, None outside weekday sessions."""
+        minute = now.hour * 60 + now.minute + 1
+        if now.weekday() >= 5 or not cls.FIRST_MINUTE <= minute <= cls.LAST_MINUTE:
+            return None
+        return minute
+
+    def task(self) -> None:
+        """Fire live updates and the configured disconnects until Logout."""
+        cfg = self.cfg
+        started = time.monotonic()
+        while not self.__stop__.wait(cfg.UPDATE_INTERVAL):
+            if cfg.DISCONNECT_EVERY:
+                if time.monotonic() - started > cfg.DISCONNECT_EVERY:
+                    self.__stop__.set()
+                    self.OnTAConnStuEvent(False)
+                    return
+            with self.__lock__:
+                symbols = list(self.__subscribed__)
+            now = today().replace(tzinfo=None)
+            minute = self.live_minute(now)
+            if minute is None:
+                continue
+            for symbol in symbols:
+                pre = self.kbar(symbol, now, minute - 1)
+                self.OnUpdate(eTA_Type.SMA, pre, self.kbar(symbol, now, minute))
+
+    def ticks(self, ProdID, Date: datetime) -> list[TBSRec]:
+        """Synthetic trade prints of one session, trial matches first."""
+        seed = self.rng(ProdID, Date.strftime("%Y%m%d"), "bs").getrandbits(32)
+        rnd = np.random.default_rng(seed)
+        count = self.cfg.TICKS_PER_DAY
+        trial = max(1, count // 100)
+        seconds = np.sort(rnd.uniform(9 * 3600, 13.5 * 3600, count))
+        seconds[:trial] = np.linspace(8.5 * 3600, 9 * 3600 - 1, trial)
+        seconds = np.round(seconds, 6)
+        whole = np.floor(seconds).astype("i8")
+        hhmmss = whole // 3600 * 10000 + whole % 3600 // 60 * 100 + whole % 60
+        match_time = np.round(hhmmss + (seconds - whole), 6)
+        walk = np.exp(np.cumsum(rnd.normal(0, 0.0005, count)))
+        price = np.round(self.base_price(ProdID) * walk, 2)
+        quantity = rnd.integers(1, 50, count)
+        volume = np.cumsum(np.where(np.arange(count) < trial, 0, quantity))
+        side = rnd.integers(1, 3, count)
+        return [
+            TBSRec(
+                ProdID,
+                i,
+                float(match_time[i]),
+                float(price[i]),
+                int(quantity[i]),
+                int(volume[i]),
+                bool(i < trial),
+                int(side[i]),
+                float(price[i] - 0.05),
+                float(price[i]),
+            )
+            for i in range(count)
+        ]
+
+    def GetHisBS_Stock(self, ProdID, Date: datetime):
+        if Date.weekday() >= 5:
+            return None, RtCode.DATA_ERROR
+        return self.ticks(ProdID, Date), ""
+
+    def GetHisBS_Stock_frame(self, ProdID, Date: datetime):
+        records, error = self.GetHisBS_Stock(ProdID, Date)
+        if error:
+            return None, error
+        return pd.DataFrame(decode_ticks(records, Date)), error
+
+
+def universe() -> list[str]:
+    """The first UNIVERSE listed stocks, padded with made up codes if needed."""
+    size = settings.service.Simulator.UNIVERSE
+    symbols = list(codes.get_stocks_list())[:size]
+    extra = 0
+    while len(symbols) < size:
+        symbols.append(f"S{extra:05d}")
+        extra += 1
+    return symbols
@@ -0,0 +1,219 @@
+import asyncio
+import json
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Iterable, Literal
+
+from .dependencies import settings
+
+logger = logging.getLogger("runtime")
+
+Policy = Literal["drop_oldest", "disconnect"]
+
+
+def encode(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+class StreamClient:
+    """Bounded send buffer of one streaming consumer.
+
+    Messages are queued on the event loop. When ``size`` messages are waiting
+    the ``policy`` applies: ``drop_oldest`` discards the oldest message and
+    ``disconnect`` closes the client, so a slow consumer never holds up the
+    others or the ingestion behind them.
+    """
+
+    def __init__(
+        self,
+        symbols: Iterable[str] = None,
+        size: int = None,
+        policy: Policy = None,
+    ):
+        cfg = settings.service.Stream
+        self.symbols = frozenset(symbols) if symbols else None
+        self.size = cfg.BUFFER if size is None else size
+        self.policy = cfg.POLICY if policy is None else policy
+        self.buffer: deque[str] = deque()
+        self.ready = asyncio.Event()
+        self.closed: str | None = None
+        self.sent = 0
+        self.dropped = 0
+
+    def offer(self, message: str) -> None:
+        if self.closed:
+            return
+        if len(self.buffer) >= self.size:
+            if self.policy == "disconnect":
+                self.close("send buffer full")
+                return
+            self.buffer.popleft()
+            self.dropped += 1
+        self.buffer.append(message)
+        self.ready.set()
+
+    def close(self, reason: str) -> None:
+        if self.closed is None:
+            self.closed = reason
+        self.ready.set()
+
+    async def next_batch(self, timeout: float = None) -> list[str]:
+        """Every waiting message, or an empty list after ``timeout`` or close."""
+        if not self.buffer and not self.closed:
+            self.ready.clear()
+            try:
+                await asyncio.wait_for(self.ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        batch = list(self.buffer)
+        self.buffer.clear()
+        self.sent += len(batch)
+        return batch
+
+    def stats(self) -> dict:
+        return {
+            "symbols": sorted(self.symbols) if self.symbols else None,
+            "policy": self.policy,
+            "pending": len(self.buffer),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "closed": self.closed,
+        }
+
+
+class StreamHub:
+    """Fans bars out to many streaming clients on the event loop.
+
+    ``dispatch`` encodes each bar once and offers it to the clients watching
+    its symbol. Clients share one upstream subscription per
+    symbol: ``subscribe(symbol)`` runs for the first watcher and returns True
+    when it created the subscription, which ``unsubscribe(symbol)`` then
+    removes after the last watcher left. Subscriptions made elsewhere are left
+    alone. Both run on worker threads under one lock and check the watchers
+    again first, so a client leaving while its subscription is being made
+    still releases it.
+    """
+
+    def __init__(self, subscribe: callable = None, unsubscribe: callable = None):
+        self.subscribe = subscribe
+        self.unsubscribe = unsubscribe
+        self.__loop__: asyncio.AbstractEventLoop = None
+        self.__clients__: set[StreamClient] = set()
+        self.__wildcard__: set[StreamClient] = set()
+        self.__by_symbol__: dict[str, set[StreamClient]] = {}
+        self.__owned__: set[str] = set()
+        self.__lock__ = threading.Lock()
+        self.__stats__ = {
+            "published": 0,
+            "delivered": 0,
+            "disconnected": 0,
+            "dropped": 0,
+        }
+
+    def has_clients(self) -> bool:
+        return bool(self.__clients__)
+
+    def dispatch(self, bars: list[dict]) -> None:
+        """Offer bars to the clients watching them, on the event loop only."""
+        self.__stats__["published"] += len(bars)
+        for bar in bars:
+            watchers = self.__by_symbol__.get(bar["Product"], ())
+            if not watchers and not self.__wildcard__:
+                continue
+            message = json.dumps(bar, default=encode)
+            for client in (*watchers, *self.__wildcard__):
+                if client.closed:
+                    continue
+                client.offer(message)
+                if client.closed:
+                    self.__stats__["disconnected"] += 1
+                else:
+                    self.__stats__["delivered"] += 1
+
+    async def connect(self, client: StreamClient) -> None:
+        self.__loop__ = asyncio.get_running_loop()
+        self.__clients__.add(client)
+        await self.watch(client, client.symbols)
+
+    async def watch(self, client: StreamClient, symbols: Iterable[str] = None) -> None:
+        """Replace the symbol filter of ``client``, None receives every bar."""
+        self.__unwatch__(client)
+        client.symbols = frozenset(symbols) if symbols else None
+        if client.symbols is None:
+            self.__wildcard__.add(client)
+            return
+        first = []
+        for symbol in client.symbols:
+            watchers = self.__by_symbol__.setdefault(symbol, set())
+            if not watchers:
+                first.append(symbol)
+            watchers.add(client)
+        if first and self.subscribe is not None:
+            await asyncio.to_thread(self.__subscribe__, first)
+
+    def disconnect(self, client: StreamClient) -> None:
+        """Forget ``client``, safe to call from a cancelled request."""
+        if client not in self.__clients__:
+            return
+        self.__clients__.discard(client)
+        self.__stats__["dropped"] += client.dropped
+        self.__unwatch__(client)
+
+    def __unwatch__(self, client: StreamClient) -> None:
+        self.__wildcard__.discard(client)
+        last = []
+        for symbol in client.symbols or ():
+            watchers = self.__by_symbol__.get(symbol)
+            if watchers is None:
+                continue
+            watchers.discard(client)
+            if not watchers:
+                del self.__by_symbol__[symbol]
+                last.append(symbol)
+        if last and self.unsubscribe is not None:
+            # Not awaited, the SDK calls must not hold up the request teardown
+            self.__loop__.run_in_executor(None, self.__unsubscribe__, last)
+
+    def __subscribe__(self, symbols: list[str]) -> None:
+        for symbol in symbols:
+            with self.__lock__:
+                # The last watcher may have left before the call was made
+                if symbol in self.__owned__ or symbol not in self.__by_symbol__:
+                    continue
+                try:
+                    if self.subscribe(symbol):
+                        self.__owned__.add(symbol)
+                except Exception as e:
+                    logger.error("Stream subscription of %s failed: %s", symbol, e)
+
+    def __unsubscribe__(self, symbols: list[str]) -> None:
+        for symbol in symbols:
+            with self.__lock__:
+                # Another client may have started watching while this one left
+                if symbol not in self.__owned__ or symbol in self.__by_symbol__:
+                    continue
+                self.__owned__.discard(symbol)
+                try:
+                    self.unsubscribe(symbol)
+                except Exception as e:
+                    logger.error("Stream unsubscription of %s failed: %s", symbol, e)
+
+    def dropped(self) -> int:
+        """Messages dropped for slow clients, including departed ones."""
+        current = sum(client.dropped for client in list(self.__clients__))
+        return self.__stats__["dropped"] + current
+
+    def stats(self) -> dict:
+        clients = list(self.__clients__)
+        return {
+            "clients": len(clients),
+            "symbols": len(self.__by_symbol__),
+            "upstream_subscriptions": len(self.__owned__),
+            "buffered": sum(len(client.buffer) for client in clients),
+            **self.__stats__,
+            "dropped": self.dropped(),
+        }
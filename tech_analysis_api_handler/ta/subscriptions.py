@@ -0,0 +1,189 @@
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Iterable
+
+from tech_analysis_api_handler.database import Subscriptions, get_engine
+from .pending import PendingRequests
+
+logger = logging.getLogger("runtime")
+
+
+@dataclass
+class Subscription:
+    k_config: object
+    session: int
+    owners: set[str] = field(default_factory=set)
+    # Set once the SubTA of a new entry succeeded or the entry was abandoned
+    ready: threading.Event = field(
+        default_factory=threading.Event, repr=False, compare=False
+    )
+
+
+class SubscriptionRegistry:
+    """Active SubTA subscriptions keyed by (ProdID, NK, TA_Type).
+
+    Every entry holds the owners referencing it, such as the API and the
+    streaming hub, and the session it was made on. Callers make the SDK
+    subscription when ``acquire`` returns a new entry, then ``confirm`` it or
+    ``abandon`` it when the call failed, and remove it when ``release``
+    returns the last one. Owners joining an entry in between share its
+    outcome through ``wait``. Changes of ``durable`` owners are persisted by
+    ``flush`` so the subscriptions survive a restart.
+    """
+
+    def __init__(self, durable: Iterable[str] = ("api",)):
+        self.durable = frozenset(durable)
+        self.__lock__ = threading.Lock()
+        self.__entries__: dict[tuple, Subscription] = {}
+        self.__changes__: dict[tuple, bool] = {}
+
+    @staticmethod
+    def key(k_config) -> tuple:
+        name = PendingRequests.name
+        return k_config.ProdID, name(k_config.NK), name(k_config.TA_Type)
+
+    def acquire(
+        self, k_config, owner: str, route: callable
+    ) -> tuple[bool, Subscription | None]:
+        """Add ``owner`` to the subscription of ``k_config``.
+
+        Returns whether ``owner`` was added and, when no one held the
+        subscription before, its new entry on the session ``route(symbol)``
+        picked.
+        """
+        key = self.key(k_config)
+        with self.__lock__:
+            entry = self.__entries__.get(key)
+            if entry is not None:
+                if owner in entry.owners:
+                    return False, None
+                entry.owners.add(owner)
+                self.__changed__(key, owner, True)
+                return True, None
+            entry = Subscription(k_config, route(k_config.ProdID), {owner})
+            self.__entries__[key] = entry
+            self.__changed__(key, owner, True)
+            return True, entry
+
+    def release(self, k_config, owner: str) -> tuple[bool, Subscription | None]:
+        """Remove ``owner``, returning the entry too when it was the last one."""
+        key = self.key(k_config)
+        with self.__lock__:
+            entry = self.__entries__.get(key)
+            if entry is None or owner not in entry.owners:
+                return False, None
+            entry.owners.discard(owner)
+            self.__changed__(key, owner, False)
+            if entry.owners:
+                return True, None
+            del self.__entries__[key]
+            return True, entry
+
+    def confirm(self, k_config) -> None:
+        """Mark the new entry of ``k_config`` as subscribed upstream."""
+        entry = self.__entries__.get(self.key(k_config))
+        if entry is not None:
+            entry.ready.set()
+
+    def abandon(self, k_config) -> None:
+        """Drop the new entry of ``k_config`` whose SubTA failed.
+
+        Every owner that joined it while the call was in flight goes with it.
+        """
+        key = self.key(k_config)
+        with self.__lock__:
+            entry = self.__entries__.get(key)
+            if entry is None or entry.ready.is_set():
+                return
+            del self.__entries__[key]
+            for owner in entry.owners:
+                self.__changes__.pop((*key, owner), None)
+        entry.ready.set()
+
+    def wait(self, k_config, owner: str, timeout: float = None) -> bool:
+        """Wait for the SubTA of a joined entry, True when ``owner`` holds it."""
+        entry = self.__entries__.get(self.key(k_config))
+        if entry is None:
+            return False
+        entry.ready.wait(timeout)
+        return entry.ready.is_set() and self.holds(k_config, owner)
+
+    def rollback(self, k_config, owner: str) -> None:
+        """Undo an ``acquire`` of ``owner`` whose SubTA failed."""
+        key = self.key(k_config)
+        with self.__lock__:
+            entry = self.__entries__.get(key)
+            if entry is None or owner not in entry.owners:
+                return
+            entry.owners.discard(owner)
+            if not entry.owners:
+                del self.__entries__[key]
+            self.__changes__.pop((*key, owner), None)
+
+    def restore(self, entry: Subscription, owner: str) -> None:
+        """Undo the ``release`` of ``owner`` that returned ``entry``."""
+        key = self.key(entry.k_config)
+        entry.ready.set()
+        with self.__lock__:
+            current = self.__entries__.setdefault(key, entry)
+            current.owners.add(owner)
+            self.__changes__.pop((*key, owner), None)
+
+    def __changed__(self, key: tuple, owner: str, held: bool) -> None:
+        if owner in self.durable:
+            self.__changes__[(*key, owner)] = held
+
+    def __contains__(self, k_config) -> bool:
+        return self.key(k_config) in self.__entries__
+
+    def holds(self, k_config, owner: str) -> bool:
+        entry = self.__entries__.get(self.key(k_config))
+        return entry is not None and owner in entry.owners
+
+    def entries(self, owner: str = None, session: int = None) -> list[Subscription]:
+        with self.__lock__:
+            entries = list(self.__entries__.values())
+        return [
+            entry
+            for entry in entries
+            if (owner is None or owner in entry.owners)
+            and (session is None or entry.session == session)
+        ]
+
+    def counts(self) -> dict[int, int]:
+        """Subscriptions per session."""
+        result = {}
+        for entry in self.entries():
+            result[entry.session] = result.get(entry.session, 0) + 1
+        return result
+
+    def flush(self, executor=None) -> bool:
+        """Persist the changes of durable owners since the last flush."""
+        with self.__lock__:
+            changes = self.__changes__
+            self.__changes__ = {}
+        if not changes:
+            return True
+        added = [key for key, held in changes.items() if held]
+        removed = [key for key, held in changes.items() if not held]
+        try:
+            if executor is None:
+                with get_engine().begin() as conn:
+                    Subscriptions.update(conn, added, removed)
+            else:
+                Subscriptions.update(executor, added, removed)
+        except Exception as e:
+            logger.error("Saving subscriptions failed: %s", e)
+            with self.__lock__:
+                # Newer changes made during the write take precedence
+                self.__changes__ = {**changes, **self.__changes__}
+            return False
+        return True
+
+    def stored(self, executor=None) -> list[tuple]:
+        """Persisted (ProdID, NK, TA_Type, owner) rows."""
+        return Subscriptions.all(get_engine() if executor is None else executor)
+
+    def __len__(self) -> int:
+        return len(self.__entries__)
@@ -0,0 +1,220 @@
+import logging
+import random
+import threading
+import time
+from typing import Literal
+
+from .dependencies import settings
+
+logger = logging.getLogger("runtime")
+
+State = Literal["disconnected", "connecting", "connected", "reconnecting", "stopped"]
+
+
+class ConnectionSupervisor:
+    """Owns the login and reconnection of the TechAnalysis session.
+
+    ``factory(supervisor)`` builds a fresh SDK session whose OnTAConnStuEvent
+    and OnDigitalSSOEvent are forwarded to ``supervisor.on_status`` with the
+    ``supervisor.generation`` it was built for. Every login logs out the
+    previous session and starts a new generation, so late status callbacks of
+    a replaced session are ignored. A login that is not confirmed within
+    ``login_timeout`` counts as failed. When an established
+    session drops, a background thread logs in again with exponential backoff
+    and jitter, then hands the new session to ``on_connected(api, reconnect)``
+    so subscriptions can be restored.
+    """
+
+    def __init__(
+        self,
+        factory: callable,
+        on_connected: callable = None,
+        login_timeout: float = None,
+        backoff: float = None,
+        backoff_max: float = None,
+        jitter: float = None,
+        credentials: tuple[str, str] = None,
+    ):
+        cfg = settings.service.Supervisor
+        if credentials is None:
+            credentials = settings.secrets.USERNAME, settings.secrets.PASSWORD
+        self.username, self.__password__ = credentials
+        self.factory = factory
+        self.on_connected = on_connected
+        self.login_timeout = (
+            cfg.LOGIN_TIMEOUT if login_timeout is None else login_timeout
+        )
+        self.backoff = cfg.BACKOFF if backoff is None else backoff
+        self.backoff_max = cfg.BACKOFF_MAX if backoff_max is None else backoff_max
+        self.jitter = cfg.JITTER if jitter is None else jitter
+        self.api = None
+        self.generation = 0
+        self.state: State = "disconnected"
+        self.__lock__ = threading.Lock()
+        self.__ready__ = threading.Event()
+        self.__wake__ = threading.Event()
+        self.__stop__ = threading.Event()
+        self.thread: threading.Thread = None
+        self.__since__: float = None
+        self.__dropped__: float = None
+        self.__stats__ = {
+            "logins": 0,
+            "login_failures": 0,
+            "stale_callbacks": 0,
+            "drops": 0,
+            "reconnects": 0,
+            "attempt": 0,
+            "reconnect_latency_last": None,
+            "reconnect_latency_max": None,
+            "reconnect_latency_total": 0.0,
+            "last_error": None,
+        }
+
+    def start(self) -> None:
+        with self.__lock__:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.__stop__.clear()
+            self.thread = threading.Thread(
+                target=self.task, name="connection-supervisor", daemon=True
+            )
+            self.thread.start()
+
+    def stop(self) -> None:
+        self.__stop__.set()
+        self.__wake__.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self.generation += 1
+        self.__retire__()
+        self.state = "stopped"
+
+    def connect(self) -> bool:
+        """Log in once, falling back to background reconnection on failure."""
+        self.start()
+        if self.is_connected():
+            return True
+        if self.state == "reconnecting":
+            self.__ready__.wait(self.login_timeout)
+            return self.is_connected()
+        self.state = "connecting"
+        if self.__login__(reconnect=False):
+            return True
+        self.__drop__("login failed")
+        return False
+
+    def is_connected(self) -> bool:
+        return self.state == "connected" and self.__ready__.is_set()
+
+    def on_status(
+        self, is_ok: bool, message: str = None, generation: int = None
+    ) -> None:
+        """Connection state reported by the SDK callbacks of ``generation``."""
+        if generation is not None and generation != self.generation:
+            self.__stats__["stale_callbacks"] += 1
+            logger.debug("Ignored status %s of generation %s", is_ok, generation)
+            return
+        if is_ok:
+            self.__ready__.set()
+            return
+        self.__ready__.clear()
+        if message:
+            self.__stats__["last_error"] = message
+        if self.state == "connected":
+            self.__drop__(message or "connection lost")
+
+    def __drop__(self, reason: str) -> None:
+        logger.warning("TechAnalysis session down: %s", reason)
+        self.__stats__["drops"] += 1
+        self.__stats__["last_error"] = reason
+        self.__dropped__ = time.monotonic()
+        self.state = "reconnecting"
+        self.__wake__.set()
+
+    def __retire__(self) -> None:
+        api, self.api = self.api, None
+        if api is None:
+            return
+        try:
+            api.Logout()
+        except Exception as e:
+            logger.warning("TechAnalysis logout failed: %s", e)
+
+    def __login__(self, reconnect: bool) -> bool:
+        self.__ready__.clear()
+        # Callbacks of the session being replaced no longer count
+        self.generation += 1
+        self.__retire__()
+        try:
+            api = self.factory(self)
+            self.api = api
+            api.Login(self.username, self.__password__)
+        except Exception as e:
+            self.__stats__["login_failures"] += 1
+            self.__stats__["last_error"] = str(e)
+            logger.error("TechAnalysis login failed: %s", e)
+            return False
+        if not self.__ready__.wait(self.login_timeout):
+            self.__stats__["login_failures"] += 1
+            logger.error("TechAnalysis login timed out after %ss", self.login_timeout)
+            return False
+        self.__stats__["logins"] += 1
+        self.__since__ = time.monotonic()
+        self.state = "connected"
+        if self.on_connected is not None:
+            try:
+                self.on_connected(api, reconnect)
+            except Exception as e:
+                logger.error("TechAnalysis session setup failed: %s", e)
+        return True
+
+    def delay(self, attempt: int) -> float:
+        delay = min(self.backoff_max, self.backoff * 2**attempt)
+        return delay * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def task(self) -> None:
+        while not self.__stop__.is_set():
+            self.__wake__.wait()
+            self.__wake__.clear()
+            if self.__stop__.is_set():
+                return
+            if self.state == "reconnecting":
+                self.__reconnect__()
+
+    def __reconnect__(self) -> None:
+        attempt = 0
+        while not self.__stop__.is_set():
+            self.__stats__["attempt"] = attempt
+            if self.__stop__.wait(self.delay(attempt)):
+                return
+            if self.__login__(reconnect=True):
+                break
+            attempt += 1
+        else:
+            return
+        latency = time.monotonic() - self.__dropped__
+        stats = self.__stats__
+        stats["reconnects"] += 1
+        stats["attempt"] = 0
+        stats["reconnect_latency_last"] = latency
+        stats["reconnect_latency_max"] = max(
+            latency, stats["reconnect_latency_max"] or 0.0
+        )
+        stats["reconnect_latency_total"] += latency
+        logger.info("TechAnalysis session restored in %.1fs", latency)
+
+    def health(self) -> dict:
+        stats = dict(self.__stats__)
+        total = stats.pop("reconnect_latency_total")
+        stats["reconnect_latency_avg"] = (
+            total / stats["reconnects"] if stats["reconnects"] else None
+        )
+        stats["state"] = self.state
+        stats["connected"] = self.is_connected()
+        stats["uptime"] = (
+            time.monotonic() - self.__since__
+            if self.state == "connected" and self.__since__ is not None
+            else 0.0
+        )
+        return stats
@@ -0,0 +1,193 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass
+
+from twse_codes import codes
+
+from .dependencies import settings
+from .simulator import universe
+
+logger = logging.getLogger("runtime")
+
+
+@dataclass(frozen=True)
+class SymbolInfo:
+    symbol: str
+    name: str | None = None
+    market: str | None = None
+    type: str | None = None
+
+
+def kind_of(symbol: str) -> str:
+    """Security type implied by the shape of a TWSE code."""
+    if symbol.startswith("00"):
+        return "etf"
+    if len(symbol) == 4 and symbol.isdigit():
+        return "stock"
+    if len(symbol) > 4 and symbol[:4].isdigit() and symbol[4:].isalpha():
+        return "preferred"
+    return "other"
+
+
+def symbol_info(entry, markets: dict[str, str] = None) -> SymbolInfo:
+    """SymbolInfo of a universe entry, a code or a record with attributes.
+
+    The market comes from the entry, else from ``markets`` by symbol.
+    """
+    markets = settings.service.SymbolMaster.MARKETS if markets is None else markets
+    if isinstance(entry, str):
+        return SymbolInfo(entry, market=markets.get(entry), type=kind_of(entry))
+    symbol = str(getattr(entry, "code", None) or getattr(entry, "symbol"))
+    return SymbolInfo(
+        symbol,
+        name=getattr(entry, "name", None),
+        market=getattr(entry, "market", None) or markets.get(symbol),
+        type=getattr(entry, "type", None) or kind_of(symbol),
+    )
+
+
+def load_universe() -> list[SymbolInfo]:
+    if settings.service.Simulator.ENABLED:
+        return [symbol_info(symbol) for symbol in universe()]
+    return [symbol_info(entry) for entry in codes.get_stocks_list()]
+
+
+class SymbolMaster:
+    """Cached universe of symbols with their attributes.
+
+    The universe is loaded on first use and then every ``REFRESH_INTERVAL``
+    seconds by a background thread. Each load builds a new snapshot of the
+    symbols in order, their positions and their SymbolInfo, and swaps it in
+    with one assignment, so readers never lock and a failed load keeps the
+    previous universe.
+    """
+
+    def __init__(self, loader: callable = load_universe, interval: float = None):
+        cfg = settings.service.SymbolMaster
+        self.loader = loader
+        self.interval = cfg.REFRESH_INTERVAL if interval is None else interval
+        self.__lock__ = threading.Lock()
+        self.__snapshot__: tuple[tuple, dict, dict] | None = None
+        self.__event__ = threading.Event()
+        self.thread: threading.Thread = None
+        self.__stats__ = {
+            "refreshes": 0,
+            "errors": 0,
+            "added": 0,
+            "removed": 0,
+            "loaded_at": None,
+            "load_seconds": None,
+        }
+
+    def refresh(self) -> bool:
+        """Load the universe again, returning whether it succeeded."""
+        with self.__lock__:
+            start = time.perf_counter()
+            try:
+                infos = list(self.loader())
+            except Exception as e:
+                self.__stats__["errors"] += 1
+                logger.error("Loading the symbol universe failed: %s", e)
+                return False
+            by_symbol = {}
+            for info in infos:
+                by_symbol.setdefault(info.symbol, info)
+            symbols = tuple(by_symbol)
+            index = {symbol: i for i, symbol in enumerate(symbols)}
+            previous = self.__snapshot__
+            if previous is not None:
+                self.__stats__["added"] += len(index.keys() - previous[1].keys())
+                self.__stats__["removed"] += len(previous[1].keys() - index.keys())
+            self.__snapshot__ = symbols, index, by_symbol
+            self.__stats__["refreshes"] += 1
+            self.__stats__["loaded_at"] = time.time()
+            self.__stats__["load_seconds"] = time.perf_counter() - start
+        logger.info("Symbol universe loaded: %d symbols", len(symbols))
+        return True
+
+    def __current__(self) -> tuple[tuple, dict, dict]:
+        snapshot = self.__snapshot__
+        if snapshot is None:
+            self.refresh()
+            # An empty universe stands in until a load succeeds
+            snapshot = self.__snapshot__ or ((), {}, {})
+        return snapshot
+
+    def symbols(self) -> tuple[str, ...]:
+        return self.__current__()[0]
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self.__current__()[1]
+
+    def __len__(self) -> int:
+        return len(self.__current__()[0])
+
+    def index(self, symbol: str) -> int | None:
+        return self.__current__()[1].get(symbol)
+
+    def get(self, symbol: str) -> SymbolInfo | None:
+        return self.__current__()[2].get(symbol)
+
+    def after(self, symbol: str | None) -> tuple[str, ...]:
+        """Symbols from ``symbol`` on, every symbol when it is None or unknown."""
+        symbols, index, _ = self.__current__()
+        i = index.get(symbol) if symbol else None
+        if i is None:
+            if symbol:
+                logger.warning("%s is not in the symbol universe", symbol)
+            return symbols
+        return symbols[i:]
+
+    def query(
+        self,
+        market: str = None,
+        type: str = None,
+        prefix: str = None,
+    ) -> list[SymbolInfo]:
+        """Entries matching every given attribute, in universe order."""
+        return [
+            info
+            for info in self.__current__()[2].values()
+            if (market is None or info.market == market)
+            and (type is None or info.type == type)
+            and (prefix is None or info.symbol.startswith(prefix))
+        ]
+
+    def start(self) -> None:
+        """Refresh every ``interval`` seconds on a daemon thread, 0 never."""
+        if self.interval <= 0 or (self.thread is not None and self.thread.is_alive()):
+            return
+        self.__event__.clear()
+        self.thread = threading.Thread(
+            target=self.__run__, name="SymbolMaster", daemon=True
+        )
+        self.thread.start()
+
+    def __run__(self) -> None:
+        if self.__snapshot__ is None:
+            self.refresh()
+        while not self.__event__.wait(self.interval):
+            self.refresh()
+
+    def stop(self) -> None:
+        self.__event__.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def stats(self) -> dict:
+        snapshot = self.__snapshot__
+        return {
+            "symbols": 0 if snapshot is None else len(snapshot[0]),
+            "interval": self.interval,
+            "running": self.thread is not None and self.thread.is_alive(),
+            **self.__stats__,
+        }
+
+
+__symbol_master = SymbolMaster()
+
+
+def get_symbol_master() -> SymbolMaster:
+    return __symbol_master
@@ -0,0 +1,151 @@
+import logging
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta
+from typing import Iterable
+
+from tech_analysis_api_handler.database import get_ohlc_store
+from .dependencies import settings, get_db
+from .utils import today
+
+logger = logging.getLogger("runtime")
+
+
+class TradingCalendar:
+    """Cached set of TWSE sessions.
+
+    A day is a session when it was seen in stored data, otherwise when it is a
+    weekday that is not a configured holiday. Missing bars never close a day,
+    they may just not have been fetched yet. Sessions are precomputed into a
+    sorted list up to a year after the Taipei date, so range queries are a
+    bisect and a slice, and stored data is learned again every ``interval``
+    seconds once started.
+    """
+
+    EPOCH = date(1990, 1, 1)
+
+    def __init__(
+        self, holidays: Iterable = None, reference: str = None, interval: float = None
+    ):
+        cfg = settings.service.TradingCalendar
+        holidays = cfg.HOLIDAYS if holidays is None else holidays
+        self.reference = cfg.REFERENCE_SYMBOL if reference is None else reference
+        self.interval = cfg.REFRESH_INTERVAL if interval is None else interval
+        self.__lock__ = threading.Lock()
+        self.__holidays__: set[date] = {self.to_date(d) for d in holidays}
+        self.__learned__: set[date] = set()
+        self.__horizon__: date | None = None
+        self.__event__ = threading.Event()
+        self.thread: threading.Thread = None
+        self.__ordinals__: list[int] = []
+        self.__days__: list[datetime] = []
+        self.__rebuild__()
+
+    @staticmethod
+    def to_date(value) -> date:
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date):
+            return value
+        value = str(value)
+        return date(int(value[:4]), int(value[4:6]), int(value[6:8]))
+
+    def __is_session__(self, day: date) -> bool:
+        if day in self.__learned__:
+            return True
+        return day not in self.__holidays__ and day.weekday() < 5
+
+    def __rebuild__(self) -> None:
+        last = today().date() + timedelta(days=366)
+        ordinals, days = [], []
+        for ordinal in range(self.EPOCH.toordinal(), last.toordinal() + 1):
+            day = date.fromordinal(ordinal)
+            if self.__is_session__(day):
+                ordinals.append(ordinal)
+                days.append(datetime(day.year, day.month, day.day))
+        with self.__lock__:
+            self.__ordinals__, self.__days__ = ordinals, days
+            self.__horizon__ = last
+
+    def add_holidays(self, holidays: Iterable) -> None:
+        self.__holidays__.update(self.to_date(d) for d in holidays)
+        self.__rebuild__()
+
+    def learn(self, sessions: Iterable) -> int:
+        """Record days known to be sessions and return how many were new."""
+        sessions = {self.to_date(d) for d in sessions} - self.__learned__
+        if sessions:
+            self.__learned__.update(sessions)
+            self.__rebuild__()
+        return len(sessions)
+
+    def refresh(self) -> int:
+        """Learn sessions from the stored bars of the reference symbol."""
+        with get_db()() as session:
+            dates = get_ohlc_store().dates(session, self.reference)
+        learned = self.learn(dates)
+        # Keep the precomputed horizon a year ahead of a long running process
+        if not learned and self.__horizon__ < today().date() + timedelta(days=365):
+            self.__rebuild__()
+        return learned
+
+    def start(self) -> None:
+        """Refresh every ``interval`` seconds on a daemon thread, 0 never."""
+        if self.interval <= 0 or (self.thread is not None and self.thread.is_alive()):
+            return
+        self.__event__.clear()
+        self.thread = threading.Thread(
+            target=self.__run__, name="TradingCalendar", daemon=True
+        )
+        self.thread.start()
+
+    def __run__(self) -> None:
+        while not self.__event__.wait(self.interval):
+            start = time.perf_counter()
+            try:
+                learned = self.refresh()
+            except Exception as e:
+                logger.warning("Trading calendar refresh failed: %s", e)
+                continue
+            logger.debug(
+                "Trading calendar learned %d sessions in %.3fs",
+                learned,
+                time.perf_counter() - start,
+            )
+
+    def stop(self) -> None:
+        self.__event__.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def is_trading_day(self, day) -> bool:
+        ordinal = self.to_date(day).toordinal()
+        ordinals = self.__ordinals__
+        i = bisect_left(ordinals, ordinal)
+        if i == len(ordinals):
+            return self.__is_session__(self.to_date(day))
+        return ordinals[i] == ordinal
+
+    def trading_days(self, start, end) -> list[datetime]:
+        """Sessions between ``start`` and ``end`` inclusive as midnight datetimes."""
+        lo = self.to_date(start).toordinal()
+        hi = self.to_date(end).toordinal()
+        with self.__lock__:
+            ordinals, days = self.__ordinals__, self.__days__
+        result = days[bisect_left(ordinals, lo) : bisect_right(ordinals, hi)]
+        # Beyond the precomputed horizon fall back to the rules
+        if ordinals and hi > ordinals[-1]:
+            for ordinal in range(max(lo, ordinals[-1] + 1), hi + 1):
+                day = date.fromordinal(ordinal)
+                if self.__is_session__(day):
+                    result.append(datetime(day.year, day.month, day.day))
+        return result
+
+
+__trading_calendar = TradingCalendar()
+
+
+def get_trading_calendar() -> TradingCalendar:
+    return __trading_calendar
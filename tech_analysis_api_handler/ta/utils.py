@@ -1,4 +1,5 @@
 from datetime import datetime, timedelta
+import numpy as np
 import pytz
 
 
@@ -45,3 +46,110 @@ def kbar_time_formatter(result) -> dict:
     kbar = result.KBar.__dict__
     kbar.update({"datetime": datetime.strptime(d + t, "%Y%m%d%H%M")})
     return kbar
+
+
+_KBAR_MINUTES = [timedelta(hours=h, minutes=m) for h in range(24) for m in range(60)]
+
+
+def kbar_rows(results) -> list[dict]:
+    """Batch kbar_time_formatter returning new rows for a list of TA results.
+
+    The session midnight is parsed once per distinct Date and TimeSn (HHMM)
+    becomes an offset from a precomputed table, so no string is parsed per bar
+    and the SDK objects are left untouched. A TimeSn that is not a time of day,
+    such as 2400, raises ValueError.
+    """
+    bases = {}
+    rows = []
+    for result in results:
+        kbar = result.KBar
+        d = kbar.Date
+        base = bases.get(d)
+        if base is None:
+            base = bases[d] = datetime(int(d[:4]), int(d[4:6]), int(d[6:8]))
+        t = kbar.TimeSn
+        hour, minute = divmod(t, 100)
+        if not (0 <= hour < 24 and 0 <= minute < 60):
+            # strptime in kbar_time_formatter rejects these as well
+            raise ValueError(f"Invalid TimeSn {t} of {kbar.Product} on {d}")
+        rows.append(
+            {
+                "Date": d,
+                "Product": kbar.Product,
+                "TimeSn": t,
+                "TimeSn_Dply": kbar.TimeSn_Dply,
+                "Quantity": kbar.Quantity,
+                "Volume": kbar.Volume,
+                "OPrice": kbar.OPrice,
+                "HPrice": kbar.HPrice,
+                "LPrice": kbar.LPrice,
+                "CPrice": kbar.CPrice,
+                "datetime": base + _KBAR_MINUTES[hour * 60 + minute],
+            }
+        )
+    return rows
+
+
+TICK_DTYPE = np.dtype(
+    [
+        ("datetime", "M8[us]"),
+        ("Prod", "U20"),
+        ("Sequence", "i8"),
+        ("Match_Time", "f8"),
+        ("Match_Price", "f8"),
+        ("Match_Quantity", "i8"),
+        ("Match_Volume", "i8"),
+        ("Is_TryMatch", "?"),
+        ("BS", "i8"),
+        ("BP_1_Pre", "f8"),
+        ("SP_1_Pre", "f8"),
+    ]
+)
+
+
+def match_time_to_datetime64(match_time: np.ndarray, date_val: datetime) -> np.ndarray:
+    """Vectorized combine_date_time for HHMMSS.ffffff floats of one session."""
+    hhmmss = np.floor(match_time)
+    micros = np.round((match_time - hhmmss) * 1e6)
+    seconds = (hhmmss // 10000) * 3600 + (hhmmss // 100 % 100) * 60 + hhmmss % 100
+    offset = (seconds * 1e6 + micros).astype("i8").astype("m8[us]")
+    base = np.datetime64(date_val.strftime("%Y-%m-%d"), "us")
+    return base + offset
+
+
+def decode_ticks(records: list, date_val: datetime) -> np.ndarray:
+    """Decode SDK tick records of one session into a TICK_DTYPE array.
+
+    Attributes are read in a single pass, decimal fields are parsed as a
+    whole column and timestamps are derived from Match_Time arithmetically.
+    Accepts raw SDK records as well as TBSRec objects.
+    """
+    result = np.empty(len(records), dtype=TICK_DTYPE)
+    if not records:
+        return result
+    columns = list(
+        zip(
+            *[
+                (
+                    x.Prod,
+                    x.Sequence,
+                    str(x.Match_Time),
+                    str(x.Match_Price),
+                    x.Match_Quantity,
+                    x.Match_Volume,
+                    x.Is_TryMatch,
+                    x.BS,
+                    str(x.BP_1_Pre),
+                    str(x.SP_1_Pre),
+                )
+                for x in records
+            ]
+        )
+    )
+    for name, column in zip(TICK_DTYPE.names[1:], columns):
+        if TICK_DTYPE[name] == np.float64:
+            result[name] = np.asarray(column).astype(np.float64)
+        else:
+            result[name] = column
+    result["datetime"] = match_time_to_datetime64(result["Match_Time"], date_val)
+    return result
@@ -0,0 +1,200 @@
+import logging
+import queue
+import threading
+import time
+import zlib
+from typing import Literal
+
+from tech_analysis_api_handler import metrics
+from .dependencies import settings
+
+logger = logging.getLogger("runtime")
+
+_STOP = object()
+
+
+class KeyedExecutor:
+    """Fixed pool of worker threads with one bounded queue per worker.
+
+    Tasks are routed by a stable hash of their key, so every event of the same
+    symbol runs on the same worker in submission order. When a queue is full
+    the ``overflow`` policy applies: ``block`` waits up to ``block_timeout``
+    and then drops the new task, ``drop_oldest`` discards the oldest queued
+    task and ``drop_newest`` discards the new one. A dropped task calls the
+    ``on_drop`` it was submitted with, so whoever waits on it can be told.
+    Submits after ``stop()`` are rejected the same way until ``start()``.
+    """
+
+    def __init__(
+        self,
+        workers: int = None,
+        queue_size: int = None,
+        overflow: Literal["block", "drop_oldest", "drop_newest"] = None,
+        block_timeout: float = None,
+        name: str = "callback",
+    ):
+        cfg = settings.service.CallbackWorkers
+        self.workers = cfg.WORKERS if workers is None else workers
+        self.queue_size = cfg.QUEUE_SIZE if queue_size is None else queue_size
+        self.overflow = cfg.OVERFLOW if overflow is None else overflow
+        self.block_timeout = (
+            cfg.BLOCK_TIMEOUT if block_timeout is None else block_timeout
+        )
+        self.name = name
+        self.__lock__ = threading.Lock()
+        # Notified when the last in-flight submit is done
+        self.__idle__ = threading.Condition(self.__lock__)
+        self.__submitting__ = 0
+        self.__queues__: list[queue.Queue] = []
+        self.__threads__: list[threading.Thread] = []
+        self.__stopped__ = False
+        self.__stats__ = {
+            "submitted": 0,
+            "completed": 0,
+            "errors": 0,
+            "dropped": 0,
+            "rejected": 0,
+            "latency_total": 0.0,
+            "latency_max": 0.0,
+        }
+
+    def start(self) -> None:
+        with self.__lock__:
+            self.__stopped__ = False
+            if self.__threads__:
+                return
+            self.__queues__ = [
+                queue.Queue(maxsize=self.queue_size) for _ in range(self.workers)
+            ]
+            for i, q in enumerate(self.__queues__):
+                thread = threading.Thread(
+                    target=self.task, args=(q,), name=f"{self.name}-{i}", daemon=True
+                )
+                thread.start()
+                self.__threads__.append(thread)
+
+    def stop(self) -> None:
+        """Run every queued task, then stop the workers.
+
+        Submits already choosing a queue finish first, so no task lands behind
+        the stop marker where it would neither run nor be dropped.
+        """
+        with self.__idle__:
+            self.__stopped__ = True
+            queues, threads = self.__queues__, self.__threads__
+            self.__queues__, self.__threads__ = [], []
+            while self.__submitting__:
+                self.__idle__.wait()
+        for q in queues:
+            q.put(_STOP)
+        for thread in threads:
+            thread.join()
+
+    def submit(
+        self, key: str, func: callable, *args, on_drop: callable = None
+    ) -> bool:
+        """Queue ``func(*args)`` behind the earlier tasks of ``key``.
+
+        Returns False when the task was dropped or rejected, after calling
+        ``on_drop()``.
+        """
+        if not self.__threads__ and not self.__stopped__:
+            self.start()
+        with self.__lock__:
+            queues = self.__queues__
+            if queues:
+                self.__submitting__ += 1
+        if not queues:
+            self.__stats__["rejected"] += 1
+            logger.warning("%s workers stopped, rejected task for %s", self.name, key)
+            self.__dropped__(on_drop)
+            return False
+        try:
+            return self.__enqueue__(queues, key, func, args, on_drop)
+        finally:
+            with self.__idle__:
+                self.__submitting__ -= 1
+                if not self.__submitting__:
+                    self.__idle__.notify_all()
+
+    def __enqueue__(
+        self, queues: list[queue.Queue], key: str, func: callable, args, on_drop
+    ) -> bool:
+        q = queues[zlib.crc32(str(key).encode()) % len(queues)]
+        item = (time.perf_counter(), func, args, on_drop)
+        self.__stats__["submitted"] += 1
+        try:
+            if self.overflow == "block":
+                q.put(item, timeout=self.block_timeout)
+            else:
+                q.put_nowait(item)
+            return True
+        except queue.Full:
+            pass
+        if self.overflow == "drop_oldest":
+            try:
+                oldest = q.get_nowait()
+            except queue.Empty:
+                pass
+            else:
+                self.__stats__["dropped"] += 1
+                self.__dropped__(oldest[3])
+            try:
+                q.put_nowait(item)
+                return True
+            except queue.Full:
+                pass
+        self.__stats__["dropped"] += 1
+        logger.warning("Callback queue full, dropped task for %s", key)
+        self.__dropped__(on_drop)
+        return False
+
+    @staticmethod
+    def __dropped__(on_drop: callable) -> None:
+        if on_drop is None:
+            return
+        try:
+            on_drop()
+        except Exception as e:
+            logger.error("on_drop %s failed: %s", on_drop, e)
+
+    def task(self, q: queue.Queue) -> None:
+        while True:
+            item = q.get()
+            if item is _STOP:
+                return
+            submitted, func, args, _ = item
+            try:
+                func(*args)
+            except Exception as e:
+                self.__stats__["errors"] += 1
+                logger.error("Callback task %s failed: %s", func.__name__, e)
+            latency = time.perf_counter() - submitted
+            metrics.CALLBACK_SECONDS.observe(latency, func.__name__)
+            stats = self.__stats__
+            stats["completed"] += 1
+            stats["latency_total"] += latency
+            if latency > stats["latency_max"]:
+                stats["latency_max"] = latency
+
+    def depth(self) -> list[int]:
+        return [q.qsize() for q in self.__queues__]
+
+    def stats(self) -> dict:
+        stats = dict(self.__stats__)
+        total = stats.pop("latency_total")
+        count = stats["completed"]
+        stats["latency_avg"] = total / count if count else 0.0
+        depth = self.depth()
+        stats["workers"] = len(depth)
+        stats["queue_depth"] = sum(depth)
+        stats["queue_depth_max"] = max(depth, default=0)
+        stats["overflow"] = self.overflow
+        return stats
+
+
+__callback_executor = KeyedExecutor()
+
+
+def get_callback_executor() -> KeyedExecutor:
+    return __callback_executor
@@ -0,0 +1,10 @@
+import os
+import tempfile
+from pathlib import Path
+
+# Every database lives in sqlite files of a scratch directory, the settings
+# are read when the package is imported
+SCRATCH = Path(tempfile.mkdtemp(prefix="ta-test-"))
+os.environ.setdefault("SQL_URI", f"sqlite:///{SCRATCH}")
+os.environ.setdefault("API_USERNAME", "test")
+os.environ.setdefault("API_PASSWORD", "test")
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from tech_analysis_api_handler import metrics
+from tech_analysis_api_handler.aggregate import rebuild_symbol, ticks_to_bars
+from tech_analysis_api_handler.database import (
+    OHLCPeriodTable,
+    OHLCTable,
+    TickHandler,
+    get_db,
+    get_engine,
+)
+
+
+def ticks(symbol: str, seconds: range) -> list[dict]:
+    """One print every 30 seconds from 09:00:30, the first a trial match."""
+    start = datetime(2024, 5, 2, 9)
+    return [
+        {
+            "datetime": start + timedelta(seconds=s),
+            "Prod": symbol,
+            "Sequence": i,
+            "Match_Time": 0.0,
+            "Match_Price": 600.0 + i,
+            "Match_Quantity": 1,
+            "Match_Volume": i + 1,
+            "Is_TryMatch": i == 0,
+            "BS": 0,
+            "BP_1_Pre": 0.0,
+            "SP_1_Pre": 0.0,
+        }
+        for i, s in enumerate(seconds)
+    ]
+
+
+def test_ticks_to_bars_labels_bars_by_their_end():
+    frame = pd.DataFrame(ticks("AGG0", range(30, 631, 30)))
+    one = ticks_to_bars(frame)
+    assert one["TimeSn"].tolist()[:2] == [901, 902]
+    # The trial match at 09:00:30 is left out
+    assert one.iloc[0][["OPrice", "CPrice", "Quantity"]].tolist() == [601, 601, 1]
+    five = ticks_to_bars(frame, period=5)
+    assert five["TimeSn"].tolist() == [905, 910, 915]
+    # 09:05:00 closes the first bar
+    first = five.iloc[0][["OPrice", "HPrice", "CPrice", "Volume"]].tolist()
+    assert first == [601, 609, 609, 10]
+    assert five["Quantity"].sum() == one["Quantity"].sum() == 20
+
+
+def test_rebuild_writes_periods_to_their_own_table():
+    TickHandler().bulk_load("AGG5", ticks("AGG5", range(30, 631, 30)), "local")
+    OHLCTable.resolve(get_engine(), "AGG5")
+    OHLCPeriodTable.resolve(get_engine(), 5)
+    before = metrics.DB_ROWS.value("ohlc_5m", "AGG5")
+    assert rebuild_symbol("AGG5", period=5) == 3
+    assert metrics.DB_ROWS.value("ohlc_5m", "AGG5") - before == 3
+    with get_db()() as session:
+        stored = OHLCPeriodTable.read(session, 5, "AGG5")
+        assert [row["TimeSn"] for row in stored] == [905, 910, 915]
+        assert OHLCTable.read(session, "AGG5") == []
+    assert rebuild_symbol("AGG5", period=1) == 11
+    with get_db()() as session:
+        assert len(OHLCTable.read(session, "AGG5")) == 11
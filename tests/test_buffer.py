@@ -0,0 +1,111 @@
+import time
+from datetime import datetime
+
+from tech_analysis_api_handler.database import (
+    OHLCTable,
+    get_db,
+    get_engine,
+    get_ohlc_store,
+)
+from tech_analysis_api_handler.ta.buffer import BarBuffer
+
+
+def bar(symbol: str, minute: int, price: float = 600.0) -> dict:
+    return {
+        "datetime": datetime(2024, 5, 2, 9, minute),
+        "Date": 20240502,
+        "Product": symbol,
+        "TimeSn": 900 + minute,
+        "TimeSn_Dply": 900 + minute,
+        "Quantity": 1,
+        "Volume": minute,
+        "OPrice": price,
+        "HPrice": price,
+        "LPrice": price,
+        "CPrice": price,
+    }
+
+
+def create_table(symbol: str) -> str:
+    # sqlite would block on the table DDL inside the flush transaction
+    OHLCTable.resolve(get_engine(), symbol)
+    return symbol
+
+
+def wait_for(condition, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def stored(symbol: str) -> list[dict]:
+    with get_db()() as session:
+        return get_ohlc_store().read(session, symbol)
+
+
+def test_single_bar_is_flushed_within_max_latency():
+    symbol = create_table("BUF1")
+    buffer = BarBuffer(max_batch=1000, max_latency=0.2)
+    buffer.start()
+    try:
+        # Let the flusher go idle on the empty buffer first
+        time.sleep(0.1)
+        start = time.monotonic()
+        buffer.put(bar(symbol, 1))
+        assert wait_for(lambda: buffer.stats()["rows_flushed"] == 1, 1.0)
+        assert time.monotonic() - start < 0.2 + 0.5
+        assert buffer.pending() == 0
+    finally:
+        buffer.stop()
+    assert [row["CPrice"] for row in stored(symbol)] == [600.0]
+
+
+def test_updates_of_one_bar_are_coalesced():
+    symbol = create_table("BUF2")
+    buffer = BarBuffer(max_batch=1000, max_latency=60.0)
+    buffer.put(bar(symbol, 1, 600.0))
+    buffer.put(bar(symbol, 1, 601.0))
+    buffer.put(bar(symbol, 2, 602.0))
+    assert buffer.pending() == 2
+    assert buffer.stats()["coalesced"] == 1
+    assert buffer.flush()
+    assert [row["CPrice"] for row in stored(symbol)] == [601.0, 602.0]
+
+
+def test_full_batch_is_flushed_before_max_latency():
+    symbol = create_table("BUF3")
+    buffer = BarBuffer(max_batch=3, max_latency=60.0)
+    buffer.start()
+    try:
+        for minute in range(3):
+            buffer.put(bar(symbol, minute))
+        assert wait_for(lambda: buffer.stats()["rows_flushed"] == 3, 1.0)
+    finally:
+        buffer.stop()
+
+
+def test_put_gives_up_when_the_buffer_stays_full():
+    buffer = BarBuffer(max_batch=100, max_latency=60.0, max_pending=1, put_timeout=0.05)
+    assert buffer.put(bar("BUF4", 1))
+    assert not buffer.put(bar("BUF4", 2))
+    assert buffer.stats()["dropped"] == 1
+
+
+def test_failing_symbol_is_dead_lettered_without_stalling_others():
+    symbol = create_table("BUF5")
+    buffer = BarBuffer(max_batch=100, max_latency=60.0, max_retries=2)
+    buffer.put(bar(symbol, 1))
+    # An empty Product has no table to write to
+    buffer.put(bar("", 1))
+    assert not buffer.flush()
+    assert [row["CPrice"] for row in stored(symbol)] == [600.0]
+    assert buffer.pending() == 1
+    buffer.put(bar(symbol, 2))
+    assert buffer.flush()
+    stats = buffer.stats()
+    assert stats["pending"] == 0 and stats["dead_lettered"] == 1
+    assert stats["flush_errors"] == 2 and stats["rows_flushed"] == 2
+    assert len(stored(symbol)) == 2
@@ -0,0 +1,73 @@
+import asyncio
+import threading
+
+from tech_analysis_api_handler.ta.bus import BarUpdate, EventBus, HistoryReceived
+
+
+def update(symbol: str, i: int) -> BarUpdate:
+    return BarUpdate(symbol, "SMA", {"Product": symbol, "Volume": i})
+
+
+def test_published_event_reaches_every_subscribed_consumer():
+    bus = EventBus()
+    writer, stream, history = [], [], []
+    bus.subscribe("writer", writer.append, (BarUpdate,))
+    bus.subscribe("stream", stream.append, (BarUpdate,))
+    bus.subscribe("history", history.append, (HistoryReceived,))
+    event = update("2330", 1)
+    bus.publish(event)
+    bus.stop()
+    assert writer == [event] and stream == [event] and history == []
+
+
+def test_events_of_one_symbol_stay_in_order():
+    bus = EventBus()
+    seen: dict[str, list[int]] = {}
+    lock = threading.Lock()
+
+    def handler(event: BarUpdate) -> None:
+        with lock:
+            seen.setdefault(event.symbol, []).append(event.final["Volume"])
+
+    bus.subscribe("writer", handler, (BarUpdate,), workers=4)
+    symbols = ["2330", "2317", "2454", "0050"]
+    for i in range(200):
+        bus.publish(update(symbols[i % len(symbols)], i))
+    bus.stop()
+    for n, symbol in enumerate(symbols):
+        assert seen[symbol] == list(range(n, 200, len(symbols)))
+
+
+def test_async_consumer_skips_while_inactive_and_drains_on_the_loop():
+    bus = EventBus()
+    active = threading.Event()
+    seen = []
+
+    async def scenario() -> None:
+        loop = asyncio.get_running_loop()
+        bus.attach(loop)
+        consumer = bus.subscribe(
+            "stream",
+            lambda event: seen.append((event, threading.get_ident())),
+            (BarUpdate,),
+            affinity="async",
+            active=active.is_set,
+        )
+        bus.publish(update("2330", 1))
+        active.set()
+        # Publishers run on the callback threads, not on the loop
+        publisher = threading.Thread(
+            target=lambda: [bus.publish(update("2330", i)) for i in (2, 3)]
+        )
+        publisher.start()
+        publisher.join()
+        assert seen == []
+        await asyncio.sleep(0.01)
+        stats = consumer.stats()
+        assert stats["skipped"] == 1 and stats["completed"] == 2
+        assert stats["pending"] == 0
+
+    asyncio.run(scenario())
+    assert [event.final["Volume"] for event, _ in seen] == [2, 3]
+    # Both ran on the loop thread, which asyncio.run keeps on this thread
+    assert {ident for _, ident in seen} == {threading.get_ident()}
@@ -0,0 +1,165 @@
+import csv
+import io
+from datetime import datetime
+from types import SimpleNamespace
+
+import pandas as pd
+
+from tech_analysis_api_handler import metrics
+from tech_analysis_api_handler.database import (
+    Completeness,
+    CopyStream,
+    OHLCFactTable,
+    OHLCTable,
+    TickHandler,
+    Watermark,
+    get_db,
+    get_engine,
+)
+
+
+def bars(symbol: str, minutes: range) -> list[dict]:
+    return [
+        {
+            "datetime": datetime(2024, 5, 2, 9, minute),
+            "Date": 20240502,
+            "Product": symbol,
+            "TimeSn": 900 + minute,
+            "TimeSn_Dply": 900 + minute,
+            "Quantity": 1,
+            "Volume": minute,
+            "OPrice": 600.0,
+            "HPrice": 600.0,
+            "LPrice": 600.0,
+            "CPrice": 600.0,
+        }
+        for minute in minutes
+    ]
+
+
+def row_count(symbol: str, dataset: str = Watermark.OHLC, db_name: str = None) -> int:
+    return Watermark.bulk(get_engine(db_name), dataset)[symbol]["row_count"]
+
+
+def test_fact_table_counts_only_inserted_rows():
+    OHLCFactTable.resolve(get_engine())
+    before = metrics.DB_ROWS.value(Watermark.OHLC, "FACT1")
+    with get_db()() as session:
+        OHLCFactTable.insert_ignore_many(session, {"FACT1": bars("FACT1", range(1, 4))})
+        # A replayed backfill overlapping the stored bars by three
+        OHLCFactTable.insert_ignore_many(session, {"FACT1": bars("FACT1", range(1, 5))})
+        assert len(OHLCFactTable.read(session, "FACT1")) == 4
+    assert row_count("FACT1") == 4
+    # Labelled by symbol as with the per-symbol tables
+    assert metrics.DB_ROWS.value(Watermark.OHLC, "FACT1") - before == 4
+
+
+def test_symbol_table_counts_only_inserted_rows():
+    OHLCTable.resolve(get_engine(), "SYM1")
+    with get_db()() as session:
+        OHLCTable.insert_ignore(session, bars("SYM1", range(1, 4)))
+        OHLCTable.insert_ignore(session, bars("SYM1", range(2, 6)))
+        stored = OHLCTable.read(session, "SYM1")
+    assert [row["TimeSn"] for row in stored] == [901, 902, 903, 904, 905]
+    assert row_count("SYM1") == 5
+
+
+def session_bars(minutes) -> list[dict]:
+    return [{"datetime": datetime(2024, 5, 2, m // 60, m % 60)} for m in minutes]
+
+
+def test_completeness_merges_writes_in_the_database():
+    # Two flushes of the same session, each unaware of the other's bars
+    first = Completeness.marks({"BITS1": session_bars([9 * 60 + 1, 11 * 60])})
+    second = Completeness.marks({"BITS1": session_bars([13 * 60 + 30])})
+    with get_db()() as session:
+        Completeness.update(session, first)
+        session.commit()
+        Completeness.update(session, second)
+        session.commit()
+        Completeness.mark_complete(session, "BITS1", [20240502])
+        session.commit()
+        stored = Completeness.bulk(session, 20240502, 20240502, ["BITS1"])
+    bitmap, complete = stored["BITS1"][20240502]
+    assert bitmap == first[("BITS1", 20240502)] | second[("BITS1", 20240502)]
+    assert bitmap >> (Completeness.MINUTES - 1) == 1
+    assert complete
+
+
+def test_closing_auction_minutes_are_not_expected():
+    continuous = range(9 * 60 + 1, 13 * 60 + 26)
+    marks = Completeness.marks({"2330": session_bars([*continuous, 13 * 60 + 30])})
+    assert Completeness.is_complete(marks[("2330", 20240502)])
+    marks = Completeness.marks({"2330": session_bars(continuous)})
+    assert not Completeness.is_complete(marks[("2330", 20240502)])
+
+
+def ticks(symbol: str, sequences: range, price: float = 600.0) -> list[dict]:
+    return [
+        {
+            "datetime": datetime(2024, 5, 2, 9, 0, sequence),
+            "Prod": symbol,
+            "Sequence": sequence,
+            "Match_Time": 90000.0 + sequence,
+            "Match_Price": price,
+            "Match_Quantity": 1,
+            "Match_Volume": sequence,
+            "Is_TryMatch": False,
+            "BS": 0,
+            "BP_1_Pre": price,
+            "SP_1_Pre": price,
+        }
+        for sequence in sequences
+    ]
+
+
+def test_tick_insert_skips_or_replaces_stored_keys():
+    handler = TickHandler()
+
+    def stored_rows() -> int:
+        return row_count("TICK1", Watermark.TICK, TickHandler.DB_NAME)
+
+    assert handler.insert("TICK1", ticks("TICK1", range(1, 4)), "local") == 3
+    replaced = ticks("TICK1", range(2, 4), price=601.0)
+    assert handler.insert("TICK1", replaced, "local", method="replace") == 2
+    assert stored_rows() == 3
+    assert handler.insert("TICK1", ticks("TICK1", range(2, 6)), "local") == 2
+    assert stored_rows() == 5
+    replaced = ticks("TICK1", range(4, 7), price=601.0)
+    assert handler.insert("TICK1", replaced, "local", method="replace") == 3
+    assert stored_rows() == 6
+    stored = handler.read_columns("TICK1", target="local")
+    assert stored["Sequence"] == [1, 2, 3, 4, 5, 6]
+    assert stored["Match_Price"] == [600.0, 601.0, 601.0, 601.0, 601.0, 601.0]
+
+
+def test_bulk_load_skips_stored_keys():
+    handler = TickHandler()
+    first = handler.bulk_load("BULK1", ticks("BULK1", range(1, 4)), "local")
+    assert [(r.rows, r.inserted) for r in first] == [(3, 3)]
+    # A replayed day overlapping the stored ticks, as a DataFrame this time
+    frame = pd.DataFrame(ticks("BULK1", range(2, 6), price=601.0))
+    second = handler.bulk_load("BULK1", frame, "local", chunk_size=2)
+    assert [(r.rows, r.inserted) for r in second] == [(4, 2)]
+    stored = handler.read_columns("BULK1", target="local")
+    assert stored["Sequence"] == [1, 2, 3, 4, 5]
+    assert stored["Match_Price"] == [600.0, 600.0, 600.0, 601.0, 601.0]
+    assert row_count("BULK1", Watermark.TICK, TickHandler.DB_NAME) == 5
+
+
+def test_copy_stream_renders_csv_in_any_read_size():
+    rows = [
+        {"datetime": datetime(2024, 5, 2, 9, 0, 1), "name": 'a,"b"', "flag": True},
+        SimpleNamespace(datetime=None, name="line\nbreak", flag=False),
+    ]
+    columns = ["datetime", "name", "flag"]
+    expected = '2024-05-02 09:00:01,"a,""b""",t\n,"line\nbreak",f\n'
+    assert CopyStream(rows, columns).read() == expected
+    stream = CopyStream(rows, columns)
+    chunks = []
+    while chunk := stream.read(5):
+        assert len(chunk) <= 5
+        chunks.append(chunk)
+    assert "".join(chunks) == expected
+    parsed = list(csv.reader(io.StringIO(expected)))
+    assert parsed == [["2024-05-02 09:00:01", 'a,"b"', "t"], ["", "line\nbreak", "f"]]
@@ -0,0 +1,15 @@
+import time
+
+from tech_analysis_api_handler.ta.harvester import TokenBucket
+
+
+def test_token_bucket_allows_a_burst_then_the_rate():
+    bucket = TokenBucket(rate=50.0, burst=5)
+    start = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+    assert time.monotonic() - start < 0.05
+    for _ in range(5):
+        bucket.acquire()
+    # Five more tokens refill at 50 a second
+    assert time.monotonic() - start >= 0.09
@@ -0,0 +1,54 @@
+import pytest
+
+from tech_analysis_api_handler.metrics import Counter, Gauge, Histogram, Registry
+
+
+def test_counter_and_gauge_render_with_escaped_labels():
+    registry = Registry()
+    counter = Counter("calls_total", "Calls.", ["method"], registry=registry)
+    gauge = Gauge("depth", 'Queue "depth".', ["queue"], registry=registry)
+    counter.inc("SubTA")
+    counter.inc("SubTA", amount=2)
+    gauge.set(1.5, 'a"b')
+    assert registry.render().splitlines() == [
+        "# HELP calls_total Calls.",
+        "# TYPE calls_total counter",
+        'calls_total{method="SubTA"} 3',
+        '# HELP depth Queue \\"depth\\".',
+        "# TYPE depth gauge",
+        'depth{queue="a\\"b"} 1.5',
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    histogram = Histogram("seconds", "Latency.", buckets=(0.1, 1.0), registry=registry)
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value)
+    assert registry.render().splitlines()[2:] == [
+        'seconds_bucket{le="0.1"} 2',
+        'seconds_bucket{le="1"} 3',
+        'seconds_bucket{le="+Inf"} 4',
+        "seconds_sum 2.65",
+        "seconds_count 4",
+    ]
+
+
+def test_collector_replaces_stored_values():
+    registry = Registry()
+    gauge = Gauge("depth", "Depth.", ["queue"], registry=registry)
+    gauge.set(5, "stale")
+    gauge.collector(lambda: {"callback": 2, ("bus",): 0})
+    assert registry.render().splitlines()[2:] == [
+        'depth{queue="callback"} 2',
+        'depth{queue="bus"} 0',
+    ]
+
+
+def test_labels_and_names_are_checked():
+    registry = Registry()
+    counter = Counter("calls_total", "Calls.", ["method"], registry=registry)
+    with pytest.raises(ValueError):
+        counter.inc()
+    with pytest.raises(ValueError):
+        Counter("calls_total", "Again.", registry=registry)
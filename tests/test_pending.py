@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from tech_analysis_api_handler.ta.models import RcvDone, RtCode
+from tech_analysis_api_handler.ta.pending import PendingRequests
+from tech_analysis_api_handler.ta.sdk import eNK_Kind, eTA_Type, k_settnig
+
+
+def k_config(symbol: str = "2330", date: str = "20240502"):
+    return k_settnig(symbol, eNK_Kind.K_1m, eTA_Type.SMA, date)
+
+
+def test_identical_requests_share_one_future():
+    requests = PendingRequests()
+    future, is_new = requests.submit(k_config())
+    shared, again = requests.submit(k_config())
+    assert is_new and not again
+    assert shared is future
+    assert len(requests) == 1
+
+
+def test_requests_of_one_product_resolve_oldest_first():
+    requests = PendingRequests()
+    first, _ = requests.submit(k_config(date="20240501"))
+    second, _ = requests.submit(k_config(date="20240502"))
+    assert requests.resolve("2330", eTA_Type.SMA, RcvDone(RtCode.SUCCESS, [1]))
+    assert first.result().data == [1]
+    assert not second.done()
+    assert requests.resolve("2330", "SMA", RcvDone(RtCode.SUCCESS, [2]))
+    assert second.result().data == [2]
+    assert not requests.resolve("2330", eTA_Type.SMA, RcvDone(RtCode.SUCCESS))
+
+
+def test_timeout_of_one_waiter_leaves_the_others_waiting():
+    requests = PendingRequests()
+    future, _ = requests.submit(k_config())
+
+    async def scenario():
+        impatient = asyncio.create_task(requests.wait(future, 0.01))
+        patient = asyncio.create_task(requests.wait(future, 1.0))
+        with pytest.raises(asyncio.TimeoutError):
+            await impatient
+        assert not future.cancelled()
+        requests.resolve("2330", eTA_Type.SMA, RcvDone(RtCode.SUCCESS, [1]))
+        return await patient
+
+    assert asyncio.run(scenario()).data == [1]
+
+
+def test_cancel_by_the_owner_reaches_every_waiter():
+    requests = PendingRequests()
+    future, _ = requests.submit(k_config())
+
+    async def scenario():
+        waiter = asyncio.create_task(requests.wait(future, 1.0))
+        await asyncio.sleep(0)
+        requests.cancel(k_config())
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+    asyncio.run(scenario())
+    assert future.cancelled()
+    assert len(requests) == 0
@@ -0,0 +1,65 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from sqlalchemy.engine.result import IteratorResult, SimpleResultMetaData
+
+from tech_analysis_api_handler import serialization
+from tech_analysis_api_handler.database import OHLCTable, columns_of
+from tech_analysis_api_handler.models import DataType
+
+
+COLUMNS = {
+    "datetime": [datetime(2024, 5, 2, 9, 1), datetime(2024, 5, 2, 9, 2)],
+    "CPrice": [600.0, 601.5],
+}
+
+
+def test_dumps_encodes_datetimes():
+    content = {"datetime": datetime(2024, 5, 2, 9, 1), "name": "台積電"}
+    assert json.loads(serialization.dumps(content)) == {
+        "datetime": "2024-05-02T09:01:00",
+        "name": "台積電",
+    }
+
+
+def test_columnar_response_keeps_the_envelope():
+    response = serialization.columnar_response(
+        DataType.OHLC, "2330", COLUMNS, "columnar"
+    )
+    assert response.media_type == serialization.JSON_MEDIA_TYPE
+    content = json.loads(response.body)
+    assert content["success"] and content["status"] == "OK"
+    data = content["data"][0]
+    assert data["data_type"] == DataType.OHLC.value
+    assert data["metadata"] == {"name": "2330", "rows": 2, "columns": list(COLUMNS)}
+    assert data["data"]["2330"]["CPrice"] == [600.0, 601.5]
+    assert data["data"]["2330"]["datetime"][0] == "2024-05-02T09:01:00"
+
+
+def test_arrow_without_pyarrow_is_not_implemented(monkeypatch):
+    monkeypatch.setattr(serialization, "ARROW_AVAILABLE", False)
+    response = serialization.columnar_response(DataType.OHLC, "2330", COLUMNS, "arrow")
+    content = json.loads(response.body)
+    assert not content["success"] and content["status"] == "NOT_IMPLEMENTED"
+
+
+def test_arrow_stream_carries_columns_and_envelope():
+    pa = pytest.importorskip("pyarrow")
+    response = serialization.columnar_response(DataType.OHLC, "2330", COLUMNS, "arrow")
+    assert response.media_type == serialization.ARROW_MEDIA_TYPE
+    table = pa.ipc.open_stream(response.body).read_all()
+    assert table.column("CPrice").to_pylist() == [600.0, 601.5]
+    envelope = json.loads(table.schema.metadata[b"envelope"])
+    assert envelope["data"][0]["metadata"]["rows"] == 2
+
+
+def test_columns_of_a_table_query_serialize():
+    names = [column.name for column in OHLCTable.get("2330").columns]
+    row = (COLUMNS["datetime"][0], 20240502, "2330", 901, 901, 1, 1) + (600.0,) * 4
+    columns = columns_of(IteratorResult(SimpleResultMetaData(names), iter([row])))
+    response = serialization.columnar_response(
+        DataType.OHLC, "2330", columns, "columnar"
+    )
+    assert json.loads(response.body)["data"][0]["data"]["2330"]["TimeSn"] == [901]
@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from tech_analysis_api_handler.database import TickHandler
+from tech_analysis_api_handler.ta import service
+from tech_analysis_api_handler.ta.bus import HistoryReceived
+from tech_analysis_api_handler.ta.models import RtCode
+from tech_analysis_api_handler.ta.pending import get_pending_requests
+from tech_analysis_api_handler.ta.sdk import eNK_Kind, eTA_Type, k_settnig
+from tech_analysis_api_handler.ta.service import ApiResponse
+
+
+def test_empty_history_resolves_its_request():
+    requests = get_pending_requests()
+    k_config = k_settnig("EMPTY1", eNK_Kind.K_1m, eTA_Type.SMA, "20240502")
+    future, _ = requests.submit(k_config)
+    ApiResponse.write_history(HistoryReceived("EMPTY1", "SMA", []))
+    assert future.result(timeout=0).code == RtCode.EMPTY_DATA
+
+
+def tick(symbol: str, dt: datetime) -> dict:
+    return {
+        "datetime": dt,
+        "Prod": symbol,
+        "Sequence": 1,
+        "Match_Time": 90000.0,
+        "Match_Price": 600.0,
+        "Match_Quantity": 1,
+        "Match_Volume": 1,
+        "Is_TryMatch": False,
+        "BS": 0,
+        "BP_1_Pre": 600.0,
+        "SP_1_Pre": 600.0,
+    }
+
+
+def test_harvest_scans_tables_missing_from_the_watermark(monkeypatch):
+    handler = TickHandler()
+    latest = datetime.now() - timedelta(days=1)
+    # WMK1 has a watermark, WMK2 only has rows written before it existed
+    handler.insert("WMK1", [tick("WMK1", latest)], "local")
+    table = handler.ensure_table(handler.engine_by_str("local"), "WMK2")
+    with handler.engine_by_str("local").begin() as conn:
+        conn.execute(table.insert(), [tick("WMK2", latest)])
+    jobs = {}
+
+    class Harvester:
+        def run(self, jobs_, fetch, store, running):
+            for symbol, day in jobs_:
+                jobs.setdefault(symbol, []).append(day.date())
+
+    monkeypatch.setattr(service, "get_tick_harvester", Harvester)
+    service.harvest_ticks("local", ["WMK1", "WMK2"])
+    for symbol in ("WMK1", "WMK2"):
+        assert all(day > latest.date() for day in jobs.get(symbol, []))
+
+
+def test_harvest_counts_only_inserted_rows(monkeypatch):
+    day = datetime.now() - timedelta(days=1)
+    frame = pd.DataFrame([tick("STORE1", day)])
+    stored = []
+
+    class Harvester:
+        def run(self, jobs, fetch, store, running):
+            stored.append(store("STORE1", day, frame))
+            stored.append(store("STORE1", day, frame))
+
+    monkeypatch.setattr(service, "get_tick_harvester", Harvester)
+    service.harvest_ticks("local", ["STORE1"])
+    assert stored == [1, 0]
@@ -0,0 +1,151 @@
+import threading
+
+from tech_analysis_api_handler.database import get_engine
+from tech_analysis_api_handler.ta.sdk import eNK_Kind, eTA_Type, k_settnig
+from tech_analysis_api_handler.ta.sessions import HashRing, SessionPool
+
+
+SYMBOLS = [str(code) for code in range(1101, 3101)]
+
+
+def test_route_is_stable_and_spreads_keys():
+    ring = HashRing(range(4), vnodes=64)
+    owners = {symbol: ring.route(symbol) for symbol in SYMBOLS}
+    again = HashRing(range(4), vnodes=64)
+    assert owners == {symbol: again.route(symbol) for symbol in SYMBOLS}
+    counts = [list(owners.values()).count(node) for node in range(4)]
+    assert min(counts) > len(SYMBOLS) / 4 * 0.5
+
+
+def test_adding_a_node_only_moves_keys_to_it():
+    before = HashRing(range(4), vnodes=64)
+    after = HashRing(range(5), vnodes=64)
+    moved = [s for s in SYMBOLS if before.route(s) != after.route(s)]
+    assert all(after.route(s) == 4 for s in moved)
+    assert len(moved) < len(SYMBOLS) / 5 * 1.5
+
+
+def test_route_skips_rejected_nodes_in_ring_order():
+    ring = HashRing(range(3), vnodes=16)
+    for symbol in SYMBOLS[:50]:
+        order = list(ring.nodes(symbol))
+        assert sorted(order) == [0, 1, 2]
+        assert ring.route(symbol, lambda node: node != order[0]) == order[1]
+        # Nothing accepted falls back to the owner
+        assert ring.route(symbol, lambda node: False) == order[0]
+
+
+class FlakyApi:
+    """Session whose SDK calls fail for the symbols in ``failing``."""
+
+    def __init__(self, failing: set[str]):
+        self.failing = failing
+        self.calls = []
+
+    def __call__(self, name: str, k_config):
+        if k_config.ProdID in self.failing:
+            raise RuntimeError(f"{name} refused")
+        self.calls.append((name, k_config.ProdID))
+
+    def SubTA(self, k_config):
+        self("SubTA", k_config)
+
+    def UnSubTA(self, k_config):
+        self("UnSubTA", k_config)
+
+
+def pool_with(api: FlakyApi) -> SessionPool:
+    pool = SessionPool(lambda supervisor: api, size=1, rate=1000.0, batch=100)
+    pool.supervisors[0].api = api
+    return pool
+
+
+def k_config(symbol: str):
+    return k_settnig(symbol, eNK_Kind.K_1m, eTA_Type.SMA, "20240502")
+
+
+def stored(pool: SessionPool) -> set[str]:
+    return {row[0] for row in pool.registry.stored(get_engine())}
+
+
+def test_failed_subta_is_rolled_back():
+    api = FlakyApi({"FAIL1"})
+    pool = pool_with(api)
+    configs = [k_config("OK1"), k_config("FAIL1")]
+    added = pool.subscribe_many(configs)
+    assert [k.ProdID for k in added] == ["OK1"]
+    assert k_config("FAIL1") not in pool.registry
+    assert {"OK1"} <= stored(pool) and "FAIL1" not in stored(pool)
+    # The next attempt calls SubTA again
+    api.failing.clear()
+    assert pool.subscribe(k_config("FAIL1"))
+    assert api.calls[-1] == ("SubTA", "FAIL1")
+    pool.unsubscribe_many([k_config("OK1"), k_config("FAIL1")])
+
+
+def test_failed_unsubta_keeps_the_subscription():
+    api = FlakyApi(set())
+    pool = pool_with(api)
+    pool.subscribe_many([k_config("OK2"), k_config("FAIL2")])
+    api.failing.add("FAIL2")
+    removed = pool.unsubscribe_many([k_config("OK2"), k_config("FAIL2")])
+    assert [k.ProdID for k in removed] == ["OK2"]
+    assert pool.registry.holds(k_config("FAIL2"), "api")
+    assert "FAIL2" in stored(pool) and "OK2" not in stored(pool)
+    api.failing.clear()
+    assert pool.unsubscribe(k_config("FAIL2"))
+    assert "FAIL2" not in stored(pool)
+
+
+def test_history_request_leaves_held_subscriptions_alone():
+    api = FlakyApi(set())
+    pool = pool_with(api)
+    live = k_config("REQ1")
+    pool.subscribe(live, owner="stream")
+    # A one-shot request of the same key is still answered by its own SubTA
+    request = k_config("REQ1")
+    pool.request(request)
+    assert api.calls == [("SubTA", "REQ1"), ("SubTA", "REQ1")]
+    pool.unsubscribe(request, pool.request_owner(request))
+    assert pool.registry.holds(live, "stream")
+    assert ("UnSubTA", "REQ1") not in api.calls
+    pool.request(request)
+    pool.unsubscribe(live, owner="stream")
+    assert ("UnSubTA", "REQ1") not in api.calls
+    pool.unsubscribe(request, pool.request_owner(request))
+    assert api.calls[-1] == ("UnSubTA", "REQ1")
+    assert request not in pool.registry
+
+
+def test_owners_joining_a_failed_subta_are_rolled_back():
+    calling, release = threading.Event(), threading.Event()
+
+    class SlowApi(FlakyApi):
+        def SubTA(self, k_config):
+            calling.set()
+            release.wait(1.0)
+            super().SubTA(k_config)
+
+    api = SlowApi({"JOIN1"})
+    pool = pool_with(api)
+    results = {}
+    first = threading.Thread(
+        target=lambda: results.update(api=pool.subscribe(k_config("JOIN1")))
+    )
+    first.start()
+    calling.wait(1.0)
+    second = threading.Thread(
+        target=lambda: results.update(
+            stream=pool.subscribe(k_config("JOIN1"), owner="stream")
+        )
+    )
+    second.start()
+    second.join(0.1)
+    # The joining owner waits for the outcome of the SubTA in flight
+    assert second.is_alive()
+    release.set()
+    first.join(1.0)
+    second.join(1.0)
+    assert results == {"api": False, "stream": False}
+    assert k_config("JOIN1") not in pool.registry
+    assert "JOIN1" not in stored(pool)
@@ -0,0 +1,15 @@
+from datetime import datetime
+
+from tech_analysis_api_handler.ta.simulator import SimulatedTechAnalysis
+
+
+def test_live_updates_only_run_in_weekday_sessions():
+    live_minute = SimulatedTechAnalysis.live_minute
+    # 2024-05-02 is a Thursday
+    assert live_minute(datetime(2024, 5, 2, 9, 0)) == 9 * 60 + 1
+    assert live_minute(datetime(2024, 5, 2, 13, 29)) == 13 * 60 + 30
+    assert live_minute(datetime(2024, 5, 2, 8, 59)) is None
+    assert live_minute(datetime(2024, 5, 2, 13, 30)) is None
+    # The last minute of the day no longer rolls over to TimeSn 2400
+    assert live_minute(datetime(2024, 5, 2, 23, 59)) is None
+    assert live_minute(datetime(2024, 5, 4, 10, 0)) is None
@@ -0,0 +1,73 @@
+import asyncio
+import json
+import threading
+
+from tech_analysis_api_handler.ta.stream import StreamClient, StreamHub
+
+
+class Upstream:
+    def __init__(self):
+        self.subscribed: list[str] = []
+        self.unsubscribed: list[str] = []
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def subscribe(self, symbol: str) -> bool:
+        self.entered.set()
+        self.release.wait(1.0)
+        self.subscribed.append(symbol)
+        return True
+
+    def unsubscribe(self, symbol: str) -> bool:
+        self.unsubscribed.append(symbol)
+        return True
+
+
+async def settle(condition, timeout: float = 1.0) -> bool:
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return True
+        await asyncio.sleep(0.01)
+    return condition()
+
+
+def test_clients_share_one_upstream_subscription():
+    upstream = Upstream()
+    hub = StreamHub(upstream.subscribe, upstream.unsubscribe)
+
+    async def scenario():
+        first, second = StreamClient(["2330"]), StreamClient(["2330"])
+        everything = StreamClient()
+        for client in (first, second, everything):
+            await hub.connect(client)
+        hub.dispatch([{"Product": "2330", "CPrice": 600.0}, {"Product": "2317"}])
+        assert json.loads(first.buffer[0])["CPrice"] == 600.0
+        assert len(second.buffer) == 1 and len(everything.buffer) == 2
+        hub.disconnect(first)
+        await asyncio.sleep(0.05)
+        assert upstream.unsubscribed == []
+        hub.disconnect(second)
+        assert await settle(lambda: upstream.unsubscribed == ["2330"])
+
+    asyncio.run(scenario())
+    assert upstream.subscribed == ["2330"]
+    assert hub.stats()["upstream_subscriptions"] == 0
+
+
+def test_client_leaving_during_subscribe_releases_it():
+    upstream = Upstream()
+    upstream.release.clear()
+    hub = StreamHub(upstream.subscribe, upstream.unsubscribe)
+
+    async def scenario():
+        client = StreamClient(["2330"])
+        connecting = asyncio.create_task(hub.connect(client))
+        assert await asyncio.to_thread(upstream.entered.wait, 1.0)
+        hub.disconnect(client)
+        upstream.release.set()
+        await connecting
+        assert await settle(lambda: upstream.unsubscribed == ["2330"])
+
+    asyncio.run(scenario())
+    assert hub.stats()["upstream_subscriptions"] == 0
@@ -0,0 +1,51 @@
+from functools import partial
+
+from tech_analysis_api_handler.ta.supervisor import ConnectionSupervisor
+
+
+class FakeSession:
+    def __init__(self, on_status):
+        self.on_status = on_status
+        self.logged_out = False
+
+    def Login(self, userid, password):
+        self.on_status(True)
+
+    def Logout(self):
+        self.logged_out = True
+
+
+def supervisor(sessions: list) -> ConnectionSupervisor:
+    def factory(supervisor: ConnectionSupervisor) -> FakeSession:
+        on_status = partial(supervisor.on_status, generation=supervisor.generation)
+        sessions.append(FakeSession(on_status))
+        return sessions[-1]
+
+    return ConnectionSupervisor(
+        factory, login_timeout=1.0, backoff=60.0, credentials=("user", "secret")
+    )
+
+
+def test_login_logs_out_the_replaced_session():
+    sessions = []
+    sup = supervisor(sessions)
+    assert sup.connect()
+    assert sup.__login__(reconnect=True)
+    assert [s.logged_out for s in sessions] == [True, False]
+    assert sup.api is sessions[1]
+    sup.stop()
+    assert sessions[1].logged_out and sup.api is None
+
+
+def test_status_of_a_replaced_session_is_ignored():
+    sessions = []
+    sup = supervisor(sessions)
+    sup.connect()
+    sup.__login__(reconnect=True)
+    # The old session reports its own disconnect after being replaced
+    sessions[0].on_status(False, "closed")
+    assert sup.is_connected()
+    assert sup.health()["stale_callbacks"] == 1
+    sessions[1].on_status(False, "dropped")
+    assert sup.state == "reconnecting"
+    sup.stop()
@@ -0,0 +1,14 @@
+from types import SimpleNamespace
+
+from tech_analysis_api_handler.ta.symbols import SymbolMaster, symbol_info
+
+
+def test_market_comes_from_the_entry_or_the_configured_mapping():
+    markets = {"2330": "TWSE", "6488": "TPEx"}
+    entries = ["2330", SimpleNamespace(code="6488"), "0050"]
+    entries.append(SimpleNamespace(code="2317", market="TWSE"))
+    master = SymbolMaster(lambda: [symbol_info(e, markets) for e in entries], 0)
+    assert [info.symbol for info in master.query(market="TWSE")] == ["2330", "2317"]
+    assert [info.symbol for info in master.query(market="TPEx")] == ["6488"]
+    assert master.get("0050").market is None
+    assert len(master.query()) == 4
@@ -0,0 +1,32 @@
+from datetime import date, timedelta
+
+from tech_analysis_api_handler.ta.trading_calendar import TradingCalendar
+from tech_analysis_api_handler.ta.utils import today
+
+
+def days(calendar: TradingCalendar, start: str, end: str) -> list[int]:
+    return [int(d.strftime("%Y%m%d")) for d in calendar.trading_days(start, end)]
+
+
+def test_weekdays_are_sessions_except_holidays():
+    calendar = TradingCalendar(holidays=["20240501"], interval=0)
+    # 2024-04-29 is a Monday
+    expected = [20240429, 20240430, 20240502, 20240503]
+    assert days(calendar, "20240429", "20240505") == expected
+    assert not calendar.is_trading_day(date(2024, 5, 1))
+    assert not calendar.is_trading_day(date(2024, 5, 4))
+
+
+def test_learned_sessions_add_days_without_closing_others():
+    calendar = TradingCalendar(holidays=[], interval=0)
+    # A weekend make-up session and a weekday whose bars are not stored yet
+    assert calendar.learn([20240504, 20240502]) == 2
+    assert calendar.is_trading_day(date(2024, 5, 4))
+    assert calendar.is_trading_day(date(2024, 5, 3))
+    assert days(calendar, "20240502", "20240505") == [20240502, 20240503, 20240504]
+    assert calendar.learn([20240502]) == 0
+
+
+def test_horizon_starts_from_the_taipei_date():
+    calendar = TradingCalendar(holidays=[], interval=0)
+    assert calendar.__horizon__ == today().date() + timedelta(days=366)
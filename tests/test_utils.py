@@ -0,0 +1,37 @@
+import copy
+
+import pytest
+
+from tech_analysis_api_handler.ta.sdk import TKBarRec, ta_sma
+from tech_analysis_api_handler.ta.utils import kbar_rows, kbar_time_formatter
+
+
+def result(day: str, time_sn: int, price: float = 600.0):
+    kbar = TKBarRec(day, "2330", time_sn, time_sn, 1, 10, price, price, price, price)
+    return ta_sma(kbar, price)
+
+
+def test_kbar_rows_matches_kbar_time_formatter():
+    # Morning times have three digits, the session spans two dates
+    results = [
+        result(day, time_sn)
+        for day in ("20240502", "20240503")
+        for time_sn in (901, 959, 1000, 1259, 1330)
+    ]
+    # kbar_time_formatter mutates the SDK objects, give it its own copies
+    expected = [kbar_time_formatter(r) for r in copy.deepcopy(results)]
+    assert kbar_rows(results) == expected
+
+
+def test_kbar_rows_leaves_results_untouched():
+    results = [result("20240502", 901)]
+    rows = kbar_rows(results)
+    assert "datetime" not in results[0].KBar.__dict__
+    rows[0]["CPrice"] = 0.0
+    assert results[0].KBar.CPrice == 600.0
+
+
+def test_kbar_rows_rejects_times_outside_the_day():
+    for time_sn in (2400, 961):
+        with pytest.raises(ValueError, match=f"TimeSn {time_sn} of 2330"):
+            kbar_rows([result("20240502", 901), result("20240502", time_sn)])
@@ -0,0 +1,121 @@
+import threading
+import time
+import zlib
+from types import SimpleNamespace
+
+from tech_analysis_api_handler.ta import workers
+from tech_analysis_api_handler.ta.bus import EventBus, HistoryReceived
+from tech_analysis_api_handler.ta.workers import KeyedExecutor
+
+
+def test_tasks_of_one_key_run_in_submission_order():
+    executor = KeyedExecutor(workers=4, queue_size=100, overflow="block")
+    seen = []
+    for i in range(50):
+        executor.submit("2330", seen.append, i)
+    executor.stop()
+    assert seen == list(range(50))
+
+
+def blocked_executor(overflow: str) -> tuple[KeyedExecutor, threading.Event]:
+    """One worker stuck on a task, with room for one more in its queue."""
+    executor = KeyedExecutor(
+        workers=1, queue_size=1, overflow=overflow, block_timeout=0.01
+    )
+    release, running = threading.Event(), threading.Event()
+
+    def stuck():
+        running.set()
+        release.wait()
+
+    executor.submit("2330", stuck)
+    running.wait(1.0)
+    return executor, release
+
+
+def test_drop_newest_calls_on_drop_of_the_new_task():
+    executor, release = blocked_executor("drop_newest")
+    dropped, seen = [], []
+    assert executor.submit("2330", seen.append, 1, on_drop=lambda: dropped.append(1))
+    assert not executor.submit(
+        "2330", seen.append, 2, on_drop=lambda: dropped.append(2)
+    )
+    release.set()
+    executor.stop()
+    assert seen == [1] and dropped == [2]
+    assert executor.stats()["dropped"] == 1
+
+
+def test_drop_oldest_calls_on_drop_of_the_evicted_task():
+    executor, release = blocked_executor("drop_oldest")
+    dropped, seen = [], []
+    executor.submit("2330", seen.append, 1, on_drop=lambda: dropped.append(1))
+    assert executor.submit("2330", seen.append, 2, on_drop=lambda: dropped.append(2))
+    release.set()
+    executor.stop()
+    assert seen == [2] and dropped == [1]
+
+
+def test_block_drops_after_the_timeout():
+    executor, release = blocked_executor("block")
+    dropped, seen = [], []
+    executor.submit("2330", seen.append, 1)
+    on_drop = lambda: dropped.append(2)  # noqa: E731
+    assert not executor.submit("2330", seen.append, 2, on_drop=on_drop)
+    release.set()
+    executor.stop()
+    assert seen == [1] and dropped == [2]
+
+
+def test_submit_after_stop_is_rejected():
+    executor = KeyedExecutor(workers=1, queue_size=10)
+    executor.start()
+    executor.stop()
+    dropped, seen = [], []
+    on_drop = lambda: dropped.append(1)  # noqa: E731
+    assert not executor.submit("2330", seen.append, 1, on_drop=on_drop)
+    assert dropped == [1] and seen == []
+    assert executor.stats()["rejected"] == 1
+    assert executor.stats()["workers"] == 0
+    executor.start()
+    assert executor.submit("2330", seen.append, 2)
+    executor.stop()
+    assert seen == [2]
+
+
+def test_stop_waits_for_a_submit_choosing_its_queue(monkeypatch):
+    executor = KeyedExecutor(workers=1, queue_size=10)
+    executor.start()
+    choosing = threading.Event()
+
+    def crc32(data: bytes) -> int:
+        # Hold the submit between reading the queues and its put
+        choosing.set()
+        time.sleep(0.2)
+        return zlib.crc32(data)
+
+    monkeypatch.setattr(workers, "zlib", SimpleNamespace(crc32=crc32))
+    seen, dropped = [], []
+    on_drop = lambda: dropped.append(1)  # noqa: E731
+    args = ("2330", seen.append, 1)
+    submit = threading.Thread(
+        target=executor.submit, args=args, kwargs={"on_drop": on_drop}
+    )
+    submit.start()
+    choosing.wait(1.0)
+    executor.stop()
+    submit.join(1.0)
+    # Without the wait the task lands behind the stop marker and is lost
+    assert seen == [1] and dropped == []
+
+
+def test_thread_consumer_reports_dropped_events():
+    bus = EventBus()
+    dropped = []
+    consumer = bus.subscribe(
+        "history", lambda event: None, (HistoryReceived,), on_drop=dropped.append
+    )
+    consumer.stop()
+    event = HistoryReceived("2330", "SMA", [])
+    bus.publish(event)
+    assert dropped == [event]